@@ -1,11 +1,23 @@
+from contextlib import asynccontextmanager
 from typing import Dict, List, Union
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 
 import apparun.core
+from apparun.api.service import ComputeService
+from apparun.exceptions import ClientDisconnectedError, ServiceOverloadedError
 
-app = FastAPI()
+compute_service = ComputeService()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    compute_service.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 class ComputeParams(BaseModel):
@@ -13,6 +25,11 @@ class ComputeParams(BaseModel):
     params: Dict[str, Union[str, float, List[Union[str, float]]]]
 
 
+class BatchComputeParams(BaseModel):
+    jobs: List[ComputeParams]
+    all_nodes: bool = False
+
+
 class GetModelParams(BaseModel):
     impact_model_name: str
 
@@ -31,6 +48,15 @@ def compute_nodes(params: ComputeParams):
     return scores
 
 
+@app.post("/compute_batch/")
+def compute_batch(params: BatchComputeParams):
+    scores = apparun.core.compute_impacts_batch(
+        [(job.impact_model_name, job.params) for job in params.jobs],
+        all_nodes=params.all_nodes,
+    )
+    return scores
+
+
 @app.get("/get_models/")
 def get_models():
     valid_impact_models = apparun.core.get_valid_models()
@@ -41,3 +67,52 @@ def get_models():
 def get_model_params(params: GetModelParams):
     impact_models_params = apparun.core.get_model_params(params.impact_model_name)
     return impact_models_params
+
+
+async def run_in_service(request: Request, function, *args):
+    """
+    Run a computation in the compute service's worker processes.
+    :param request: request the computation is made for.
+    :param function: function to run.
+    :param args: arguments of the function.
+    :return: result of the function, or an empty response if the client disconnected.
+    """
+    try:
+        return await compute_service.run(function, *args, request=request)
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except ClientDisconnectedError:
+        return Response(status_code=499)
+
+
+@app.post("/async/compute/")
+async def async_compute(params: ComputeParams, request: Request):
+    return await run_in_service(
+        request,
+        apparun.core.compute_impacts,
+        params.impact_model_name,
+        params.params,
+    )
+
+
+@app.post("/async/compute_nodes/")
+async def async_compute_nodes(params: ComputeParams, request: Request):
+    return await run_in_service(
+        request,
+        apparun.core.compute_impacts,
+        params.impact_model_name,
+        params.params,
+        True,
+    )
+
+
+@app.post("/async/compute_batch/")
+async def async_compute_batch(params: BatchComputeParams, request: Request):
+    return await run_in_service(
+        request,
+        apparun.core.compute_impacts_batch,
+        [(job.impact_model_name, job.params) for job in params.jobs],
+        params.all_nodes,
+    )
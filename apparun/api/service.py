@@ -0,0 +1,187 @@
+"""
+This module contains the service running computations of the API in a pool of worker
+processes, so they don't block the event loop of the server.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional, Protocol
+
+from pydantic import BaseModel, PrivateAttr
+
+from apparun.exceptions import ClientDisconnectedError, ServiceOverloadedError
+from apparun.logger import logger
+
+APPARUN_SERVICE_WORKERS = int(
+    os.environ.get("APPARUN_SERVICE_WORKERS", os.cpu_count() or 1)
+)
+APPARUN_SERVICE_MAX_QUEUE = int(os.environ.get("APPARUN_SERVICE_MAX_QUEUE", 64))
+APPARUN_SERVICE_START_METHOD = os.environ.get("APPARUN_SERVICE_START_METHOD", "spawn")
+APPARUN_SERVICE_WARM_MODELS = [
+    name
+    for name in os.environ.get("APPARUN_SERVICE_WARM_MODELS", "").split(",")
+    if name
+]
+
+
+class DisconnectableRequest(Protocol):
+    """
+    Request whose client can disconnect, such as starlette's requests.
+    """
+
+    async def is_disconnected(self) -> bool:
+        ...
+
+
+def init_worker(warm_models: List[str]):
+    """
+    Initialize a worker process, loading and compiling some impact models in its
+    models registry so they are ready for the first requests.
+    :param warm_models: names of the impact models to load.
+    """
+    import apparun.core
+
+    for impact_model_name in warm_models:
+        try:
+            apparun.core.model_registry.get(
+                os.path.join(
+                    apparun.core.APPARUN_IMPACT_MODELS_DIR, f"{impact_model_name}.yaml"
+                )
+            ).compile_models()
+        except Exception:
+            logger.error(f"Impossible to warm up the impact model {impact_model_name}")
+
+
+class ComputeService(BaseModel):
+    """
+    Runs computations in a bounded pool of worker processes. Each worker keeps its own
+    models registry, so models stay loaded and compiled between requests. Requests
+    exceeding the number of workers wait in a queue, and are rejected once the queue is
+    full. Queued requests are dropped if their client disconnects, running ones have
+    their result discarded.
+    """
+
+    max_workers: int = APPARUN_SERVICE_WORKERS
+    "Number of worker processes."
+    max_queue: int = APPARUN_SERVICE_MAX_QUEUE
+    "Maximum number of requests waiting for a worker."
+    warm_models: List[str] = APPARUN_SERVICE_WARM_MODELS
+    "Names of the impact models loaded by each worker at start up."
+    start_method: str = APPARUN_SERVICE_START_METHOD
+    "Method used to start the worker processes, see multiprocessing's contexts."
+    poll_interval: float = 0.1
+    "Interval between two checks of client disconnection, in seconds."
+    _executor: Optional[ProcessPoolExecutor] = PrivateAttr(default=None)
+    _slots: Optional[asyncio.Semaphore] = PrivateAttr(default=None)
+    _queued: int = PrivateAttr(default=0)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        Pool of worker processes, started at first access.
+        :return: the process pool.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=init_worker,
+                initargs=(self.warm_models,),
+            )
+        return self._executor
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        return self._slots
+
+    @property
+    def queued(self) -> int:
+        """
+        Number of requests waiting for a worker.
+        """
+        return self._queued
+
+    def shutdown(self):
+        """
+        Stop the worker processes, cancelling the computations not started yet.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def release_slot(self, loop: asyncio.AbstractEventLoop):
+        """
+        Release a worker slot from any thread.
+        :param loop: event loop the slots belong to.
+        """
+        try:
+            loop.call_soon_threadsafe(self.slots.release)
+        except RuntimeError:
+            # Event loop is closed, slots are not used anymore
+            pass
+
+    async def wait(
+        self, awaitable: Awaitable, request: Optional[DisconnectableRequest]
+    ) -> Any:
+        """
+        Wait for an awaitable, cancelling it if the client of the request disconnects.
+        :param awaitable: awaitable to wait for.
+        :param request: request whose client is watched. If None, awaitable is waited
+        for until its end.
+        :return: result of the awaitable.
+        """
+        task = asyncio.ensure_future(awaitable)
+        while not task.done():
+            await asyncio.wait({task}, timeout=self.poll_interval)
+            if not task.done() and request is not None:
+                if await request.is_disconnected():
+                    task.cancel()
+                    raise ClientDisconnectedError()
+        return task.result()
+
+    async def run(
+        self,
+        function: Callable,
+        *args,
+        request: Optional[DisconnectableRequest] = None,
+    ) -> Any:
+        """
+        Run a function in a worker process, waiting for a free worker if all of them
+        are busy. Raises a ServiceOverloadedError if the queue is full, and a
+        ClientDisconnectedError if the client disconnects before the end of the
+        computation.
+        :param function: function to run, must be picklable.
+        :param args: arguments of the function, must be picklable.
+        :param request: request the computation is made for.
+        :return: result of the function.
+        """
+        if self.slots.locked():
+            if self._queued >= self.max_queue:
+                logger.warning("Compute service queue is full, request rejected")
+                raise ServiceOverloadedError()
+        self._queued += 1
+        acquisition = asyncio.ensure_future(self.slots.acquire())
+        try:
+            await self.wait(acquisition, request)
+        except ClientDisconnectedError:
+            if acquisition.done() and not acquisition.cancelled():
+                self.slots.release()
+            raise
+        finally:
+            self._queued -= 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            future: Future = self.executor.submit(function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        # Worker is only released once the computation really ended, even if the
+        # client disconnected meanwhile.
+        future.add_done_callback(lambda _: self.release_slot(loop))
+        return await self.wait(asyncio.wrap_future(future), request)
@@ -0,0 +1,128 @@
+"""
+This module contains the cache keeping the scores computed for sets of parameters
+values, so scenarios computed again, such as the ones of a scenario comparison, are
+not recomputed.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, PrivateAttr
+
+from apparun.parameters import EnumCodes, ImpactModelParamsValues
+
+APPARUN_SCORES_CACHE_MAX_ENTRIES = int(
+    os.environ.get("APPARUN_SCORES_CACHE_MAX_ENTRIES", 256)
+)
+APPARUN_SCORES_CACHE_MAX_SAMPLES = int(
+    os.environ.get("APPARUN_SCORES_CACHE_MAX_SAMPLES", 1000)
+)
+
+
+def values_digest(values: ImpactModelParamsValues) -> str:
+    """
+    Compute a canonical hash of fully evaluated parameters values: values are hashed
+    by parameter name order, floats as float64 and enum values as options' names, so
+    equal values given as expressions, integers or encoded options have the same hash.
+    :param values: values of the parameters.
+    :return: sha256 hex digest of the values.
+    """
+    digest = hashlib.sha256()
+    for name, value in sorted(values.items()):
+        digest.update(name.encode())
+        if isinstance(value, EnumCodes):
+            digest.update("\0".join(value.to_list()).encode())
+        else:
+            # Adding 0.0 turns -0.0 into 0.0
+            digest.update((np.asarray(value, dtype=np.float64) + 0.0).tobytes())
+    return digest.hexdigest()
+
+
+class ScoresCache(BaseModel):
+    """
+    In-process LRU cache of computed scores, keyed by impact model's hash, fully
+    evaluated parameters values and computation options. Only computations of at most
+    max_samples samples are cached, so Monte Carlo runs don't fill the cache. Cached
+    scores are shared, they must not be modified.
+    """
+
+    max_entries: int = APPARUN_SCORES_CACHE_MAX_ENTRIES
+    "Maximum number of cached results, cache is disabled if 0."
+    max_samples: int = APPARUN_SCORES_CACHE_MAX_SAMPLES
+    "Maximum number of samples of a cached computation."
+    hits: int = 0
+    misses: int = 0
+    _entries: OrderedDict[Hashable, Any] = PrivateAttr(default_factory=OrderedDict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(
+        self, model_hash: str, values: ImpactModelParamsValues, *options: Hashable
+    ) -> Optional[Tuple]:
+        """
+        Build the key of a computation.
+        :param model_hash: hash of the impact model.
+        :param values: values of the parameters.
+        :param options: options of the computation changing its result.
+        :return: the key, or None if the computation must not be cached.
+        """
+        size = max((len(value) for _, value in values.items()), default=1)
+        if self.max_entries <= 0 or size > self.max_samples:
+            return None
+        return (model_hash, values_digest(values), *options)
+
+    def get(self, key: Optional[Tuple]) -> Optional[Any]:
+        """
+        Get a cached result, counting a hit or a miss.
+        :param key: key of the computation, as given by key method.
+        :return: cached result, or None if not cached.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Optional[Tuple], result: Any):
+        """
+        Cache a result, evicting least recently used results beyond max_entries.
+        :param key: key of the computation, as given by key method.
+        :param result: result to cache.
+        """
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all cached results.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the usage statistics of the cache.
+        :return: a dict with the number of entries, hits and misses.
+        """
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+scores_cache = ScoresCache()
+"Cache shared by the whole process."
@@ -0,0 +1,156 @@
+"""
+This module contains the catalog of the impact models stored in a directory, used to
+list the models and their parameters without loading them each time.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+from apparun.impact_model import ImpactModel
+from apparun.logger import logger
+from apparun.registry import file_hash, model_registry
+
+
+class CatalogEntry(BaseModel):
+    """
+    Information about an impact model file, as recorded the last time it was
+    validated.
+    """
+
+    name: str
+    filepath: str
+    mtime_ns: int
+    file_size: int
+    file_hash: str
+    valid: bool
+    parameters: List[Dict] = []
+    "Parameters of the impact model, as given by ImpactModelParam's to_dict method."
+    error: Optional[str] = None
+    "Reason why the impact model is not valid."
+
+
+class ModelCatalog(BaseModel):
+    """
+    Index of the impact models of a directory. Each model is loaded and validated once,
+    then only loaded again if its file changed since the last refresh.
+    """
+
+    models_dir: str
+    _entries: Dict[str, CatalogEntry] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def entries(self) -> List[CatalogEntry]:
+        return list(self._entries.values())
+
+    def refresh(self):
+        """
+        Update the catalog with the current content of the models directory. Only the
+        files modified since the last refresh are validated again.
+        """
+        names = [
+            file.replace(".yaml", "")
+            for file in os.listdir(self.models_dir)
+            if file.endswith(".yaml")
+        ]
+        entries = {name: self.refresh_entry(name) for name in names}
+        with self._lock:
+            self._entries = {
+                name: entry for name, entry in entries.items() if entry is not None
+            }
+
+    def refresh_entry(self, name: str) -> Optional[CatalogEntry]:
+        """
+        Update the entry of an impact model, validating it again only if its file
+        changed since the last refresh.
+        :param name: name of the impact model.
+        :return: updated entry, or None if there is no such impact model.
+        """
+        filepath = os.path.join(self.models_dir, f"{name}.yaml")
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(name, None)
+            return None
+        entry = self._entries.get(name)
+        if (
+            entry is not None
+            and entry.mtime_ns == stat.st_mtime_ns
+            and entry.file_size == stat.st_size
+        ):
+            return entry
+        content_hash = file_hash(filepath)
+        if entry is not None and entry.file_hash == content_hash:
+            entry.mtime_ns = stat.st_mtime_ns
+            entry.file_size = stat.st_size
+            return entry
+        entry = self.validate_model(name, filepath, stat, content_hash)
+        with self._lock:
+            self._entries[name] = entry
+        return entry
+
+    @staticmethod
+    def validate_model(
+        name: str, filepath: str, stat: os.stat_result, content_hash: str
+    ) -> CatalogEntry:
+        """
+        Load an impact model to check it is valid, and record its parameters. The
+        model already loaded by the models registry is reused if its file didn't
+        change, otherwise the model is loaded lazily: its parameters and the
+        structure of its tree are validated, but its models are not parsed.
+        :param name: name of the impact model.
+        :param filepath: path of the impact model's YAML file.
+        :param stat: status of the file.
+        :param content_hash: hash of the file's content.
+        :return: entry of the impact model.
+        """
+        entry = CatalogEntry(
+            name=name,
+            filepath=filepath,
+            mtime_ns=stat.st_mtime_ns,
+            file_size=stat.st_size,
+            file_hash=content_hash,
+            valid=False,
+        )
+        try:
+            impact_model = model_registry.loaded(
+                filepath, content_hash
+            ) or ImpactModel.from_yaml(filepath, lazy=True)
+        except Exception as e:
+            entry.error = str(e) or type(e).__name__
+            logger.error(f"{name} is not a valid impact model.")
+            return entry
+        if impact_model is None:
+            entry.error = "Missing key in impact model"
+            logger.error(f"{name} is not a valid impact model.")
+            return entry
+        entry.valid = True
+        entry.parameters = [
+            parameter.to_dict() for parameter in impact_model.parameters
+        ]
+        return entry
+
+    def get_valid_models(self) -> List[str]:
+        """
+        Get the names of all the valid impact models, refreshing the catalog first.
+        :return: a list of all valid impact models.
+        """
+        self.refresh()
+        return [entry.name for entry in self.entries if entry.valid]
+
+    def get_model_params(self, name: str) -> Optional[List[Dict]]:
+        """
+        Get the parameters of an impact model, refreshing its entry first.
+        :param name: name of the impact model.
+        :return: a list of parameters required by the model, or None if the model
+        doesn't exist or is not valid.
+        """
+        entry = self.refresh_entry(name)
+        if entry is None or not entry.valid:
+            return None
+        return [dict(parameter) for parameter in entry.parameters]
@@ -0,0 +1,623 @@
+"""
+This module contains the classes used to compile the sympy expressions of an impact
+model into numpy functions. Compiled expressions are kept as numpy source code, so
+they can be saved alongside the impact model and loaded back without sympy.
+"""
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import keyword
+import math
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy
+import sympy
+from pydantic import BaseModel, model_validator
+from scipy import sparse
+from sympy import Expr
+from sympy.printing.numpy import NumPyPrinter
+
+ALLOWED_NUMPY_ATTRIBUTES = {
+    name for name in dir(numpy) if isinstance(getattr(numpy, name), numpy.ufunc)
+} | {"pi", "e", "inf", "nan", "select"}
+
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.USub,
+    ast.UAdd,
+    ast.Compare,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.Eq,
+    ast.NotEq,
+    ast.Call,
+    ast.keyword,
+    ast.Attribute,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Tuple,
+    ast.List,
+)
+
+
+class ModelPrinter(NumPyPrinter):
+    """
+    Numpy printer only emitting calls to numpy functions, so generated source code
+    can be checked against ALLOWED_NUMPY_ATTRIBUTES.
+    """
+
+    def __init__(self):
+        super().__init__({"fully_qualified_modules": True})
+
+    def _print_nested(self, function: str, args) -> str:
+        if len(args) == 1:
+            return self._print(args[0])
+        return f"numpy.{function}({self._print(args[0])}, {self._print_nested(function, args[1:])})"
+
+    def _print_Max(self, expr) -> str:
+        return self._print_nested("maximum", expr.args)
+
+    def _print_Min(self, expr) -> str:
+        return self._print_nested("minimum", expr.args)
+
+    def _print_Abs(self, expr) -> str:
+        return f"numpy.absolute({self._print(expr.args[0])})"
+
+
+def validate_source(source: str, variables: List[str]):
+    """
+    Check that a piece of source code is an arithmetic expression only made of
+    numbers, known variables and calls to numpy's universal functions. Raises a
+    ValueError otherwise.
+    :param source: source code of the expression.
+    :param variables: names of the variables the expression can use.
+    """
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Invalid compiled expression: {source}")
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(
+                f"Forbidden {type(node).__name__} in compiled expression: {source}"
+            )
+        if isinstance(node, ast.Call) and not isinstance(node.func, ast.Attribute):
+            raise ValueError(
+                f"Forbidden function call in compiled expression: {source}"
+            )
+        if isinstance(node, ast.Attribute) and (
+            not isinstance(node.value, ast.Name)
+            or node.value.id != "numpy"
+            or node.attr not in ALLOWED_NUMPY_ATTRIBUTES
+        ):
+            raise ValueError(f"Forbidden attribute in compiled expression: {source}")
+        if isinstance(node, ast.keyword) and node.arg != "default":
+            raise ValueError(f"Forbidden keyword in compiled expression: {source}")
+        if isinstance(node, ast.Constant) and not isinstance(
+            node.value, (bool, int, float, complex)
+        ):
+            raise ValueError(f"Forbidden constant in compiled expression: {source}")
+    attributes_bases = {
+        id(node.value) for node in ast.walk(tree) if isinstance(node, ast.Attribute)
+    }
+    unknown_names = sorted(
+        {
+            node.id
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Name)
+            and id(node) not in attributes_bases
+            and node.id not in variables
+        }
+    )
+    if unknown_names:
+        raise ValueError(
+            f"Unknown variables {unknown_names} in compiled expression: {source}"
+        )
+
+
+def sources_digest(models: List[Dict[str, str]], arguments: List[str]) -> str:
+    """
+    Get a digest of the expressions some models are compiled from, and of the
+    arguments they are compiled for. Compiled models saved with this digest are only
+    reused if the models and arguments they are loaded with have the same digest, so
+    edited models are compiled again.
+    :param models: models to compile, as strings, for each impact method.
+    :param arguments: names of the arguments of the compiled functions, in order.
+    :return: sha256 hex digest of the models and arguments.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            {"models": models, "arguments": list(arguments)}, sort_keys=True
+        ).encode()
+    ).hexdigest()
+
+
+class CompiledExprs(BaseModel):
+    """
+    One or several expressions compiled as a single numpy function. Intermediate
+    results, such as common subexpressions, are stored in assignments, and are
+    evaluated before the outputs.
+    """
+
+    arguments: List[str]
+    assignments: List[Tuple[str, str]] = []
+    outputs: List[str]
+    _function: Optional[Callable] = None
+
+    @model_validator(mode="after")
+    def validate_sources(self) -> CompiledExprs:
+        """
+        Check the compiled expressions only use numbers, known variables and numpy's
+        universal functions, so executing them is harmless.
+        """
+        variables = []
+        for name in self.arguments + [name for name, _ in self.assignments]:
+            if (
+                not name.isidentifier()
+                or keyword.iskeyword(name)
+                or name == "numpy"
+                or name in variables
+            ):
+                raise ValueError(
+                    f"Invalid variable name in compiled expressions: {name}"
+                )
+            variables.append(name)
+        known_variables = list(self.arguments)
+        for name, source in self.assignments:
+            validate_source(source, known_variables)
+            known_variables.append(name)
+        for source in self.outputs:
+            validate_source(source, known_variables)
+        return self
+
+    @staticmethod
+    def from_exprs(
+        exprs: List[Union[Expr, float]],
+        arguments: Optional[List[str]] = None,
+        cse: bool = False,
+    ) -> CompiledExprs:
+        """
+        Compile sympy expressions.
+        :param exprs: expressions to compile.
+        :param arguments: names of the arguments of the compiled function. If None,
+        free symbols of the expressions are used, sorted by name.
+        :param cse: if True, common subexpressions are eliminated and only computed
+        once.
+        :return: compiled expressions.
+        """
+        exprs = [sympy.sympify(expr) for expr in exprs]
+        if arguments is None:
+            arguments = sorted(
+                {str(symbol) for expr in exprs for symbol in expr.free_symbols}
+            )
+        assignments = []
+        if cse:
+            prefix = "_cse"
+            while any(argument.startswith(prefix) for argument in arguments):
+                prefix = f"_{prefix}"
+            replacements, exprs = sympy.cse(
+                exprs, symbols=sympy.numbered_symbols(prefix)
+            )
+            assignments = [
+                (str(symbol), ModelPrinter().doprint(replacement))
+                for symbol, replacement in replacements
+            ]
+        return CompiledExprs(
+            arguments=list(arguments),
+            assignments=assignments,
+            outputs=[ModelPrinter().doprint(expr) for expr in exprs],
+        )
+
+    @property
+    def source(self) -> str:
+        """
+        Source code of the compiled function.
+        :return: source code of a python function.
+        """
+        lines = [f"def compiled_exprs({', '.join(self.arguments)}):"]
+        lines += [f"    {name} = {source}" for name, source in self.assignments]
+        lines.append(
+            f"    return ({''.join(f'{output}, ' for output in self.outputs)})"
+        )
+        return "\n".join(lines)
+
+    @property
+    def function(self) -> Callable:
+        """
+        Compiled function, built from source code at first access.
+        :return: a function taking the arguments in order, and returning a tuple of
+        outputs.
+        """
+        if self._function is None:
+            namespace = {"numpy": numpy, "__builtins__": {}}
+            exec(compile(self.source, "<compiled_exprs>", "exec"), namespace)
+            self._function = namespace["compiled_exprs"]
+        return self._function
+
+    def __call__(self, **params) -> Tuple:
+        """
+        Evaluate the compiled expressions.
+        :param params: value, or array of values, of each argument. Extra params are
+        ignored.
+        :return: a tuple with the value of each output.
+        """
+        return self.function(*[params[argument] for argument in self.arguments])
+
+    def __getstate__(self) -> Dict:
+        state = super().__getstate__()
+        state["__pydantic_private__"] = {
+            **state["__pydantic_private__"],
+            "_function": None,
+        }
+        return state
+
+
+class CompiledModel(CompiledExprs):
+    """
+    A single impact model compiled as a numpy function.
+    """
+
+    @staticmethod
+    def from_expr(
+        expr: Union[Expr, float], arguments: Optional[List[str]] = None
+    ) -> CompiledModel:
+        """
+        Compile a sympy expression.
+        :param expr: expression to compile.
+        :param arguments: names of the arguments of the compiled function. If None,
+        free symbols of the expression are used, sorted by name.
+        :return: compiled model.
+        """
+        compiled_exprs = CompiledExprs.from_exprs([expr], arguments)
+        return CompiledModel(
+            arguments=compiled_exprs.arguments, outputs=compiled_exprs.outputs
+        )
+
+    @staticmethod
+    def from_source(source: str, arguments: List[str]) -> CompiledModel:
+        """
+        Load a compiled model from its source code, as given by the expression
+        attribute.
+        :param source: numpy source code of the model.
+        :param arguments: names of the arguments of the compiled function.
+        :return: compiled model.
+        """
+        return CompiledModel(arguments=arguments, outputs=[source])
+
+    @property
+    def expression(self) -> str:
+        return self.outputs[0]
+
+    def __call__(self, **params) -> Union[float, numpy.ndarray]:
+        return super().__call__(**params)[0]
+
+
+class LambdifiedExprs(BaseModel):
+    """
+    Expressions whose numpy source code is rejected by validate_source, such as the
+    ones using functions numpy has no universal function for (factorial, erf...).
+    They are evaluated with functions built by sympy's lambdify, which rely on scipy
+    when needed, or one sample at a time if their functions have no array
+    equivalent. Unlike compiled expressions, they are not saved as source code.
+    """
+
+    arguments: List[str]
+    exprs: List[Expr]
+    _functions: Optional[List[Callable]] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def functions(self) -> List[Callable]:
+        """
+        Function of each expression, lambdified at first access.
+        :return: a function taking the arguments in order for each expression.
+        """
+        if self._functions is None:
+            self._functions = [
+                sympy.lambdify(self.arguments, expr) for expr in self.exprs
+            ]
+        return self._functions
+
+    def evaluate(
+        self, index: int, values: List[Union[float, numpy.ndarray]]
+    ) -> Union[float, numpy.ndarray]:
+        """
+        Evaluate an expression.
+        :param index: index of the expression.
+        :param values: value, or array of values, of each argument, in order.
+        :return: value, or array of values, of the expression.
+        """
+        try:
+            return self.functions[index](*values)
+        except (NameError, TypeError, ValueError):
+            # Functions with no numpy nor scipy equivalent are evaluated one sample
+            # at a time
+            expr = self.exprs[index]
+            symbols = {str(symbol): symbol for symbol in expr.free_symbols}
+            result = numpy.vectorize(
+                lambda *sample: float(
+                    expr.evalf(
+                        subs={
+                            symbols[argument]: value
+                            for argument, value in zip(self.arguments, sample)
+                            if argument in symbols
+                        }
+                    )
+                ),
+                otypes=[numpy.float64],
+            )(*values)
+            return result[()] if result.ndim == 0 else result
+
+    def __call__(self, **params) -> Tuple:
+        """
+        Evaluate the expressions.
+        :param params: value, or array of values, of each argument. Extra params are
+        ignored.
+        :return: a tuple with the value of each expression.
+        """
+        values = [params[argument] for argument in self.arguments]
+        return tuple(self.evaluate(index, values) for index in range(len(self.exprs)))
+
+    def __getstate__(self) -> Dict:
+        state = super().__getstate__()
+        state["__pydantic_private__"] = {
+            **state["__pydantic_private__"],
+            "_functions": None,
+        }
+        return state
+
+
+class LambdifiedModel(LambdifiedExprs):
+    """
+    A single impact model evaluated with a lambdified function, as its numpy source
+    code is rejected, see LambdifiedExprs.
+    """
+
+    @staticmethod
+    def from_expr(
+        expr: Union[Expr, float], arguments: Optional[List[str]] = None
+    ) -> LambdifiedModel:
+        """
+        Lambdify a sympy expression.
+        :param expr: expression to lambdify.
+        :param arguments: names of the arguments of the function. If None, free
+        symbols of the expression are used, sorted by name.
+        :return: lambdified model.
+        """
+        expr = sympy.sympify(expr)
+        if arguments is None:
+            arguments = sorted(str(symbol) for symbol in expr.free_symbols)
+        return LambdifiedModel(arguments=list(arguments), exprs=[expr])
+
+    @property
+    def expression(self) -> str:
+        """
+        Lambdified models have no numpy source code, their expression is empty so
+        they are compiled again from the model when loaded, see compile_model.
+        """
+        return ""
+
+    def __call__(self, **params) -> Union[float, numpy.ndarray]:
+        return super().__call__(**params)[0]
+
+
+def compile_model(
+    expr: Union[Expr, float], arguments: Optional[List[str]] = None
+) -> Union[CompiledModel, LambdifiedModel]:
+    """
+    Compile a sympy expression as numpy code, or lambdify it if it can't be printed
+    as numpy code, or if its numpy source code is rejected by validate_source, see
+    LambdifiedModel.
+    :param expr: expression to compile.
+    :param arguments: names of the arguments of the compiled function. If None,
+    free symbols of the expression are used, sorted by name.
+    :return: compiled, or lambdified, model.
+    """
+    try:
+        return CompiledModel.from_expr(expr, arguments)
+    except (ValueError, NotImplementedError):
+        return LambdifiedModel.from_expr(expr, arguments)
+
+
+def terms_upper_bound(expr: Expr) -> int:
+    """
+    Bound the number of terms of an expression once expanded, without expanding it.
+    :param expr: expression to bound the number of terms of.
+    :return: an upper bound of the number of terms.
+    """
+    if expr.is_Add:
+        return sum(terms_upper_bound(arg) for arg in expr.args)
+    if expr.is_Mul:
+        return math.prod(terms_upper_bound(arg) for arg in expr.args)
+    if expr.is_Pow and expr.exp.is_Integer and expr.exp > 0:
+        exponent = int(expr.exp)
+        return math.comb(terms_upper_bound(expr.base) + exponent - 1, exponent)
+    return 1
+
+
+def polynomial_terms(
+    expr: Union[Expr, float], arguments: List[str], max_terms: int
+) -> Optional[Dict[Tuple[int, ...], float]]:
+    """
+    Get the terms of an expression which is a polynomial of the arguments, with
+    numeric coefficients, in expanded form. Expressions which would have to be
+    expanded, such as products of sums, are not polynomials in this sense: expanding
+    products of differences like (a - b)**2 gives large terms of opposite signs,
+    whose sum loses the precision of the factored form.
+    :param expr: expression to get the terms of.
+    :param arguments: names of the arguments.
+    :param max_terms: maximum number of terms of the polynomial.
+    :return: coefficient of each monomial, as a tuple of the indices of its
+    arguments, sorted and repeated according to their power. None if the expression
+    is not an expanded polynomial of the arguments, or has more than max_terms terms.
+    """
+    expr = sympy.sympify(expr)
+    gens = sorted(expr.free_symbols, key=str)
+    if any(str(gen) not in arguments for gen in gens):
+        return None
+    if terms_upper_bound(expr) > max_terms or not expr.is_polynomial(*gens):
+        return None
+    if expr != sympy.expand(expr):
+        return None
+    if len(gens) == 0:
+        terms = [((), expr)]
+    else:
+        terms = sympy.Poly(expr, *gens).terms()
+    indices = [arguments.index(str(gen)) for gen in gens]
+    polynomial = {}
+    for exponents, coefficient in terms:
+        try:
+            coefficient = float(coefficient)
+        except TypeError:
+            return None
+        monomial = tuple(
+            sorted(
+                index
+                for index, exponent in zip(indices, exponents)
+                for _ in range(exponent)
+            )
+        )
+        polynomial[monomial] = polynomial.get(monomial, 0.0) + coefficient
+    return polynomial
+
+
+class PolynomialExprs(BaseModel):
+    """
+    Expressions which are polynomials of their arguments, evaluated as the product of
+    their coefficients matrix with the matrix of the values of their monomials. For
+    large numbers of samples, the product is computed by BLAS, and each monomial is
+    only computed once for all the expressions.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    arguments: List[str]
+    "Names of the arguments."
+    monomials: List[Tuple[int, ...]]
+    "Indices of the arguments of each monomial, repeated according to their power."
+    coefficients: Union[numpy.ndarray, sparse.csr_matrix]
+    "Dense or sparse (expressions, monomials) matrix of the coefficients."
+
+    @staticmethod
+    def from_polynomials(
+        polynomials: List[Dict[Tuple[int, ...], float]],
+        arguments: List[str],
+        max_density: float = 0.05,
+    ) -> PolynomialExprs:
+        """
+        Build the coefficients matrix of polynomials.
+        :param polynomials: coefficient of each monomial of each expression, as given
+        by polynomial_terms.
+        :param arguments: names of the arguments.
+        :param max_density: coefficients matrix is sparse if the proportion of its
+        non zero coefficients is at most max_density. Dense products are computed by
+        BLAS, which is about twenty times faster per coefficient than sparse ones.
+        :return: constructed PolynomialExprs.
+        """
+        monomials = sorted(
+            {monomial for polynomial in polynomials for monomial in polynomial},
+            key=lambda monomial: (len(monomial), monomial),
+        )
+        monomials_index = {monomial: index for index, monomial in enumerate(monomials)}
+        rows, columns, coefficients = [], [], []
+        for row, polynomial in enumerate(polynomials):
+            for monomial, coefficient in polynomial.items():
+                rows.append(row)
+                columns.append(monomials_index[monomial])
+                coefficients.append(coefficient)
+        matrix = sparse.csr_matrix(
+            (coefficients, (rows, columns)),
+            shape=(len(polynomials), len(monomials)),
+        )
+        if matrix.nnz > max_density * len(polynomials) * len(monomials):
+            matrix = matrix.toarray()
+        return PolynomialExprs(
+            arguments=list(arguments),
+            monomials=monomials,
+            coefficients=matrix,
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Convert self to dict, with the non zero coefficients only.
+        :return: self as a dict
+        """
+        coefficients = sparse.coo_matrix(self.coefficients)
+        return {
+            "arguments": list(self.arguments),
+            "monomials": [list(monomial) for monomial in self.monomials],
+            "sparse": sparse.issparse(self.coefficients),
+            "shape": list(coefficients.shape),
+            "rows": coefficients.row.tolist(),
+            "columns": coefficients.col.tolist(),
+            "coefficients": coefficients.data.tolist(),
+        }
+
+    @staticmethod
+    def from_dict(polynomial_exprs: dict) -> PolynomialExprs:
+        """
+        Convert dict to PolynomialExprs object.
+        :param polynomial_exprs: dict as returned by to_dict.
+        :return: constructed PolynomialExprs.
+        """
+        matrix = sparse.csr_matrix(
+            (
+                polynomial_exprs["coefficients"],
+                (polynomial_exprs["rows"], polynomial_exprs["columns"]),
+            ),
+            shape=tuple(polynomial_exprs["shape"]),
+            dtype=numpy.float64,
+        )
+        return PolynomialExprs(
+            arguments=polynomial_exprs["arguments"],
+            monomials=[tuple(monomial) for monomial in polynomial_exprs["monomials"]],
+            coefficients=matrix if polynomial_exprs["sparse"] else matrix.toarray(),
+        )
+
+    def monomials_values(self, size: int, **params) -> numpy.ndarray:
+        """
+        Compute the value of each monomial. Monomials sharing the same leading
+        arguments reuse their product.
+        :param size: number of samples.
+        :param params: value, or array of values, of each argument.
+        :return: an array of shape (monomials, size).
+        """
+        arguments_values = [params[argument] for argument in self.arguments]
+        products = {(): 1.0}
+        values = numpy.empty((len(self.monomials), size))
+        for monomial_index, monomial in enumerate(self.monomials):
+            for length in range(1, len(monomial) + 1):
+                if monomial[:length] not in products:
+                    products[monomial[:length]] = (
+                        products[monomial[: length - 1]]
+                        * arguments_values[monomial[length - 1]]
+                    )
+            values[monomial_index] = products[monomial]
+        return values
+
+    def __call__(self, size: int, **params) -> numpy.ndarray:
+        """
+        Evaluate the expressions.
+        :param size: number of samples.
+        :param params: value, or array of values, of each argument. Extra params are
+        ignored.
+        :return: an array of shape (expressions, size).
+        """
+        return numpy.asarray(self.coefficients @ self.monomials_values(size, **params))
@@ -0,0 +1,402 @@
+"""
+This module contains the binary container format of impact models. A container is a
+single file holding the metadata, parameters and tree of an impact model. Tree
+topology is stored as flat arrays, such as the index of each node's parent, and the
+names, amounts, properties and models of the nodes as string tables. Sections are
+aligned, so the file can be memory-mapped: arrays are numpy views of the mapping,
+whose pages are shared by all the processes loading the same file. Models, and
+compiled models, stay in the mapping until they are needed.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel, PrivateAttr
+from sympy import Expr
+
+from apparun.codegen import CompiledModel, LambdifiedModel, compile_model
+from apparun.exceptions import InvalidContainerError
+from apparun.impact_tree import ImpactTreeNode, LazyModels
+from apparun.tree_node import NodeProperties
+
+MAGIC = b"APPARUN\0"
+VERSION = 1
+PREAMBLE = struct.Struct("<8sIIQ")
+"Magic bytes, version, reserved bytes and size of the JSON header."
+ALIGNMENT = 64
+
+
+class StringTable(BaseModel):
+    """
+    Strings stored as a single UTF-8 blob, with the offset of each string in the
+    blob. Strings are decoded at access.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    offsets: np.ndarray
+    "Offset of each string in blob, followed by the size of blob."
+    blob: np.ndarray
+    "Concatenated UTF-8 encoded strings."
+
+    @staticmethod
+    def encode(strings: List[str]) -> StringTable:
+        """
+        Build a string table.
+        :param strings: strings to store.
+        :return: constructed string table.
+        """
+        encoded = [string.encode() for string in strings]
+        return StringTable(
+            offsets=np.concatenate(
+                [[0], np.cumsum([len(string) for string in encoded], dtype=np.int64)]
+            ).astype(np.int64),
+            blob=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return (
+            self.blob[self.offsets[index] : self.offsets[index + 1]].tobytes().decode()
+        )
+
+
+class ContainerModels(LazyModels):
+    """
+    Impact models of a node stored in a container, mapping impact methods' name with
+    the model's index in the container's models table. Models are only decoded from
+    the memory mapping, and parsed, at first access.
+    """
+
+    def __init__(self, models: Dict[str, int], table: StringTable):
+        super().__init__(models)
+        self.table = table
+
+    def __getitem__(self, method: str) -> Expr:
+        model = dict.__getitem__(self, method)
+        if isinstance(model, int):
+            dict.__setitem__(self, method, self.table[model])
+        return super().__getitem__(method)
+
+    def raw_models(self) -> Dict[str, str]:
+        return {
+            method: self.table[model] if isinstance(model, int) else str(model)
+            for method, model in dict.items(self)
+        }
+
+    def copy(self) -> ContainerModels:
+        return ContainerModels(dict(dict.items(self)), self.table)
+
+
+class ContainerCompiledModels(dict):
+    """
+    Compiled models of a node stored in a container, mapping impact methods' name
+    with the model's index in the container's compiled models table. Each compiled
+    model is only decoded, and its source checked, at first access. Lambdified models
+    have no source, they are compiled again from the node's model.
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, int],
+        table: StringTable,
+        arguments: List[str],
+        node_models: ContainerModels,
+    ):
+        super().__init__(models)
+        self.table = table
+        self.arguments = arguments
+        self.node_models = node_models
+
+    def __getitem__(self, method: str) -> Union[CompiledModel, LambdifiedModel]:
+        model = super().__getitem__(method)
+        if isinstance(model, int):
+            source = self.table[model]
+            model = (
+                CompiledModel.from_source(source, self.arguments)
+                if source
+                else compile_model(self.node_models[method], self.arguments)
+            )
+            super().__setitem__(method, model)
+        return model
+
+    def __iter__(self) -> Iterator[str]:
+        # Overriding __iter__ makes dict(...) get values through __getitem__
+        return super().__iter__()
+
+    def get(
+        self,
+        method: str,
+        default: Optional[Union[CompiledModel, LambdifiedModel]] = None,
+    ) -> Optional[Union[CompiledModel, LambdifiedModel]]:
+        return self[method] if method in self else default
+
+    def values(self) -> List[Union[CompiledModel, LambdifiedModel]]:
+        return [self[method] for method in self]
+
+    def items(self) -> List[Tuple[str, Union[CompiledModel, LambdifiedModel]]]:
+        return [(method, self[method]) for method in self]
+
+
+class ModelContainer(BaseModel):
+    """
+    Read access to an impact model binary container, through a read-only memory
+    mapping of the file. Mapping is closed when the container and all the arrays
+    and trees built from it are garbage collected, or by close method once they are
+    released.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    filepath: str
+    "Path of the container."
+    header: Dict[str, Any]
+    "Header of the container, giving the position of each section."
+    _mmap: Optional[mmap.mmap] = PrivateAttr(default=None)
+
+    @staticmethod
+    def write(
+        filepath: str,
+        metadata: Dict,
+        parameters: List[Dict],
+        tree: ImpactTreeNode,
+        symbols: Optional[Tuple[str, ...]] = None,
+        tree_evaluator: Optional[Dict] = None,
+    ):
+        """
+        Write an impact model as a binary container.
+        :param filepath: path of the container to create.
+        :param metadata: impact model's metadata, as a dict.
+        :param parameters: impact model's parameters, as a list of dicts.
+        :param tree: root node of impact model's tree.
+        :param symbols: if not None, models compiled as numpy functions of these
+        symbols are stored, so they can be loaded without being parsed and compiled.
+        :param tree_evaluator: if not None, compiled evaluator of the whole tree, as a
+        dict, see TreeEvaluator's to_dict method.
+        """
+        nodes = tree.unnested_descendants
+        methods = []
+        models_index, models_methods, models, compiled_models = [0], [], [], []
+        for node in nodes:
+            raw_models = (
+                node.models.raw_models()
+                if isinstance(node.models, LazyModels)
+                else {str(method): str(model) for method, model in node.models.items()}
+            )
+            node_compiled_models = (
+                node.compiled_models(symbols) if symbols is not None else {}
+            )
+            for method, model in raw_models.items():
+                if method not in methods:
+                    methods.append(method)
+                models_methods.append(methods.index(method))
+                models.append(model)
+                if symbols is not None:
+                    compiled_models.append(node_compiled_models[method].expression)
+            models_index.append(len(models))
+        sections = {
+            "metadata": np.frombuffer(
+                json.dumps(metadata, default=str).encode(), dtype=np.uint8
+            ),
+            "parameters": np.frombuffer(
+                json.dumps(parameters, default=str).encode(), dtype=np.uint8
+            ),
+            "parents": tree.unnested_parents,
+            "models_index": np.array(models_index, dtype=np.int64),
+            "models_methods": np.array(models_methods, dtype=np.int32),
+        }
+        if tree_evaluator is not None:
+            sections["tree_evaluator"] = np.frombuffer(
+                json.dumps(tree_evaluator).encode(), dtype=np.uint8
+            )
+        for name, strings in [
+            ("names", [node.name for node in nodes]),
+            ("amounts", [str(node.amount) for node in nodes]),
+            (
+                "properties",
+                [json.dumps(node.properties.properties) for node in nodes],
+            ),
+            ("models", models),
+        ] + ([("compiled_models", compiled_models)] if symbols is not None else []):
+            table = StringTable.encode(strings)
+            sections[f"{name}_offsets"] = table.offsets
+            sections[f"{name}_blob"] = table.blob
+
+        header = {
+            "methods": methods,
+            "arguments": list(symbols) if symbols is not None else None,
+            "sections": {},
+        }
+        offset = 0
+        for name, array in sections.items():
+            header["sections"][name] = {
+                "offset": offset,
+                "dtype": array.dtype.str,
+                "count": len(array),
+            }
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        encoded_header = json.dumps(header).encode()
+        data_offset = -(-(PREAMBLE.size + len(encoded_header)) // ALIGNMENT) * ALIGNMENT
+        with open(filepath, "wb") as stream:
+            stream.write(PREAMBLE.pack(MAGIC, VERSION, 0, len(encoded_header)))
+            stream.write(encoded_header)
+            for name, array in sections.items():
+                stream.seek(data_offset + header["sections"][name]["offset"])
+                stream.write(np.ascontiguousarray(array).tobytes())
+            stream.truncate(data_offset + offset)
+
+    @staticmethod
+    def open(filepath: str) -> ModelContainer:
+        """
+        Memory-map a binary container, and read its header.
+        :param filepath: path of the container.
+        :return: the container.
+        """
+        with open(filepath, "rb") as stream:
+            try:
+                mapping = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise InvalidContainerError(filepath, "empty file")
+        if len(mapping) < PREAMBLE.size:
+            raise InvalidContainerError(filepath, "truncated file")
+        magic, version, _, header_size = PREAMBLE.unpack_from(mapping)
+        if magic != MAGIC:
+            raise InvalidContainerError(filepath, "not an impact model container")
+        if version != VERSION:
+            raise InvalidContainerError(filepath, f"unsupported version {version}")
+        try:
+            header = json.loads(
+                mapping[PREAMBLE.size : PREAMBLE.size + header_size].decode()
+            )
+        except ValueError:
+            raise InvalidContainerError(filepath, "invalid header")
+        header["data_offset"] = (
+            -(-(PREAMBLE.size + header_size) // ALIGNMENT) * ALIGNMENT
+        )
+        container = ModelContainer(filepath=filepath, header=header)
+        container._mmap = mapping
+        return container
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Get a section of the container, without copying it.
+        :param name: name of the section.
+        :return: a read-only array, view of the memory mapping.
+        """
+        section = self.header["sections"][name]
+        try:
+            return np.frombuffer(
+                self._mmap,
+                dtype=np.dtype(section["dtype"]),
+                count=section["count"],
+                offset=self.header["data_offset"] + section["offset"],
+            )
+        except ValueError:
+            raise InvalidContainerError(self.filepath, f"truncated section {name}")
+
+    def strings(self, name: str) -> StringTable:
+        """
+        Get a string table of the container, without decoding its strings.
+        :param name: name of the string table.
+        :return: the string table.
+        """
+        return StringTable.model_construct(
+            offsets=self.array(f"{name}_offsets"), blob=self.array(f"{name}_blob")
+        )
+
+    @property
+    def metadata(self) -> Dict:
+        return json.loads(self.array("metadata").tobytes().decode())
+
+    @property
+    def parameters(self) -> List[Dict]:
+        return json.loads(self.array("parameters").tobytes().decode())
+
+    @property
+    def parents(self) -> np.ndarray:
+        return self.array("parents")
+
+    @property
+    def tree_evaluator(self) -> Optional[Dict]:
+        """
+        Compiled evaluator of the whole tree, if the container holds one.
+        :return: the evaluator as a dict, see TreeEvaluator's from_dict method, or
+        None.
+        """
+        if "tree_evaluator" not in self.header["sections"]:
+            return None
+        return json.loads(self.array("tree_evaluator").tobytes().decode())
+
+    def to_tree(self) -> ImpactTreeNode:
+        """
+        Build the tree stored in the container. Nodes are built without validation.
+        Their names, amounts and properties are decoded when building the tree, and
+        amounts are only parsed at first access. Models, and compiled models if the
+        container holds some, are only decoded at first access, see ContainerModels
+        and ContainerCompiledModels.
+        :return: root node of the tree.
+        """
+        parents = self.parents
+        if len(parents) == 0 or not np.all(
+            (parents > np.arange(len(parents))) | (parents == -1)
+        ):
+            raise InvalidContainerError(self.filepath, "invalid tree topology")
+        names, amounts = self.strings("names"), self.strings("amounts")
+        properties, models = self.strings("properties"), self.strings("models")
+        models_index = self.array("models_index").tolist()
+        models_methods = self.array("models_methods").tolist()
+        methods = self.header["methods"]
+        arguments = self.header["arguments"]
+        compiled_models = (
+            self.strings("compiled_models") if arguments is not None else None
+        )
+        nodes = []
+        for node_index in range(len(parents)):
+            node_models = {
+                methods[models_methods[model_index]]: model_index
+                for model_index in range(
+                    models_index[node_index], models_index[node_index + 1]
+                )
+            }
+            node = ImpactTreeNode.model_construct(
+                name=names[node_index],
+                models=ContainerModels(node_models, models),
+                children=[],
+                properties=NodeProperties.model_construct(
+                    properties=json.loads(properties[node_index])
+                ),
+                amount=amounts[node_index],
+            )
+            if compiled_models is not None:
+                node._compiled_models[tuple(arguments)] = ContainerCompiledModels(
+                    node_models, compiled_models, arguments, node.models
+                )
+            nodes.append(node)
+        for node, parent in zip(nodes, parents.tolist()):
+            if parent >= 0:
+                node.parent = nodes[parent]
+                nodes[parent].children.append(node)
+        return nodes[-1]
+
+    def close(self):
+        """
+        Close the memory mapping. Arrays, string tables and trees built from the
+        container must have been released, otherwise a BufferError is raised.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> ModelContainer:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
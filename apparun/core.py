@@ -1,11 +1,13 @@
 import os
 import time
 from functools import wraps
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 
 from apparun import results
+from apparun.catalog import ModelCatalog
 from apparun.impact_model import ImpactModel
 from apparun.logger import logger
+from apparun.registry import model_registry
 from apparun.results import get_result
 
 APPARUN_IMPACT_MODELS_DIR = os.environ.get("APPARUN_IMPACT_MODELS_DIR")
@@ -13,6 +15,8 @@ if APPARUN_IMPACT_MODELS_DIR is None:
     logger.error("Environment variable APPARUN_IMPACT_MODELS_DIR is undefined")
     exit(1)
 
+model_catalog = ModelCatalog(models_dir=APPARUN_IMPACT_MODELS_DIR)
+
 
 def execution_time_logging(func):
     """
@@ -38,8 +42,9 @@ def compute_impacts(
     impact_model_name: str, params: Dict, all_nodes: bool = False
 ) -> Union[List, Dict[str, Union[float, List[float]]]]:
     """
-    Load an impact model from disk from its name, and get impact scores of the root node
-    for each impact method, according to the parameters.
+    Get an impact model from its name, and get impact scores of the root node for each
+    impact method, according to the parameters. Impact model is only loaded from disk
+    if it is not in the models registry yet, or if its file changed.
     APPARUN_IMPACT_MODELS_DIR environment variable should be specified (see README.md).
     :param impact_model_name: name of the impact model to load
     :param params: value, or list of values of the impact model's parameters.
@@ -49,7 +54,7 @@ def compute_impacts(
     otherwise (default).
     :return: a dict mapping impact names and corresponding score, or list of scores.
     """
-    impact_model = ImpactModel.from_yaml(
+    impact_model = model_registry.get(
         os.path.join(APPARUN_IMPACT_MODELS_DIR, f"{impact_model_name}.yaml")
     )
 
@@ -58,24 +63,51 @@ def compute_impacts(
     return dict(impact_model.get_scores(**params))
 
 
+@execution_time_logging
+def compute_impacts_batch(
+    jobs: List[Tuple[str, Dict]], all_nodes: bool = False
+) -> List[Union[List, Dict[str, Union[float, List[float]]]]]:
+    """
+    Get impact scores for several impact models and sets of parameters at once. Jobs
+    sharing the same impact model are computed with a single vectorized computation.
+    APPARUN_IMPACT_MODELS_DIR environment variable should be specified (see README.md).
+    :param jobs: name of the impact model and parameters values of each job, as given
+    to compute_impacts function.
+    :param all_nodes: if True, scores will be computed for each node. Only root node
+    otherwise (default).
+    :return: the scores of each job, in order.
+    """
+    jobs_by_model = {}
+    for index, (impact_model_name, _) in enumerate(jobs):
+        jobs_by_model.setdefault(impact_model_name, []).append(index)
+
+    scores = [None] * len(jobs)
+    for impact_model_name, indexes in jobs_by_model.items():
+        impact_model = model_registry.get(
+            os.path.join(APPARUN_IMPACT_MODELS_DIR, f"{impact_model_name}.yaml")
+        )
+        params_list = [jobs[index][1] for index in indexes]
+        if all_nodes:
+            model_scores = impact_model.get_nodes_scores_batch(params_list)
+        else:
+            model_scores = [
+                dict(lcia_scores)
+                for lcia_scores in impact_model.get_scores_batch(params_list)
+            ]
+        for index, job_scores in zip(indexes, model_scores):
+            scores[index] = job_scores
+    return scores
+
+
 @execution_time_logging
 def get_valid_models() -> List[str]:
     """
     Get a list of all valid impact models in the directory specified by
-    APPARUN_IMPACT_MODELS_DIR environment variable.
+    APPARUN_IMPACT_MODELS_DIR environment variable. Models are only validated again if
+    their file changed since the last call.
     :return: a list of all valid impact models.
     """
-    valid_impact_models = []
-    for file in os.listdir(APPARUN_IMPACT_MODELS_DIR):
-        if file.endswith(".yaml"):
-            try:
-                ImpactModel.from_yaml(os.path.join(APPARUN_IMPACT_MODELS_DIR, file))
-                valid_impact_models.append(file.replace(".yaml", ""))
-            except KeyError:
-                logger.error(
-                    f"{file.replace('.yaml', '')} is not a valid impact model."
-                )
-    return valid_impact_models
+    return model_catalog.get_valid_models()
 
 
 @execution_time_logging
@@ -86,7 +118,10 @@ def get_model_params(impact_model_name: str) -> List[Dict]:
     :param impact_model_name: name of the impact model to load.
     :return: a list of parameters required by the model.
     """
-    impact_model = ImpactModel.from_yaml(
+    parameters = model_catalog.get_model_params(impact_model_name)
+    if parameters is not None:
+        return parameters
+    impact_model = model_registry.get(
         os.path.join(APPARUN_IMPACT_MODELS_DIR, f"{impact_model_name}.yaml")
     )
     return [parameter.to_dict() for parameter in impact_model.parameters]
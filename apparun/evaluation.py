@@ -0,0 +1,409 @@
+"""
+This module contains the engine used to evaluate the models of all the nodes of an
+impact model tree at once.
+"""
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import sympy
+from pydantic import BaseModel
+from sympy import Expr
+
+from apparun.codegen import (
+    CompiledExprs,
+    LambdifiedExprs,
+    PolynomialExprs,
+    polynomial_terms,
+)
+from apparun.impact_tree import ImpactTreeNode
+from apparun.score import ArrayLCIAScores
+
+APPARUN_MAX_POLYNOMIAL_TERMS = int(os.environ.get("APPARUN_MAX_POLYNOMIAL_TERMS", 64))
+
+
+def derive(model: Union[Expr, float], parameter: str) -> Expr:
+    """
+    Get the partial derivative of a model with respect to a parameter.
+    :param model: model to derive.
+    :param parameter: name of the parameter.
+    :return: the derivative, 0 if the model doesn't depend on the parameter.
+    """
+    model = sympy.sympify(model)
+    symbols = [symbol for symbol in model.free_symbols if str(symbol) == parameter]
+    if len(symbols) == 0:
+        return sympy.Integer(0)
+    return sympy.diff(model, symbols[0])
+
+
+def compile_exprs(
+    exprs: Dict[Expr, List[Tuple[int, int]]], arguments: List[str]
+) -> Tuple[
+    CompiledExprs, List[List[Tuple[int, int]]], Dict[Expr, List[Tuple[int, int]]]
+]:
+    """
+    Compile expressions into a single numpy function, common subexpressions being
+    only computed once. Expressions which can't be compiled as numpy code, such as
+    the ones using functions numpy has no universal function for, are left out, so
+    they can be lambdified, and the others are still compiled together.
+    :param exprs: expressions to compile, with their positions in the scores array.
+    :param arguments: names of the compiled function's arguments, in order.
+    :return: compiled expressions, the positions of each compiled expression, and
+    the expressions left out with their positions.
+    """
+    try:
+        return (
+            CompiledExprs.from_exprs(list(exprs), arguments, cse=True),
+            list(exprs.values()),
+            {},
+        )
+    except (ValueError, NotImplementedError):
+        pass
+    compiled, rejected = {}, {}
+    for expr, positions in exprs.items():
+        try:
+            CompiledExprs.from_exprs([expr], arguments)
+            compiled[expr] = positions
+        except (ValueError, NotImplementedError):
+            rejected[expr] = positions
+    return (
+        CompiledExprs.from_exprs(list(compiled), arguments, cse=True),
+        list(compiled.values()),
+        rejected,
+    )
+
+
+class TreeEvaluator(BaseModel):
+    """
+    Evaluates the models of several tree nodes, for each impact method, with a single
+    numpy function. Identical models are only compiled once, and common
+    subexpressions across all models are only computed once, which matters as parent
+    nodes usually repeat their children's expressions. Models which are polynomials
+    of the parameters, such as most affine models, are evaluated as a single matrix
+    product instead.
+    """
+
+    nodes: List[str]
+    "Name of the evaluated nodes, in order."
+    methods: List[str]
+    "Name of the impact methods, in order."
+    compiled_exprs: CompiledExprs
+    "Compiled function returning each distinct model."
+    outputs: List[List[Tuple[int, int]]]
+    "Position (node index, method index) of each output in the scores array."
+    polynomial_exprs: Optional[PolynomialExprs] = None
+    "Polynomial models and sums of polynomial terms, evaluated as a matrix product."
+    polynomial_names: List[str] = []
+    "Name of each polynomial, as an argument of the compiled function."
+    polynomial_outputs: List[List[Tuple[int, int]]] = []
+    "Position of each polynomial in the scores array, if it is a model."
+    lambdified_exprs: Optional[LambdifiedExprs] = None
+    "Models which can't be compiled as numpy code, see LambdifiedExprs."
+    lambdified_outputs: List[List[Tuple[int, int]]] = []
+    "Position of each lambdified model in the scores array."
+
+    @staticmethod
+    def from_nodes(
+        nodes: List[ImpactTreeNode],
+        symbols: Tuple[str, ...],
+        substitutions: Optional[Dict[str, int]] = None,
+        max_polynomial_terms: int = APPARUN_MAX_POLYNOMIAL_TERMS,
+    ) -> TreeEvaluator:
+        """
+        Compile the models of the nodes into a single numpy function.
+        :param nodes: nodes to evaluate.
+        :param symbols: names of the compiled function's arguments, in order.
+        :param substitutions: constant value of some symbols, such as the dummies of
+        an enum option shared by all the samples to evaluate. Symbols are replaced by
+        their value before compilation, so the terms they cancel are not computed.
+        Substituted symbols remain arguments of the compiled function.
+        :param max_polynomial_terms: models which are polynomials of at most
+        max_polynomial_terms terms, in expanded form, are evaluated as a matrix
+        product, see polynomial_terms.
+        If 0, all the models are compiled as numpy code.
+        :return: constructed tree evaluator.
+        """
+        return TreeEvaluator.from_models(
+            [node.name for node in nodes],
+            [node.models for node in nodes],
+            symbols,
+            substitutions=substitutions,
+            max_polynomial_terms=max_polynomial_terms,
+        )
+
+    @staticmethod
+    def from_gradients(
+        nodes: List[ImpactTreeNode],
+        symbols: Tuple[str, ...],
+        parameters: Tuple[str, ...],
+    ) -> TreeEvaluator:
+        """
+        Compile the partial derivatives of the models of the nodes with respect to
+        some parameters into a single numpy function. Evaluated scores have a row for
+        each parameter and node, parameter by parameter.
+        :param nodes: nodes to evaluate the gradients of.
+        :param symbols: names of the compiled function's arguments, in order.
+        :param parameters: names of the parameters to derive the models by.
+        :return: constructed tree evaluator.
+        """
+        names, models = [], []
+        for parameter in parameters:
+            for node in nodes:
+                names.append(node.name)
+                models.append(
+                    {
+                        method: derive(model, parameter)
+                        for method, model in node.models.items()
+                    }
+                )
+        return TreeEvaluator.from_models(names, models, symbols)
+
+    @staticmethod
+    def from_models(
+        names: List[str],
+        models: List[Dict[str, Expr]],
+        symbols: Tuple[str, ...],
+        substitutions: Optional[Dict[str, int]] = None,
+        max_polynomial_terms: int = APPARUN_MAX_POLYNOMIAL_TERMS,
+    ) -> TreeEvaluator:
+        """
+        Compile models into a single numpy function, see from_nodes.
+        :param names: name of each row of the scores, such as nodes' name.
+        :param models: models of each row, for each impact method.
+        :param symbols: names of the compiled function's arguments, in order.
+        :param substitutions: constant value of some symbols.
+        :param max_polynomial_terms: models which are polynomials of at most
+        max_polynomial_terms terms, in expanded form, are evaluated as a matrix
+        product, see polynomial_terms.
+        :return: constructed tree evaluator.
+        """
+        methods = []
+        for row_models in models:
+            methods += [method for method in row_models if method not in methods]
+        exprs = {}
+        for node_index, row_models in enumerate(models):
+            for method, model in row_models.items():
+                if substitutions:
+                    model = model.xreplace(
+                        {
+                            symbol: sympy.Integer(substitutions[str(symbol)])
+                            for symbol in model.free_symbols
+                            if str(symbol) in substitutions
+                        }
+                    )
+                exprs.setdefault(model, []).append((node_index, methods.index(method)))
+        polynomials = {}
+        if max_polynomial_terms > 0:
+            for expr in exprs:
+                polynomial = polynomial_terms(expr, list(symbols), max_polynomial_terms)
+                if polynomial is not None:
+                    polynomials[expr] = polynomial
+        prefix = "_polynomial"
+        while any(symbol.startswith(prefix) for symbol in symbols):
+            prefix = f"_{prefix}"
+        polynomial_symbols = {
+            expr: sympy.Symbol(f"{prefix}{index}")
+            for index, expr in enumerate(polynomials)
+        }
+        polynomial_outputs = [exprs[expr] for expr in polynomials]
+        other_exprs = {}
+        for expr, positions in exprs.items():
+            if expr in polynomials:
+                continue
+            # Polynomial models are usually repeated in their parents' models, they
+            # are replaced by their value. Polynomial terms of a sum are also
+            # evaluated as a polynomial.
+            expr = expr.xreplace(polynomial_symbols)
+            if expr.is_Add and max_polynomial_terms > 0:
+                polynomial, other_args = {}, []
+                for arg in expr.args:
+                    arg_polynomial = polynomial_terms(
+                        arg, list(symbols), max_polynomial_terms
+                    )
+                    if arg_polynomial is None:
+                        other_args.append(arg)
+                        continue
+                    for monomial, coefficient in arg_polynomial.items():
+                        polynomial[monomial] = (
+                            polynomial.get(monomial, 0.0) + coefficient
+                        )
+                if (
+                    len(other_args) < len(expr.args) - 1
+                    and len(polynomial) <= max_polynomial_terms
+                ):
+                    name = sympy.Symbol(f"{prefix}{len(polynomials)}")
+                    polynomials[name] = polynomial
+                    polynomial_outputs.append([])
+                    expr = sympy.Add(name, *other_args)
+            other_exprs.setdefault(expr, []).extend(positions)
+        polynomial_names = [f"{prefix}{index}" for index in range(len(polynomials))]
+        arguments = list(symbols) + polynomial_names
+        compiled_exprs, outputs, lambdified_exprs = compile_exprs(
+            other_exprs, arguments
+        )
+        return TreeEvaluator(
+            nodes=names,
+            methods=methods,
+            compiled_exprs=compiled_exprs,
+            outputs=outputs,
+            polynomial_exprs=PolynomialExprs.from_polynomials(
+                list(polynomials.values()), list(symbols)
+            )
+            if len(polynomials) > 0
+            else None,
+            polynomial_names=polynomial_names,
+            polynomial_outputs=polynomial_outputs,
+            lambdified_exprs=LambdifiedExprs(
+                arguments=arguments, exprs=list(lambdified_exprs)
+            )
+            if len(lambdified_exprs) > 0
+            else None,
+            lambdified_outputs=list(lambdified_exprs.values()),
+        )
+
+    @property
+    def symbols(self) -> Tuple[str, ...]:
+        """
+        Names of the arguments of the evaluator, in order, polynomials excluded.
+        :return: a tuple of symbols names.
+        """
+        arguments = self.compiled_exprs.arguments
+        return tuple(arguments[: len(arguments) - len(self.polynomial_names)])
+
+    def to_dict(self) -> dict:
+        """
+        Convert self to dict, with the numpy source code of the compiled function, so
+        the evaluator can be loaded without parsing nor compiling the models.
+        Evaluators with lambdified models have no source code for them, and can't be
+        converted.
+        :return: self as a dict
+        """
+        if self.lambdified_exprs is not None:
+            raise ValueError("Tree evaluators with lambdified models can't be saved")
+        return {
+            "nodes": list(self.nodes),
+            "methods": list(self.methods),
+            "compiled_exprs": {
+                "arguments": list(self.compiled_exprs.arguments),
+                "assignments": [
+                    [name, source] for name, source in self.compiled_exprs.assignments
+                ],
+                "outputs": list(self.compiled_exprs.outputs),
+            },
+            "outputs": [
+                [list(position) for position in positions] for positions in self.outputs
+            ],
+            "polynomial_exprs": self.polynomial_exprs.to_dict()
+            if self.polynomial_exprs is not None
+            else None,
+            "polynomial_names": list(self.polynomial_names),
+            "polynomial_outputs": [
+                [list(position) for position in positions]
+                for positions in self.polynomial_outputs
+            ],
+        }
+
+    @staticmethod
+    def from_dict(tree_evaluator: dict) -> TreeEvaluator:
+        """
+        Convert dict to TreeEvaluator object. Source code of the compiled function is
+        checked, see CompiledExprs.
+        :param tree_evaluator: dict as returned by to_dict.
+        :return: constructed tree evaluator.
+        """
+        return TreeEvaluator(
+            nodes=tree_evaluator["nodes"],
+            methods=tree_evaluator["methods"],
+            compiled_exprs=CompiledExprs(**tree_evaluator["compiled_exprs"]),
+            outputs=tree_evaluator["outputs"],
+            polynomial_exprs=PolynomialExprs.from_dict(
+                tree_evaluator["polynomial_exprs"]
+            )
+            if tree_evaluator["polynomial_exprs"] is not None
+            else None,
+            polynomial_names=tree_evaluator["polynomial_names"],
+            polynomial_outputs=tree_evaluator["polynomial_outputs"],
+        )
+
+    @property
+    def mask(self) -> np.ndarray:
+        """
+        Tell which node has a model for which impact method.
+        :return: a boolean array of shape (nodes, methods).
+        """
+        mask = np.zeros((len(self.nodes), len(self.methods)), dtype=bool)
+        for positions in (
+            self.outputs + self.polynomial_outputs + self.lambdified_outputs
+        ):
+            for position in positions:
+                mask[position] = True
+        return mask
+
+    def evaluate(
+        self,
+        transformed_params: Dict[str, Union[float, np.ndarray]],
+        size: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Compute the scores of all the nodes, for each impact method.
+        :param transformed_params: parameters, transformed by ImpactModelParam's
+        transform method.
+        :param size: number of samples. If None, it is the size of the largest
+        parameter's array.
+        :return: an array of shape (nodes, methods, samples). Scores of the impact
+        methods a node has no model for are NaN.
+        """
+        if size is None:
+            size = max(
+                [np.size(value) for value in transformed_params.values()], default=1
+            )
+        scores = np.full((len(self.nodes), len(self.methods), size), np.nan)
+        if self.polynomial_exprs is not None:
+            polynomials = self.polynomial_exprs(size, **transformed_params)
+            for positions, result in zip(self.polynomial_outputs, polynomials):
+                for position in positions:
+                    scores[position] = result
+            transformed_params = {
+                **transformed_params,
+                **dict(zip(self.polynomial_names, polynomials)),
+            }
+        for positions, result in zip(
+            self.outputs, self.compiled_exprs(**transformed_params)
+        ):
+            for position in positions:
+                scores[position] = result
+        if self.lambdified_exprs is not None:
+            for positions, result in zip(
+                self.lambdified_outputs, self.lambdified_exprs(**transformed_params)
+            ):
+                for position in positions:
+                    scores[position] = result
+        return scores
+
+    def to_lcia_scores(
+        self, scores: np.ndarray, mask: Optional[np.ndarray] = None
+    ) -> List[ArrayLCIAScores]:
+        """
+        Split scores array into the LCIA scores of each node, for each impact method
+        the node has a model for.
+        :param scores: scores array, as returned by evaluate method.
+        :param mask: which row of scores has a score for which impact method, as a
+        boolean array of shape (rows, methods). If None, it is the evaluator's mask,
+        scores having a row for each node.
+        :return: LCIA scores of each row, in order.
+        """
+        if mask is None:
+            mask = self.mask
+        return [
+            ArrayLCIAScores(
+                methods=[
+                    method
+                    for method_index, method in enumerate(self.methods)
+                    if mask[row_index, method_index]
+                ],
+                values=scores[row_index, mask[row_index]],
+            )
+            for row_index in range(len(mask))
+        ]
@@ -22,3 +22,37 @@ class InvalidFileError(Exception):
 
     def __str__(self):
         return f"Impact categories from {self.file} different with impact model categories. Check correspondances."
+
+
+class ServiceOverloadedError(Exception):
+    """
+    Exception raised when the compute service's queue is full, and a request can't be
+    queued.
+    """
+
+    def __str__(self):
+        return "Compute service is overloaded, retry later."
+
+
+class ClientDisconnectedError(Exception):
+    """
+    Exception raised when the client of a request disconnected before its computation
+    ended.
+    """
+
+    def __str__(self):
+        return "Client disconnected before the end of the computation."
+
+
+class InvalidContainerError(Exception):
+    """
+    Exception raised when a file is not a valid impact model binary container.
+    """
+
+    def __init__(self, file: str, reason: str):
+        super().__init__()
+        self.file = file
+        self.reason = reason
+
+    def __str__(self):
+        return f"Invalid impact model container {self.file}: {self.reason}."
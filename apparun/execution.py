@@ -0,0 +1,181 @@
+"""
+This module contains the backends used to execute independent computations, such as
+the models of a node for each impact method, serially or in parallel.
+"""
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+BACKENDS = {}
+
+APPARUN_EXECUTION_BACKEND = os.environ.get("APPARUN_EXECUTION_BACKEND", "auto")
+
+
+def register_backend(backend_name):
+    """
+    This decorator registers a new ExecutionBackend class in BACKENDS registry.
+    :param backend_name: name of the new backend to register
+    :return: new ExecutionBackend class
+    """
+
+    def decorator(decorated_class):
+        if backend_name not in BACKENDS:
+            BACKENDS[backend_name] = decorated_class
+        return decorated_class
+
+    return decorator
+
+
+def get_backend(backend_name: str):
+    """
+    Get a registered ExecutionBackend class by name.
+    :param backend_name: registered name of the desired ExecutionBackend.
+    :return: registered ExecutionBackend class corresponding to the name.
+    """
+    return BACKENDS[backend_name]
+
+
+def registered_backends() -> List[str]:
+    """
+    Get a list of registered ExecutionBackend names.
+    :return: list of registered ExecutionBackend names.
+    """
+    return list(BACKENDS.keys())
+
+
+class ExecutionBackend(BaseModel, ABC):
+    """
+    Executes a function over several sets of arguments. Backends are meant to be
+    created once and reused, so their workers are not started on each call.
+    """
+
+    @abstractmethod
+    def map(
+        self, function: Callable, kwargs_list: List[Dict[str, Any]], size: int = 1
+    ) -> List[Any]:
+        """
+        Call a function once for each set of keyword arguments.
+        :param function: function to call.
+        :param kwargs_list: keyword arguments of each call.
+        :param size: number of samples computed by each call, used by backends
+        choosing how to execute calls according to their cost.
+        :return: the result of each call, in order.
+        """
+        raise NotImplementedError()
+
+    def shutdown(self):
+        """
+        Release the workers of the backend, if any.
+        """
+
+
+@register_backend("serial")
+class SerialBackend(ExecutionBackend):
+    """
+    Calls the function in the current thread, one call after the other.
+    """
+
+    def map(
+        self, function: Callable, kwargs_list: List[Dict[str, Any]], size: int = 1
+    ) -> List[Any]:
+        return [function(**kwargs) for kwargs in kwargs_list]
+
+
+class PoolBackend(ExecutionBackend):
+    """
+    Calls the function in a pool of workers, started at first use and shared by all
+    later calls.
+    """
+
+    max_workers: Optional[int] = None
+    "Number of workers. If None, executor's default is used."
+    _executor: Optional[Executor] = PrivateAttr(default=None)
+
+    @abstractmethod
+    def new_executor(self) -> Executor:
+        """
+        Create the pool of workers.
+        :return: the executor.
+        """
+        raise NotImplementedError()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self.new_executor()
+        return self._executor
+
+    def map(
+        self, function: Callable, kwargs_list: List[Dict[str, Any]], size: int = 1
+    ) -> List[Any]:
+        futures = [self.executor.submit(function, **kwargs) for kwargs in kwargs_list]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+@register_backend("thread")
+class ThreadBackend(PoolBackend):
+    """
+    Calls the function in a shared pool of threads. Numpy releases the GIL on large
+    arrays, so threads pay off when each call computes many samples.
+    """
+
+    def new_executor(self) -> Executor:
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+
+@register_backend("process")
+class ProcessBackend(PoolBackend):
+    """
+    Calls the function in a shared pool of processes. Function, arguments and results
+    must be picklable.
+    """
+
+    def new_executor(self) -> Executor:
+        return ProcessPoolExecutor(max_workers=self.max_workers)
+
+
+@register_backend("auto")
+class AutoBackend(ExecutionBackend):
+    """
+    Calls the function serially when calls are cheap, i.e. when there are few calls or
+    few samples per call, and in a shared pool of threads otherwise.
+    """
+
+    min_samples: int = 10000
+    "Minimum number of samples per call for calls to be made in parallel."
+    thread_backend: ThreadBackend = ThreadBackend()
+
+    def map(
+        self, function: Callable, kwargs_list: List[Dict[str, Any]], size: int = 1
+    ) -> List[Any]:
+        if len(kwargs_list) < 2 or size < self.min_samples:
+            return SerialBackend().map(function, kwargs_list, size)
+        return self.thread_backend.map(function, kwargs_list, size)
+
+    def shutdown(self):
+        self.thread_backend.shutdown()
+
+
+_default_backend: Optional[ExecutionBackend] = None
+
+
+def default_backend() -> ExecutionBackend:
+    """
+    Get the backend shared by the whole process, whose type is given by
+    APPARUN_EXECUTION_BACKEND environment variable.
+    :return: the default backend.
+    """
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = get_backend(APPARUN_EXECUTION_BACKEND)()
+    return _default_backend
@@ -7,7 +7,7 @@ from __future__ import annotations
 import math
 import re
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Any, Dict, List, Self, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Self, Union
 
 if TYPE_CHECKING:
     from apparun.parameters import ImpactModelParams
@@ -20,6 +20,7 @@ from pydantic_core import PydanticCustomError
 from pydantic_core.core_schema import ValidationInfo
 from sympy import Expr, sympify
 
+from apparun.codegen import CompiledModel
 from apparun.exceptions import InvalidExpr
 
 
@@ -192,11 +193,8 @@ class ParamsValuesSet(BaseModel):
                 "Impossible to evaluate the expressions since there is a dependency cycle between them"
             )
 
-        order = list(nx.topological_sort(self.dependencies_graph))
-        order += [name for name in self.expressions.keys() if name not in order]
-
         values = {}
-        for name in reversed(order):
+        for name in self.evaluation_order:
             deps_values = {
                 param_name: value
                 for param_name, value in values.items()
@@ -207,6 +205,37 @@ class ParamsValuesSet(BaseModel):
 
         return values
 
+    @property
+    def evaluation_order(self) -> List[str]:
+        """
+        Order in which the expressions must be evaluated, so that each expression is
+        evaluated after its dependencies. There must be no dependency cycle in the set.
+
+        :returns: the name of the parameters associated to the expressions, in order.
+        """
+        order = list(nx.topological_sort(self.dependencies_graph))
+        order += [name for name in self.expressions.keys() if name not in order]
+        return list(reversed(order))
+
+    def evaluate_array(
+        self, values: Dict[str, numpy.ndarray], size: int
+    ) -> Dict[str, numpy.ndarray]:
+        """
+        Evaluate the value of each expression over whole arrays of values, there must be
+        no dependency cycle in the set.
+
+        :param values: arrays of values of the parameters whose value is already known,
+        their expressions are not evaluated.
+        :param size: size of the arrays.
+        :returns: an array of values for each expression, the keys are the name of the
+        parameter associated to the expression.
+        """
+        values = dict(values)
+        for name in self.evaluation_order:
+            if name not in values:
+                values[name] = self.expressions[name].evaluate_array(values, size)
+        return values
+
 
 class ParamExpr(BaseModel, ABC):
     """
@@ -280,6 +309,20 @@ class ParamExpr(BaseModel, ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def evaluate_array(
+        self, dependencies_values: Dict[str, numpy.ndarray], size: int
+    ) -> numpy.ndarray:
+        """
+        Evaluate this expression over whole arrays of values of its dependencies.
+
+        :param dependencies_values: the arrays of values of the dependencies of this
+        expression, extra values are ignored.
+        :param size: size of the arrays.
+        :returns: the array of evaluated values for this expression.
+        """
+        raise NotImplementedError()
+
 
 class ParamFloatConst(ParamExpr):
     """
@@ -301,6 +344,11 @@ class ParamFloatConst(ParamExpr):
     ) -> Union[float, int, str]:
         return self.value
 
+    def evaluate_array(
+        self, dependencies_values: Dict[str, numpy.ndarray], size: int
+    ) -> numpy.ndarray:
+        return numpy.full(size, self.value, dtype=numpy.float64)
+
 
 class ParamEnumConst(ParamExpr):
     """
@@ -322,6 +370,11 @@ class ParamEnumConst(ParamExpr):
     ) -> Union[float, int, str]:
         return self.value
 
+    def evaluate_array(
+        self, dependencies_values: Dict[str, numpy.ndarray], size: int
+    ) -> numpy.ndarray:
+        return numpy.full(size, self.value, dtype=object)
+
 
 class ParamFloatExpr(ParamExpr):
     """
@@ -329,6 +382,7 @@ class ParamFloatExpr(ParamExpr):
     """
 
     expr: str
+    _compiled: Optional[CompiledModel] = None
 
     @field_validator("expr", mode="before")
     @classmethod
@@ -395,6 +449,31 @@ class ParamFloatExpr(ParamExpr):
     ) -> Union[float, int, str]:
         return sympify(self.expr).evalf(subs=dependencies_values)
 
+    def evaluate_array(
+        self, dependencies_values: Dict[str, numpy.ndarray], size: int
+    ) -> numpy.ndarray:
+        try:
+            if self._compiled is None:
+                self._compiled = CompiledModel.from_expr(parse_expr(self.expr))
+            values = self._compiled(**dependencies_values)
+        except ValueError:
+            # Functions numpy has no equivalent for are evaluated one value at a time
+            return numpy.array(
+                [
+                    float(
+                        self.evaluate(
+                            {
+                                name: dependencies_values[name][idx]
+                                for name in self.dependencies
+                            }
+                        )
+                    )
+                    for idx in range(size)
+                ],
+                dtype=numpy.float64,
+            )
+        return numpy.broadcast_to(numpy.asarray(values, dtype=numpy.float64), size)
+
 
 class ParamEnumExpr(ParamExpr):
     """
@@ -519,3 +598,36 @@ class ParamEnumExpr(ParamExpr):
         return self.options[dependencies_values[self.param]].evaluate(
             dependencies_values
         )
+
+    def evaluate_array(
+        self, dependencies_values: Dict[str, numpy.ndarray], size: int
+    ) -> numpy.ndarray:
+        results = []
+        mapped = numpy.zeros(size, dtype=bool)
+        for option, sub_expr in self.options.items():
+            mask = dependencies_values[self.param] == option
+            mapped |= mask
+            if not mask.any():
+                continue
+            option_values = sub_expr.evaluate_array(
+                {name: value[mask] for name, value in dependencies_values.items()},
+                int(mask.sum()),
+            )
+            results.append((mask, option_values))
+        if not mapped.all():
+            unmapped_values = sorted(
+                {str(value) for value in dependencies_values[self.param][~mapped]}
+            )
+            raise ValueError(
+                f"No sub expression for the values {unmapped_values} of the parameter "
+                f"{self.param}, expected one of {list(self.options)}"
+            )
+        dtype = (
+            numpy.float64
+            if all(values.dtype == numpy.float64 for _, values in results)
+            else object
+        )
+        values = numpy.empty(size, dtype=dtype)
+        for mask, option_values in results:
+            values[mask] = option_values
+        return values
@@ -26,11 +26,16 @@ class ScenarioComparisonDynamicOutputPanel(DynamicOutputPanel):
         self._state["scenario_parameters"] = {}
 
     def compute_from_impact_model(self, entry_data, impact_model):
-        self.result = ScenarioComparisonResult(
-            scenarios_parameters=entry_data,
-            impact_model=impact_model,
-            by_property=self.by_property,
-        )
+        # Result is kept between scenario additions, so scenarios already computed
+        # are not computed again.
+        if self.result is None or self.result.impact_model is not impact_model:
+            self.result = ScenarioComparisonResult(
+                scenarios_parameters=entry_data,
+                impact_model=impact_model,
+                by_property=self.by_property,
+            )
+        else:
+            self.result.scenarios_parameters = entry_data
         result_table = self.result.get_table()
         return result_table
 
@@ -54,3 +59,4 @@ class ScenarioComparisonDynamicOutputPanel(DynamicOutputPanel):
             st.plotly_chart(fig)
         if entry_data["action"] == ACTION_CLEAR:
             self._state["scenario_parameters"] = {}
+            self.result = None
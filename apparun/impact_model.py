@@ -1,18 +1,39 @@
 from __future__ import annotations
 
-from typing import Callable, Dict, List, Optional, Union
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
+import pandas as pd
 import yaml
 from pydantic import BaseModel, ValidationError
-from SALib.analyze import sobol
 from yaml import YAMLError
 
+from apparun.cache import scores_cache
+from apparun.codegen import sources_digest
+from apparun.container import ModelContainer
+from apparun.evaluation import TreeEvaluator
+from apparun.execution import ExecutionBackend
 from apparun.impact_tree import ImpactTreeNode
 from apparun.logger import logger
-from apparun.parameters import ImpactModelParams, ImpactModelParamsValues
-from apparun.score import LCIAScores
-from apparun.tree_node import NodeScores
+from apparun.parameters import EnumCodes, ImpactModelParams, ImpactModelParamsValues
+from apparun.samplers import Sampler
+from apparun.score import ArrayLCIAScores, LCIAScores
+from apparun.sensitivity import sobol_indices, sobol_s1_indices
+from apparun.tree_node import NodeProperties, NodeScores
+from apparun.uncertainty import UncertaintyStatistics
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+"LibYAML's safe loader if PyYAML was built with it, pure python one otherwise."
+
+APPARUN_MAX_ENUM_SPECIALIZATIONS = int(
+    os.environ.get("APPARUN_MAX_ENUM_SPECIALIZATIONS", 16)
+)
+APPARUN_MIN_ENUM_SPECIALIZATION_SAMPLES = int(
+    os.environ.get("APPARUN_MIN_ENUM_SPECIALIZATION_SAMPLES", 100000)
+)
 
 
 class LcaPractitioner(BaseModel):
@@ -76,11 +97,59 @@ class ImpactModel(BaseModel):
     metadata: Optional[ModelMetadata] = None
     parameters: Optional[ImpactModelParams] = None
     tree: Optional[ImpactTreeNode] = None
+    execution_backend: Optional[ExecutionBackend] = None
+    "Backend computing root node's impact methods, process's default one if None."
+    _tree_evaluators: Dict[Tuple, TreeEvaluator] = {}
+    _model_hash: Optional[str] = None
+    _nodes_parents: Optional[np.ndarray] = None
+    _container: Optional[ModelContainer] = None
 
     @property
     def name(self):
         return self.tree.name
 
+    @property
+    def model_hash(self) -> str:
+        """
+        Hash of the parameters and tree of the impact model, used as a key of the
+        scores cache. Metadata, which doesn't change scores and can be missing, is
+        not hashed. Computed at first access, impact model must not be modified
+        afterward.
+        :return: sha256 hex digest of the parameters and tree as a dict.
+        """
+        if self._model_hash is None:
+            self._model_hash = hashlib.sha256(
+                json.dumps(
+                    {
+                        "parameters": self.parameters.to_list(sorted_by_name=True),
+                        "tree": self.tree.to_dict(),
+                    },
+                    sort_keys=True,
+                    default=str,
+                ).encode()
+            ).hexdigest()
+        return self._model_hash
+
+    @property
+    def tree_evaluators_count(self) -> int:
+        """
+        Number of tree evaluators compiled and cached by the impact model, generic or
+        specialized for some enum options.
+        :return: number of cached tree evaluators.
+        """
+        return len(self._tree_evaluators)
+
+    @property
+    def nodes_parents(self) -> np.ndarray:
+        """
+        Index of each tree node's parent, in unnested_descendants order. Computed at
+        first access, tree must not be modified afterward.
+        :return: an integer array, -1 for the root node.
+        """
+        if self._nodes_parents is None:
+            self._nodes_parents = self.tree.unnested_parents
+        return self._nodes_parents
+
     @property
     def transformation_table(
         self,
@@ -112,43 +181,290 @@ class ImpactModel(BaseModel):
             for name, value in table.items()
         }
 
-    def to_dict(self):
+    def tree_evaluator(self, symbols: Tuple[str, ...]) -> TreeEvaluator:
+        """
+        Get the evaluator computing the models of all tree nodes at once, as a
+        function of the given symbols. Evaluator is compiled at first request for a
+        given symbols ordering, and cached for all later calls.
+        :param symbols: names of the compiled function's arguments, in order.
+        :return: tree evaluator of all the nodes, in unnested_descendants order.
+        """
+        if symbols not in self._tree_evaluators:
+            self._tree_evaluators[symbols] = TreeEvaluator.from_nodes(
+                self.tree.unnested_descendants, symbols
+            )
+        return self._tree_evaluators[symbols]
+
+    def specialized_tree_evaluator(
+        self, symbols: Tuple[str, ...], options: Tuple[Tuple[str, str], ...]
+    ) -> TreeEvaluator:
+        """
+        Get the evaluator computing the models of all tree nodes, specialized for some
+        enum parameters' options: dummies of these parameters are replaced by their
+        value, so the branches of the models for other options are not computed.
+        Evaluator is compiled at first request, and cached for all later calls.
+        :param symbols: names of the compiled function's arguments, in order.
+        :param options: name and option of each specialized enum parameter.
+        :return: specialized tree evaluator of all the nodes.
+        """
+        key = (symbols, options)
+        if key not in self._tree_evaluators:
+            substitutions = {}
+            for name, option in options:
+                parameter = self.parameters[name]
+                substitutions.update(
+                    {
+                        parameter.full_option_name(possible_option): int(
+                            possible_option == option
+                        )
+                        for possible_option in parameter.options
+                    }
+                )
+            self._tree_evaluators[key] = TreeEvaluator.from_nodes(
+                self.tree.unnested_descendants, symbols, substitutions
+            )
+        return self._tree_evaluators[key]
+
+    def evaluate_tree(
+        self, values: ImpactModelParamsValues
+    ) -> Tuple[TreeEvaluator, np.ndarray]:
+        """
+        Compute the scores of all the nodes, for each impact method. Samples are
+        partitioned by combination of enum parameters' options, and each partition is
+        computed by an evaluator specialized for its options, so dummies are never
+        materialized. As compiling a specialized evaluator costs as much as compiling
+        the generic one, specialized evaluators are only used for batches of at least
+        APPARUN_MIN_ENUM_SPECIALIZATION_SAMPLES samples, or if they are already
+        compiled. If there are more than APPARUN_MAX_ENUM_SPECIALIZATIONS
+        combinations, or for smaller batches, the generic evaluator is used.
+        :param values: values of the impact model's parameters.
+        :return: a tree evaluator giving the nodes, methods and mask of the scores,
+        and scores as an array of shape (nodes, methods, samples), see
+        TreeEvaluator's evaluate method.
+        """
+        enum_values = {
+            name: value
+            for name, value in values.items()
+            if isinstance(value, EnumCodes)
+        }
+        transformed_params = self.transform_parameters(
+            {name: value for name, value in values.items() if name not in enum_values}
+        )
+        # Substituted dummies are arguments of specialized evaluators, but unused
+        dummies = {
+            symbol: 0
+            for name in enum_values
+            for symbol in self.parameters[name].symbols
+        }
+        symbols = tuple(sorted({**transformed_params, **dummies}))
+        combinations, partitions = (
+            np.unique(
+                np.stack([value.codes for value in enum_values.values()], axis=1),
+                axis=0,
+                return_inverse=True,
+            )
+            if enum_values
+            else ([], None)
+        )
+        combinations_options = [
+            tuple(
+                (name, value.options[code])
+                for (name, value), code in zip(enum_values.items(), combination)
+            )
+            for combination in combinations
+        ]
+        if not 0 < len(combinations) <= APPARUN_MAX_ENUM_SPECIALIZATIONS or (
+            len(partitions) < APPARUN_MIN_ENUM_SPECIALIZATION_SAMPLES
+            and any(
+                (symbols, options) not in self._tree_evaluators
+                for options in combinations_options
+            )
+        ):
+            transformed_params.update(self.transform_parameters(enum_values))
+            tree_evaluator = self.tree_evaluator(symbols)
+            return tree_evaluator, tree_evaluator.evaluate(transformed_params)
+
+        partitions = partitions.ravel()
+        scores = None
+        for partition, options in enumerate(combinations_options):
+            tree_evaluator = self.specialized_tree_evaluator(symbols, options)
+            if len(combinations) == 1:
+                return tree_evaluator, tree_evaluator.evaluate(
+                    {**transformed_params, **dummies}, size=len(partitions)
+                )
+            if scores is None:
+                scores = np.full(
+                    (
+                        len(tree_evaluator.nodes),
+                        len(tree_evaluator.methods),
+                        len(partitions),
+                    ),
+                    np.nan,
+                )
+            rows = np.flatnonzero(partitions == partition)
+            scores[:, :, rows] = tree_evaluator.evaluate(
+                {
+                    **{
+                        name: value[rows] if np.ndim(value) > 0 else value
+                        for name, value in transformed_params.items()
+                    },
+                    **dummies,
+                },
+                size=len(rows),
+            )
+        return tree_evaluator, scores
+
+    def compile_models(self):
+        """
+        Compile the models of every tree node, as well as the whole tree evaluator, up
+        front, so the compilation cost is not paid by the first call to get_scores or
+        get_nodes_scores.
+        """
+        self.tree.compile_models(tuple(self.parameters.symbols))
+        self.tree_evaluator(tuple(self.parameters.symbols))
+
+    def to_dict(self, compile_models: bool = False):
         """
         Convert self to dict.
+        :param compile_models: if True, all models in tree nodes will be compiled, and
+        the numpy source code of compiled models is added to each node, as well as
+        the one of the evaluator of the whole tree, with the digest of the models it
+        is compiled from.
         :return: self as a dict
         """
-        return {
+        symbols = tuple(self.parameters.symbols)
+        impact_model = {
             "metadata": self.metadata.to_dict(),
             "parameters": self.parameters.to_list(sorted_by_name=True),
-            "tree": self.tree.to_dict(),
+            "tree": self.tree.to_dict(symbols if compile_models else None),
         }
+        # Evaluators with lambdified models can't be saved, they are compiled at load
+        if compile_models and self.tree_evaluator(symbols).lambdified_exprs is None:
+            impact_model["tree_evaluator"] = {
+                **self.tree_evaluator(symbols).to_dict(),
+                "digest": sources_digest(
+                    ImpactTreeNode.dict_models(impact_model["tree"]), list(symbols)
+                ),
+            }
+        return impact_model
 
     def to_yaml(self, filepath: str, compile_models: bool = True):
         """
         Convert self to yaml file.
         :param filepath: filepath of the yaml file to create.
         :param compile_models: if True, all models in tree nodes will be compiled.
-        ImpactModel will be bigger, but its execution will be faster at first use.
+        ImpactModel will be bigger, but its execution will be faster at first use:
+        compiled models are loaded as is, without parsing nor compiling the models'
+        expressions.
         """
         with open(filepath, "w") as stream:
-            yaml.dump(self.to_dict(), stream, sort_keys=False)
+            yaml.dump(self.to_dict(compile_models), stream, sort_keys=False)
+
+    def to_binary(self, filepath: str, compile_models: bool = True):
+        """
+        Convert self to a binary container, see apparun.container. Containers are
+        memory-mapped at load, so they load faster than yaml files and their arrays are
+        shared by the processes loading the same file.
+        :param filepath: filepath of the container to create.
+        :param compile_models: if True, all models in tree nodes, and the evaluator of
+        the whole tree, will be compiled, and compiled models are loaded as is,
+        without parsing nor compiling the models' expressions.
+        """
+        symbols = tuple(self.parameters.symbols) if compile_models else None
+        # Evaluators with lambdified models can't be saved, they are compiled at load
+        ModelContainer.write(
+            filepath,
+            metadata=self.metadata.to_dict(),
+            parameters=self.parameters.to_list(sorted_by_name=True),
+            tree=self.tree,
+            symbols=symbols,
+            tree_evaluator=self.tree_evaluator(symbols).to_dict()
+            if compile_models and self.tree_evaluator(symbols).lambdified_exprs is None
+            else None,
+        )
 
     @staticmethod
-    def from_dict(impact_model: dict) -> ImpactModel:
+    def from_binary(filepath: str, compile_models: bool = False) -> ImpactModel:
+        """
+        Load an impact model from a binary container. Tree nodes are built without
+        validation, and their models are only decoded and parsed at first access,
+        see ModelContainer's to_tree method. Container's memory mapping is kept open
+        as long as the impact model, or its tree, is used.
+        :param filepath: binary container of the impact model.
+        :param compile_models: if True, models of all the tree nodes are compiled at
+        load time instead of at first use.
+        :return: constructed impact model.
         """
-        Convert dict to ImpactModel object.
+        container = ModelContainer.open(filepath)
+        impact_model = ImpactModel(
+            metadata=ModelMetadata.from_dict(container.metadata),
+            parameters=ImpactModelParams.from_list(container.parameters),
+            tree=container.to_tree(),
+        )
+        impact_model._container = container
+        impact_model._nodes_parents = container.parents
+        tree_evaluator = container.tree_evaluator
+        if tree_evaluator is not None:
+            impact_model.load_tree_evaluator(TreeEvaluator.from_dict(tree_evaluator))
+        if compile_models:
+            impact_model.compile_models()
+        return impact_model
+
+    @staticmethod
+    def from_dict(impact_model: dict, lazy: bool = False) -> ImpactModel:
+        """
+        Convert dict to ImpactModel object. Compiled tree evaluator, if any, is
+        ignored if the models of the tree, or the parameters, have been modified since
+        it was compiled, see sources_digest.
         :param impact_model: dict containing construction parameters of the impact
         model.
+        :param lazy: if True, tree nodes are built without validation, and their
+        models are only parsed at first access, see ImpactTreeNode's from_dict.
         :return: constructed impact model.
         """
         try:
-            return ImpactModel(
+            new_impact_model = ImpactModel(
                 metadata=ModelMetadata.from_dict(impact_model["metadata"]),
                 parameters=ImpactModelParams.from_list(impact_model["parameters"]),
-                tree=ImpactTreeNode.from_dict(impact_model["tree"]),
+                tree=ImpactTreeNode.from_dict(impact_model["tree"], lazy=lazy),
             )
         except KeyError:
             logger.error("Impossible to create impact model from dict, missing key")
+            return None
+        tree_evaluator = impact_model.get("tree_evaluator")
+        if tree_evaluator is not None:
+            digest = sources_digest(
+                ImpactTreeNode.dict_models(impact_model["tree"]),
+                list(new_impact_model.parameters.symbols),
+            )
+            if tree_evaluator.get("digest") == digest:
+                new_impact_model.load_tree_evaluator(
+                    TreeEvaluator.from_dict(tree_evaluator)
+                )
+            else:
+                logger.warning(
+                    f"Compiled tree evaluator of the impact model {new_impact_model.name}"
+                    " doesn't match its models, it is ignored"
+                )
+        return new_impact_model
+
+    def load_tree_evaluator(self, tree_evaluator: TreeEvaluator):
+        """
+        Cache an already compiled tree evaluator, such as one saved with the impact
+        model, so it is not compiled again. Evaluator is ignored if its nodes are not
+        the ones of the tree.
+        :param tree_evaluator: evaluator of all the nodes, in unnested_descendants
+        order.
+        """
+        if tree_evaluator.nodes != [
+            node.name for node in self.tree.unnested_descendants
+        ]:
+            logger.warning(
+                f"Compiled tree evaluator of the impact model {self.name} doesn't match "
+                "its tree, it is ignored"
+            )
+            return
+        self._tree_evaluators[tree_evaluator.symbols] = tree_evaluator
 
     def from_tree_children(self) -> List[ImpactModel]:
         """
@@ -158,22 +474,38 @@ class ImpactModel(BaseModel):
         :return: a list of newly created impact models.
         """
         return [
-            ImpactModel(parameters=self.parameters, tree=child)
+            ImpactModel(
+                parameters=self.parameters,
+                tree=child,
+                execution_backend=self.execution_backend,
+            )
             for child in self.tree.children
         ]
 
     @staticmethod
-    def from_yaml(filepath: str) -> ImpactModel:
+    def from_yaml(
+        filepath: str, compile_models: bool = False, lazy: bool = False
+    ) -> ImpactModel:
         """
-        Convert a yaml file to an ImpactModel object.
+        Convert a yaml file to an ImpactModel object. File is read with LibYAML's
+        loader if available.
         :param filepath: yaml file containing construction parameters of the impact
         model.
+        :param compile_models: if True, models of all the tree nodes are compiled at
+        load time instead of at first use.
+        :param lazy: if True, tree nodes are built without validation, and their
+        models are only parsed at first access, so parameters of large impact models
+        can be listed without parsing any model.
         :return: constructed impact model.
         """
         try:
             with open(filepath, "r") as stream:
-                impact_model = yaml.safe_load(stream)
-                return ImpactModel.from_dict(impact_model)
+                impact_model = ImpactModel.from_dict(
+                    yaml.load(stream, Loader=YAML_LOADER), lazy=lazy
+                )
+                if compile_models and impact_model is not None:
+                    impact_model.compile_models()
+                return impact_model
         except FileNotFoundError:
             logger.error(
                 f"No such impact model {filepath}, check that the impact model exists or that the environment variable APPARUN_IMPACT_MODELS_DIR is defined"
@@ -186,10 +518,14 @@ class ImpactModel(BaseModel):
     def params_values(self, **params) -> ImpactModelParamsValues:
         return ImpactModelParamsValues.from_dict(self.parameters, params)
 
-    def get_scores(self, **params) -> LCIAScores:
+    def get_scores(
+        self, as_array: Optional[bool] = False, **params
+    ) -> Union[LCIAScores, ArrayLCIAScores]:
         """
         Get impact scores of the root node for each impact method, according to the
         parameters.
+        :param as_array: if True, scores are returned as ArrayLCIAScores, which
+        spares the conversion of scores to lists.
         :param params: value, or list of values of the impact model's parameters.
         List of values must have the same length. If single values are provided
         alongside a list of values, it will be duplicated to the appropriate length.
@@ -203,15 +539,38 @@ class ImpactModel(BaseModel):
                 logger.error(err["msg"])
             raise
         logger.info("Parameters values successfully loaded and validated")
-        transformed_params = self.transform_parameters(values)
-        scores = self.tree.compute(transformed_params)
+        scores = self.get_scores_from_values(values, as_array=as_array)
         logger.info("FU impact scores computed with no error")
         return scores
 
+    def get_scores_from_values(
+        self, values: ImpactModelParamsValues, as_array: Optional[bool] = False
+    ) -> Union[LCIAScores, ArrayLCIAScores]:
+        """
+        Get impact scores of the root node for each impact method, according to
+        already validated parameters values.
+        :param values: values of the impact model's parameters.
+        :param as_array: if True, scores are returned as ArrayLCIAScores.
+        :return: a dict mapping impact names and corresponding score, or list of scores.
+        """
+        key = scores_cache.key(self.model_hash, values, "scores")
+        scores = scores_cache.get(key)
+        if scores is None:
+            transformed_params = self.transform_parameters(values)
+            scores = self.tree.compute(
+                transformed_params, as_array=True, backend=self.execution_backend
+            )
+            scores_cache.put(key, scores)
+        if not as_array:
+            return scores.to_lcia_scores()
+        # Cached scores are shared, their values are returned read-only
+        return scores.read_only_copy() if key is not None else scores
+
     def get_nodes_scores(
         self,
         by_property: Optional[str] = None,
         direct_impacts: Optional[bool] = False,
+        as_array: Optional[bool] = False,
         **params,
     ) -> List[NodeScores]:
         """
@@ -221,6 +580,8 @@ class ImpactModel(BaseModel):
         sharing the same property value. Property name is the value of by_property.
         :param direct_impacts: if True, direct_impacts will be computed instead of
         full impacts (i.e. sum of direct impacts and children direct impacts)
+        :param as_array: if True, nodes' scores are ArrayLCIAScores, which spares the
+        conversion of scores to lists.
         :param params: value, or list of values of the impact model's parameters.
         List of values must have the same length. If single values are provided
         alongside a list of values, it will be duplicated to the appropriate length.
@@ -235,86 +596,465 @@ class ImpactModel(BaseModel):
                 logger.error(err["msg"])
             raise
         logger.info("Parameters values successfully loaded and validated")
-        transformed_params = self.transform_parameters(values)
-        scores = [
-            NodeScores(
-                name=node.name,
-                properties=node.properties,
-                parent=node.parent.name if node.parent is not None else "",
-                lcia_scores=node.compute(
-                    transformed_params,
-                ),
-            )
-            for node in self.tree.unnested_descendants
-        ]
-        if direct_impacts or by_property is not None:
-            scores = NodeScores.full_to_direct_impacts(scores)
-        if by_property is not None:
-            scores = NodeScores.combine_by_property(scores, by_property)
+        scores = self.get_nodes_scores_from_values(
+            values,
+            by_property=by_property,
+            direct_impacts=direct_impacts,
+            as_array=as_array,
+        )
         logger.info("Nodes scores computed with no error")
         return scores
 
-    def get_uncertainty_nodes_scores(self, n) -> List[NodeScores]:
-        """ """
-        samples = self.parameters.uniform_draw(n)
+    def get_nodes_scores_from_values(
+        self,
+        values: ImpactModelParamsValues,
+        by_property: Optional[str] = None,
+        direct_impacts: Optional[bool] = False,
+        as_array: Optional[bool] = False,
+    ) -> List[NodeScores]:
+        """
+        Get impact scores of the each node for each impact method, according to
+        already validated parameters values.
+        :param values: values of the impact model's parameters.
+        :param by_property: if different than None, results will be pooled by nodes
+        sharing the same property value. Property name is the value of by_property.
+        :param direct_impacts: if True, direct_impacts will be computed instead of
+        full impacts (i.e. sum of direct impacts and children direct impacts)
+        :param as_array: if True, nodes' scores are ArrayLCIAScores.
+        :return: a list of dict mapping impact names and corresponding score, or list
+        of scores, for each node/property value.
+        """
+        key = scores_cache.key(
+            self.model_hash, values, "nodes_scores", by_property, direct_impacts
+        )
+        scores = scores_cache.get(key)
+        if scores is None:
+            tree_evaluator, scores = self.evaluate_tree(values)
+            mask = tree_evaluator.mask
+            nodes = self.tree.unnested_descendants
+            if direct_impacts or by_property is not None:
+                scores = NodeScores.full_to_direct_impacts_array(
+                    scores, mask, self.nodes_parents
+                )
+            if by_property is None:
+                scores = [
+                    NodeScores(
+                        name=node.name,
+                        properties=node.properties,
+                        parent=node.parent.name if node.parent is not None else "",
+                        lcia_scores=node_lcia_scores,
+                    )
+                    for node, node_lcia_scores in zip(
+                        nodes, tree_evaluator.to_lcia_scores(scores, mask)
+                    )
+                ]
+            else:
+                property_values, scores, mask = NodeScores.combine_by_property_array(
+                    scores, mask, [node.properties for node in nodes], by_property
+                )
+                scores = [
+                    NodeScores(
+                        name=str(property_value),
+                        parent="",
+                        properties=NodeProperties(),
+                        lcia_scores=property_lcia_scores,
+                    )
+                    for property_value, property_lcia_scores in zip(
+                        property_values, tree_evaluator.to_lcia_scores(scores, mask)
+                    )
+                ]
+            scores_cache.put(key, scores)
+        # Cached list is shared, returned nodes' scores are copies whose values are
+        # read-only
+        return [
+            node_scores.model_copy(
+                update={
+                    "lcia_scores": (
+                        node_scores.lcia_scores.read_only_copy()
+                        if key is not None
+                        else node_scores.lcia_scores
+                    )
+                    if as_array
+                    else node_scores.lcia_scores.to_lcia_scores(),
+                }
+            )
+            for node_scores in scores
+        ]
+
+    def params_values_batch(
+        self, params_list: List[Dict]
+    ) -> Tuple[ImpactModelParamsValues, List[int]]:
+        """
+        Validate several sets of parameters values at once.
+        :param params_list: sets of parameters values, each set being a value, or list
+        of values, for each parameter.
+        :return: concatenated values, and the number of values of each set.
+        """
+        try:
+            return ImpactModelParamsValues.from_dicts(self.parameters, params_list)
+        except ValidationError as e:
+            for err in e.errors():
+                logger.error(err["msg"])
+            raise
+
+    def get_scores_batch(
+        self, params_list: List[Dict], as_array: Optional[bool] = False
+    ) -> List[Union[LCIAScores, ArrayLCIAScores]]:
+        """
+        Get impact scores of the root node for several sets of parameters values.
+        All the sets are computed with a single vectorized computation.
+        :param params_list: sets of parameters values, each set being a value, or list
+        of values, for each parameter, as given to get_scores method.
+        :param as_array: if True, scores are returned as ArrayLCIAScores.
+        :return: the scores of each set of parameters values, in order.
+        """
+        logger.info("Start computing the FU impact scores of a batch")
+        values, sizes = self.params_values_batch(params_list)
+        scores = self.get_scores_from_values(values, as_array=True).split(sizes)
+        logger.info("FU impact scores of the batch computed with no error")
+        if as_array:
+            return scores
+        return [lcia_scores.to_lcia_scores() for lcia_scores in scores]
+
+    def get_nodes_scores_batch(
+        self,
+        params_list: List[Dict],
+        by_property: Optional[str] = None,
+        direct_impacts: Optional[bool] = False,
+        as_array: Optional[bool] = False,
+    ) -> List[List[NodeScores]]:
+        """
+        Get impact scores of each node for several sets of parameters values.
+        All the sets are computed with a single vectorized computation.
+        :param params_list: sets of parameters values, each set being a value, or list
+        of values, for each parameter, as given to get_nodes_scores method.
+        :param by_property: if different than None, results will be pooled by nodes
+        sharing the same property value. Property name is the value of by_property.
+        :param direct_impacts: if True, direct_impacts will be computed instead of
+        full impacts (i.e. sum of direct impacts and children direct impacts)
+        :param as_array: if True, nodes' scores are ArrayLCIAScores.
+        :return: the nodes scores of each set of parameters values, in order.
+        """
+        logger.info("Start computing the nodes scores of a batch")
+        values, sizes = self.params_values_batch(params_list)
+        nodes_scores = self.get_nodes_scores_from_values(
+            values,
+            by_property=by_property,
+            direct_impacts=direct_impacts,
+            as_array=True,
+        )
+        splitted_scores = [
+            node_scores.lcia_scores.split(sizes) for node_scores in nodes_scores
+        ]
+        logger.info("Nodes scores of the batch computed with no error")
+        return [
+            [
+                NodeScores(
+                    name=node_scores.name,
+                    parent=node_scores.parent,
+                    properties=node_scores.properties,
+                    lcia_scores=lcia_scores[index]
+                    if as_array
+                    else lcia_scores[index].to_lcia_scores(),
+                )
+                for node_scores, lcia_scores in zip(nodes_scores, splitted_scores)
+            ]
+            for index in range(len(sizes))
+        ]
+
+    def get_uncertainty_nodes_scores(
+        self, n, as_array: Optional[bool] = False, sampler: Optional[Sampler] = None
+    ) -> List[NodeScores]:
+        """
+        Run a Monte Carlo uncertainty analysis, computing the scores of each node.
+        :param n: number of samples to draw.
+        :param as_array: if True, scores are returned as arrays.
+        :param sampler: sampler drawing the samples, such as a seeded Latin hypercube
+        or Sobol sampler. If None, independent uniform samples are drawn.
+        :return: scores of each node.
+        """
+        samples = self.parameters.draw(n, sampler)
         samples = self.parameters.draw_to_distrib(samples)
-        nodes_scores = self.get_nodes_scores(**samples)
+        nodes_scores = self.get_nodes_scores(as_array=as_array, **samples)
         return nodes_scores
 
-    def get_uncertainty_scores(self, n) -> LCIAScores:
-        """ """
-        samples = self.parameters.uniform_draw(n)
+    def get_uncertainty_scores(
+        self, n, as_array: Optional[bool] = False, sampler: Optional[Sampler] = None
+    ) -> Union[LCIAScores, ArrayLCIAScores]:
+        """
+        Run a Monte Carlo uncertainty analysis, computing the scores of root node (FU).
+        :param n: number of samples to draw.
+        :param as_array: if True, scores are returned as an array.
+        :param sampler: sampler drawing the samples, such as a seeded Latin hypercube
+        or Sobol sampler. If None, independent uniform samples are drawn.
+        :return: scores of root node.
+        """
+        samples = self.parameters.draw(n, sampler)
         samples = self.parameters.draw_to_distrib(samples)
-        lcia_scores = self.get_scores(**samples)
+        lcia_scores = self.get_scores(as_array=as_array, **samples)
         return lcia_scores
 
+    def get_series_scores(
+        self, values: ImpactModelParamsValues, all_nodes: bool = False
+    ) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """
+        Get the scores of the root node, or of each node, for each impact method, as a
+        single array with one row per (node, impact method) series.
+        :param values: values of the impact model's parameters.
+        :param all_nodes: if True, scores are computed for each node. Else, only for
+        root node (FU).
+        :return: node name and impact method of each series, and an array of shape
+        (series, samples). For parameterless models, array has a single sample.
+        """
+        if all_nodes:
+            tree_evaluator, scores = self.evaluate_tree(values)
+            mask = tree_evaluator.mask
+            series = [
+                (node, method)
+                for node_index, node in enumerate(tree_evaluator.nodes)
+                for method_index, method in enumerate(tree_evaluator.methods)
+                if mask[node_index, method_index]
+            ]
+            return series, scores[mask]
+        transformed_params = self.transform_parameters(values)
+        lcia_scores = self.tree.compute(
+            transformed_params, as_array=True, backend=self.execution_backend
+        )
+        return [
+            (self.tree.name, method) for method in lcia_scores.methods
+        ], lcia_scores.values
+
+    def get_uncertainty_statistics(
+        self,
+        n: int,
+        all_nodes: bool = False,
+        chunk_size: int = 10000,
+        quantiles: Optional[List[float]] = None,
+        bins: int = 50,
+        rtol: Optional[float] = None,
+        min_samples: int = 1000,
+        sampler: Optional[Sampler] = None,
+    ) -> UncertaintyStatistics:
+        """
+        Run a Monte Carlo uncertainty analysis by chunks of samples, only keeping
+        running statistics of the scores, so memory doesn't grow with the number of
+        samples.
+        :param n: maximum number of samples to draw.
+        :param all_nodes: if True, statistics are computed for each node. Else, only
+        for root node (FU).
+        :param chunk_size: number of samples drawn and evaluated at once.
+        :param quantiles: quantiles to estimate, between 0 and 1.
+        :param bins: number of bins of the histograms.
+        :param rtol: if not None, sampling stops once the standard error of the mean of
+        each score is lower than rtol times the mean.
+        :param min_samples: minimum number of samples drawn before checking
+        convergence.
+        :param sampler: sampler drawing the samples, chunk after chunk. If None,
+        independent uniform samples are drawn.
+        :return: running statistics of the scores of each node and impact method.
+        """
+        uncertainty_statistics = None
+        while uncertainty_statistics is None or uncertainty_statistics.count < n:
+            size = min(
+                chunk_size,
+                n
+                - (
+                    0
+                    if uncertainty_statistics is None
+                    else uncertainty_statistics.count
+                ),
+            )
+            samples = self.parameters.draw(size, sampler)
+            samples = self.parameters.draw_to_distrib(samples)
+            series, values = self.get_series_scores(
+                self.params_values(**samples), all_nodes
+            )
+            values = np.broadcast_to(values, (len(series), size))
+            if uncertainty_statistics is None:
+                uncertainty_statistics = UncertaintyStatistics.from_series(
+                    series, quantiles=quantiles, bins=bins
+                )
+            uncertainty_statistics.update(values)
+            if (
+                rtol is not None
+                and uncertainty_statistics.count >= min_samples
+                and uncertainty_statistics.converged(rtol)
+            ):
+                logger.info(
+                    f"Monte Carlo converged after {uncertainty_statistics.count} samples"
+                )
+                break
+        return uncertainty_statistics
+
     def get_sobol_s1_indices(
-        self, n, all_nodes: bool = False
+        self,
+        n,
+        all_nodes: bool = False,
+        calc_second_order: bool = True,
+        bootstrap: bool = True,
+        backend: Optional[ExecutionBackend] = None,
     ) -> List[Dict[str, Union[str, np.ndarray]]]:
         """
         Get sobol first indices, which corresponds to the contribution of each
-        parameter to total result variance.
+        parameter to total result variance. Analyses of each node and impact method
+        are run in parallel by the execution backend.
         :param n: number of samples to draw with monte carlo.
         :param all_nodes: if True, sobol s1 indices will be computed for each node. Else,
         only for root node (FU).
+        :param calc_second_order: if False, samples needed by second order indices are
+        not drawn, so the model is evaluated N(D+2) times instead of N(2D+2).
+        :param bootstrap: if False, SALib's bootstrap of confidence intervals and
+        second order indices is skipped, only first order indices are estimated.
+        :param backend: backend running the analyses, such as a ProcessBackend. If
+        None, impact model's execution backend is used.
         :return: unpivoted dataframe containing sobol first indices for each parameter,
         impact method, and node name if all_nodes is True.
         """
-        samples = self.parameters.sobol_draw(n)
+        samples = self.parameters.sobol_draw(n, calc_second_order=calc_second_order)
+        size = len(samples)
         samples = self.parameters.draw_to_distrib(samples)
-        if all_nodes:
-            lcia_scores = self.get_nodes_scores(**samples)
-            sobol_s1_indices = []
-            for node_scores in lcia_scores:
-                for method, scores in node_scores.lcia_scores.scores.items():
-                    s1 = sobol.analyze(
-                        self.parameters.sobol_problem,
-                        np.array(scores),
-                        calc_second_order=True,
-                    )["S1"]
-                    sobol_s1_indices += [
-                        {
-                            "node": node_scores.name,
-                            "method": method,
-                            "parameter": self.parameters.sobol_problem["names"][i],
-                            "sobol_s1": s1[i],
-                        }
-                        for i in range(len(s1))
-                    ]
-            return sobol_s1_indices
-        lcia_scores = self.get_scores(**samples)
-        sobol_s1_indices = []
-        for method, scores in lcia_scores.scores.items():
-            s1 = sobol.analyze(
-                self.parameters.sobol_problem, np.array(scores), calc_second_order=True
-            )["S1"]
-            sobol_s1_indices += [
-                {
-                    "node": self.tree.name,
-                    "method": method,
-                    "parameter": self.parameters.sobol_problem["names"][i],
-                    "sobol_s1": s1[i],
-                }
-                for i in range(len(s1))
+        series, scores = self.get_series_scores(
+            self.params_values(**samples), all_nodes
+        )
+        return sobol_s1_indices(
+            self.parameters.sobol_problem,
+            series,
+            np.broadcast_to(scores, (len(series), size)),
+            calc_second_order=calc_second_order,
+            bootstrap=bootstrap,
+            backend=backend or self.execution_backend,
+        )
+
+    def get_sobol_indices(
+        self, n, all_nodes: bool = False, calc_second_order: bool = True
+    ) -> pd.DataFrame:
+        """
+        Get sobol first and total order indices of each parameter, for the root node
+        or each node, and each impact method. Indices of all nodes and impact methods
+        are estimated at once, without confidence intervals.
+        :param n: number of samples to draw with monte carlo.
+        :param all_nodes: if True, sobol indices will be computed for each node. Else,
+        only for root node (FU).
+        :param calc_second_order: if False, samples needed by second order indices are
+        not drawn, so the model is evaluated N(D+2) times instead of N(2D+2).
+        :return: unpivoted dataframe containing sobol first and total order indices
+        for each node, impact method and parameter.
+        """
+        samples = self.parameters.sobol_draw(n, calc_second_order=calc_second_order)
+        size = len(samples)
+        samples = self.parameters.draw_to_distrib(samples)
+        series, scores = self.get_series_scores(
+            self.params_values(**samples), all_nodes
+        )
+        return sobol_indices(
+            self.parameters.sobol_problem,
+            series,
+            np.broadcast_to(scores, (len(series), size)),
+            calc_second_order=calc_second_order,
+        )
+
+    def gradient_evaluator(
+        self, symbols: Tuple[str, ...], parameters: Tuple[str, ...]
+    ) -> TreeEvaluator:
+        """
+        Get the evaluator computing the partial derivatives of the models of all tree
+        nodes with respect to some parameters. Derivatives are compiled at first
+        request, and cached for all later calls.
+        :param symbols: names of the compiled function's arguments, in order.
+        :param parameters: names of the parameters to derive the models by.
+        :return: tree evaluator of the derivatives, with a row for each parameter and
+        node, in unnested_descendants order.
+        """
+        key = ("gradients", symbols, parameters)
+        if key not in self._tree_evaluators:
+            self._tree_evaluators[key] = TreeEvaluator.from_gradients(
+                self.tree.unnested_descendants, symbols, parameters
+            )
+        return self._tree_evaluators[key]
+
+    def evaluate_gradients(
+        self, values: ImpactModelParamsValues
+    ) -> Tuple[List[str], TreeEvaluator, np.ndarray, np.ndarray]:
+        """
+        Compute the scores of all the nodes, for each impact method, and their
+        gradient with respect to each float parameter. Gradients are partial
+        derivatives: parameters whose value depends on the derived parameter are kept
+        constant.
+        :param values: values of the impact model's parameters.
+        :return: names of the float parameters, a tree evaluator giving the nodes,
+        methods and mask of the scores, scores as an array of shape (nodes, methods,
+        samples), and gradients as an array of shape (parameters, nodes, methods,
+        samples).
+        """
+        parameters = tuple(
+            parameter.name for parameter in self.parameters if parameter.type == "float"
+        )
+        tree_evaluator, scores = self.evaluate_tree(values)
+        if len(parameters) == 0:
+            return [], tree_evaluator, scores, np.empty((0, *scores.shape))
+        transformed_params = self.transform_parameters(values)
+        gradients = self.gradient_evaluator(
+            tuple(sorted(transformed_params)), parameters
+        ).evaluate(transformed_params, size=scores.shape[-1])
+        return (
+            list(parameters),
+            tree_evaluator,
+            scores,
+            gradients.reshape(len(parameters), *scores.shape),
+        )
+
+    def get_gradients(self, all_nodes: bool = False, **params) -> pd.DataFrame:
+        """
+        Get the gradient and the elasticity of the scores of the root node, or of each
+        node, for each impact method, with respect to each float parameter. Gradients
+        of all the scenarios are computed at once, from derivatives of the models.
+        Elasticity is the relative change of the score for a relative change of the
+        parameter, i.e. gradient * parameter value / score. It is NaN if the score is
+        null.
+        :param all_nodes: if True, gradients are computed for each node. Else, only
+        for root node (FU).
+        :param params: value, or list of values of the scenarios, for each parameter,
+        as given to get_scores. Missing parameters take their default value.
+        :return: unpivoted dataframe containing the score, gradient and elasticity for
+        each node, impact method, parameter and scenario.
+        """
+        values = self.params_values(**params)
+        parameters, tree_evaluator, scores, gradients = self.evaluate_gradients(values)
+        if not all_nodes:
+            scores, gradients = scores[-1:], gradients[:, -1:]
+        nodes = tree_evaluator.nodes[-len(scores) :]
+        mask = tree_evaluator.mask[-len(scores) :]
+        size = scores.shape[-1]
+        parameters_values = np.array(
+            [
+                np.broadcast_to(np.asarray(values[parameter], dtype=np.float64), size)
+                for parameter in parameters
             ]
-        return sobol_s1_indices
+        ).reshape(len(parameters), 1, 1, size)
+        elasticities = np.divide(
+            gradients * parameters_values,
+            scores,
+            out=np.full(gradients.shape, np.nan),
+            where=scores != 0,
+        )
+        node_index, method_index = np.nonzero(mask)
+        n_series = len(node_index)
+        return pd.DataFrame(
+            {
+                "node": np.tile(
+                    np.repeat(np.array(nodes)[node_index], size), len(parameters)
+                ),
+                "method": np.tile(
+                    np.repeat(np.array(tree_evaluator.methods)[method_index], size),
+                    len(parameters),
+                ),
+                "parameter": np.repeat(parameters, n_series * size),
+                "scenario": np.tile(np.arange(size), n_series * len(parameters)),
+                "value": np.repeat(
+                    parameters_values.reshape(len(parameters), size), n_series, axis=0
+                ).ravel(),
+                "score": np.tile(scores[mask].ravel(), len(parameters)),
+                "gradient": gradients[:, mask].ravel(),
+                "elasticity": elasticities[:, mask].ravel(),
+            }
+        )
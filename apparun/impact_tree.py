@@ -2,21 +2,75 @@ from __future__ import annotations
 
 import itertools
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Self, Union
+from typing import Any, Dict, Iterator, KeysView, List, Optional, Self, Tuple, Union
 
 import numpy as np
 from pydantic import BaseModel, ValidationError, field_validator
 from pydantic_core import PydanticCustomError
-from sympy import Expr, lambdify
+from sympy import Expr
 
+from apparun.codegen import (
+    CompiledModel,
+    LambdifiedModel,
+    compile_model,
+    sources_digest,
+)
 from apparun.exceptions import InvalidExpr
+from apparun.execution import ExecutionBackend, default_backend
 from apparun.expressions import parse_expr
 from apparun.logger import logger
-from apparun.score import LCIAScores
+from apparun.score import ArrayLCIAScores, LCIAScores
 from apparun.tree_node import NodeProperties
 
 
+class LazyModels(dict):
+    """
+    Impact models of a node, mapping impact methods' name with the model's raw
+    expression. Expressions are only parsed at first access, which spares parsing
+    when compiled models are available. Every accessor, as well as dict(...) and **
+    unpacking, gives parsed expressions, except raw_models and copy, which leave
+    models unparsed.
+    """
+
+    def __iter__(self) -> Iterator[str]:
+        # Overriding __iter__ makes dict(...) and ** unpacking get values through
+        # __getitem__ instead of reading stored strings.
+        return super().__iter__()
+
+    def keys(self) -> KeysView[str]:
+        return super().keys()
+
+    def __getitem__(self, method: str) -> Expr:
+        model = super().__getitem__(method)
+        if isinstance(model, str):
+            model = parse_expr(model)
+            super().__setitem__(method, model)
+        return model
+
+    def get(self, method: str, default: Optional[Expr] = None) -> Optional[Expr]:
+        return self[method] if method in self else default
+
+    def values(self) -> List[Expr]:
+        return [self[method] for method in self]
+
+    def items(self) -> List[Tuple[str, Expr]]:
+        return [(method, self[method]) for method in self]
+
+    def raw_models(self) -> Dict[str, str]:
+        """
+        Get the models as strings, without parsing the ones not parsed yet.
+        :return: a dict mapping impact methods' name with the model as a string.
+        """
+        return {method: str(dict.__getitem__(self, method)) for method in self}
+
+    def copy(self) -> LazyModels:
+        """
+        Copy the models, without parsing the ones not parsed yet.
+        :return: a new LazyModels.
+        """
+        return LazyModels(dict.items(self))
+
+
 class ImpactTreeNode(BaseModel):
     """
     Impact Model tree node representing the impacts of an activity as well as its
@@ -31,6 +85,9 @@ class ImpactTreeNode(BaseModel):
     properties: NodeProperties = NodeProperties(properties={})
     _raw_direct_impact: Optional[Expr] = None
     _combined_amount: Optional[Union[Expr, float]] = None
+    _compiled_models: Dict[
+        Tuple[str, ...], Dict[str, Union[CompiledModel, LambdifiedModel]]
+    ] = {}
 
     class Config:
         arbitrary_types_allowed = True
@@ -50,12 +107,12 @@ class ImpactTreeNode(BaseModel):
     @field_validator("models", mode="before")
     @classmethod
     def validate_exprs(cls, exprs: Dict[str, str]) -> Dict[str, Expr]:
+        # Models are parsed into a new dict, so the dict the node is built from keeps
+        # models as strings
         try:
-            for key, expr in exprs.items():
-                exprs[key] = parse_expr(expr)
+            return {key: parse_expr(expr) for key, expr in exprs.items()}
         except InvalidExpr as e:
             raise PydanticCustomError("invalid_expr", "", {"expr": e.expr})
-        return exprs
 
     @property
     def unnested_descendants(self) -> List[ImpactTreeNode]:
@@ -70,14 +127,63 @@ class ImpactTreeNode(BaseModel):
             )
         ) + [self]
 
+    @property
+    def unnested_parents(self) -> np.ndarray:
+        """
+        Index of each node's parent in unnested_descendants, so children of a node can
+        be found without scanning the whole tree.
+        :return: an integer array with an entry for each node of unnested_descendants,
+        in order, -1 for current node.
+        """
+        descendants = self.unnested_descendants
+        index = {id(node): node_index for node_index, node in enumerate(descendants)}
+        return np.array(
+            [
+                index.get(id(node.parent), -1) if node is not self else -1
+                for node in descendants
+            ],
+            dtype=np.int64,
+        )
+
     @property
     def combined_amount(self) -> Union[float, Expr]:
+        if isinstance(self.amount, str):
+            # Amounts of lazily loaded nodes are parsed at first access
+            self.amount = parse_expr(self.amount)
         if self.parent is None:
             return self.amount
         if self._combined_amount is None:
             self._combined_amount = self.amount * self.parent.combined_amount
         return self._combined_amount
 
+    def compiled_models(
+        self, symbols: Tuple[str, ...]
+    ) -> Dict[str, Union[CompiledModel, LambdifiedModel]]:
+        """
+        Get node's models compiled as numpy functions of the given symbols. Models
+        are compiled at first request for a given symbols ordering, and cached for
+        all later calls. Models which can't be compiled as numpy code are
+        lambdified instead, see compile_model.
+        :param symbols: names of the compiled functions' arguments, in order.
+        :return: a dict mapping impact methods' name with corresponding compiled
+        model.
+        """
+        if symbols not in self._compiled_models:
+            self._compiled_models[symbols] = {
+                method: compile_model(model, list(symbols))
+                for method, model in self.models.items()
+            }
+        return self._compiled_models[symbols]
+
+    def compile_models(self, symbols: Tuple[str, ...]):
+        """
+        Compile models of the node and all its descendants for the given symbols
+        ordering, so first call to compute method doesn't pay for it.
+        :param symbols: names of the compiled functions' arguments, in order.
+        """
+        for node in self.unnested_descendants:
+            node.compiled_models(symbols)
+
     def new_child(self, **args) -> ImpactTreeNode:
         """
         Build a new node as a child.
@@ -88,13 +194,14 @@ class ImpactTreeNode(BaseModel):
         self.children.append(child)
         return child
 
-    def new_child_from_dict(self, child: dict) -> ImpactTreeNode:
+    def new_child_from_dict(self, child: dict, lazy: bool = False) -> ImpactTreeNode:
         """
         Build a new node as a child.
         :param child: dict containing construction parameters of new node.
+        :param lazy: if True, node is built without validation, see from_dict.
         :return: constructed node
         """
-        child = ImpactTreeNode.from_dict(child)
+        child = ImpactTreeNode.from_dict(child, lazy=lazy)
         child.parent = self
         self.children.append(child)
         return child
@@ -111,40 +218,96 @@ class ImpactTreeNode(BaseModel):
             else self.parent.name_already_in_tree(name)
         )
 
-    def to_dict(self) -> dict:
+    def to_dict(self, symbols: Optional[Tuple[str, ...]] = None) -> dict:
         """
         Convert self to dict.
+        :param symbols: if not None, models compiled as numpy functions of these
+        symbols are added to the dict, so they can be loaded without being parsed and
+        compiled again.
         :return: self as a dict
         """
-        return {
+        node = {
             "name": self.name,
-            "models": {
-                str(method): str(model) for method, model in self.models.items()
-            },
-            "children": [child.to_dict() for child in self.children],
+            "models": self.models.raw_models()
+            if isinstance(self.models, LazyModels)
+            else {str(method): str(model) for method, model in self.models.items()},
+            "children": [child.to_dict(symbols) for child in self.children],
             "properties": self.properties.properties,
             "amount": str(self.amount),
         }
+        if symbols is not None:
+            node["compiled_models"] = {
+                "arguments": list(symbols),
+                "digest": sources_digest([node["models"]], list(symbols)),
+                "models": {
+                    method: compiled_model.expression
+                    for method, compiled_model in self.compiled_models(symbols).items()
+                },
+            }
+        return node
 
     @staticmethod
-    def from_dict(impact_model_tree_node: dict) -> ImpactTreeNode:
+    def from_dict(impact_model_tree_node: dict, lazy: bool = False) -> ImpactTreeNode:
         """
         Convert dict to ImpactTreeNode object.
         :param impact_model_tree_node: dict containing construction parameters of the
-        node.
+        node. If it contains compiled models, models are loaded from them and are only
+        parsed when needed. Compiled models are ignored if the node's models, or their
+        arguments, have been modified since they were compiled, see sources_digest.
+        :param lazy: if True, nodes are built without validation, and models and
+        amounts are only parsed at first access, so invalid expressions are only
+        reported when they are needed.
         :return: constructed node
         """
         try:
-            node = ImpactTreeNode(
-                name=impact_model_tree_node["name"],
-                models=impact_model_tree_node["models"],
-                properties=NodeProperties.from_dict(
-                    impact_model_tree_node["properties"]
-                ),
-                amount=impact_model_tree_node["amount"],
-            )
+            compiled_models = impact_model_tree_node.get("compiled_models")
+            if compiled_models is not None:
+                digest = sources_digest(
+                    [impact_model_tree_node["models"]], compiled_models["arguments"]
+                )
+                if compiled_models.get("digest") != digest:
+                    logger.warning(
+                        "Compiled models of the tree node %s don't match its models, "
+                        "they are ignored",
+                        impact_model_tree_node["name"],
+                    )
+                    compiled_models = None
+            if lazy:
+                node = ImpactTreeNode.model_construct(
+                    name=impact_model_tree_node["name"],
+                    models=LazyModels(impact_model_tree_node["models"]),
+                    children=[],
+                    properties=NodeProperties.model_construct(
+                        properties=impact_model_tree_node["properties"]
+                    ),
+                    amount=impact_model_tree_node["amount"],
+                )
+            else:
+                node = ImpactTreeNode(
+                    name=impact_model_tree_node["name"],
+                    models=impact_model_tree_node["models"]
+                    if compiled_models is None
+                    else {},
+                    properties=NodeProperties.from_dict(
+                        impact_model_tree_node["properties"]
+                    ),
+                    amount=impact_model_tree_node["amount"],
+                )
+            if compiled_models is not None:
+                node.models = LazyModels(impact_model_tree_node["models"])
+                # Lambdified models have no source, they are compiled again
+                node._compiled_models[tuple(compiled_models["arguments"])] = {
+                    method: CompiledModel.from_source(
+                        source, compiled_models["arguments"]
+                    )
+                    if source
+                    else compile_model(
+                        node.models[method], compiled_models["arguments"]
+                    )
+                    for method, source in compiled_models["models"].items()
+                }
             for child in impact_model_tree_node["children"]:
-                node.new_child_from_dict(child)
+                node.new_child_from_dict(child, lazy=lazy)
             return node
         except ValidationError as e:
             for err in e.errors():
@@ -156,6 +319,20 @@ class ImpactTreeNode(BaseModel):
                     )
             raise
 
+    @staticmethod
+    def dict_models(impact_model_tree_node: dict) -> List[Dict[str, str]]:
+        """
+        Get the models of a node converted to dict, and of all its descendants,
+        without parsing them.
+        :param impact_model_tree_node: node as a dict, see to_dict.
+        :return: models of the node and its descendants, depth first.
+        """
+        return [impact_model_tree_node["models"]] + [
+            models
+            for child in impact_model_tree_node["children"]
+            for models in ImpactTreeNode.dict_models(child)
+        ]
+
     @staticmethod
     def node_name_to_symbol_name(node_name: str) -> str:
         """
@@ -171,40 +348,50 @@ class ImpactTreeNode(BaseModel):
         transformed_params: Dict[
             str, Union[List[Union[str, float]], Union[str, float]]
         ],
-    ) -> LCIAScores:
+        as_array: bool = False,
+        backend: Optional[ExecutionBackend] = None,
+    ) -> Union[LCIAScores, ArrayLCIAScores]:
         """
         Compute node's impacts with given parameters values.
-        Multithreading is used to compute different impact methods in parallel.
+        Impact methods are computed by the execution backend, which can compute them
+        in parallel. Models are compiled once per parameters' set, see compiled_models
+        method.
         :param transformed_params: parameters, transformed by ImpactModelParam's
         transform method.
+        :param as_array: if True, scores are returned as ArrayLCIAScores.
+        :param backend: backend executing the models. If None, the default backend
+        of the process is used, see execution.default_backend.
         :return: a dict mapping impact's name with corresponding score, or list of
         scores.
         """
-        lambda_models = {
-            method: lambdify(
-                [param for param in transformed_params], model, modules=["numpy"]
-            )
-            for method, model in self.models.items()
-        }
+        if backend is None:
+            backend = default_backend()
+        lambda_models = self.compiled_models(tuple(sorted(transformed_params)))
+        size = max([np.size(value) for value in transformed_params.values()], default=1)
         results = {}
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for method_name, lambda_model in lambda_models.items():
-                futures.append(
-                    executor.submit(
-                        self._multithread_compute_process,
-                        method_name=method_name,
-                        lambda_model=lambda_model,
-                        **transformed_params,
-                    )
-                )
-            for future in as_completed(futures):
-                results.update(future.result())
+        for result in backend.map(
+            self._multithread_compute_process,
+            [
+                {
+                    "method_name": method_name,
+                    "lambda_model": lambda_model,
+                    **transformed_params,
+                }
+                for method_name, lambda_model in lambda_models.items()
+            ],
+            size=size,
+        ):
+            results.update(result)
 
-        if isinstance(list(results.values())[0], np.ndarray):
-            results_ = results.copy()
-            results.update({key: value.tolist() for key, value in results_.items()})
-        return LCIAScores(scores=results)
+        scores = ArrayLCIAScores(
+            methods=list(lambda_models.keys()),
+            values=np.array(
+                [np.atleast_1d(results[method]) for method in lambda_models.keys()],
+                dtype=np.float64,
+            ),
+            scalar=not isinstance(list(results.values())[0], np.ndarray),
+        )
+        return scores if as_array else scores.to_lcia_scores()
 
     @staticmethod
     def _multithread_compute_process(method_name, lambda_model, **params):
@@ -2,18 +2,19 @@ from __future__ import annotations
 
 import re
 from collections import defaultdict
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import networkx as nx
 import numpy as np
 import pandas as pd
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, PrivateAttr, ValidationError
 from pydantic_core import PydanticCustomError
 from SALib.sample import sobol
 from sympy import Expr
 
 from apparun.expressions import ParamsValuesSet
 from apparun.logger import logger
+from apparun.samplers import Sampler
 
 
 class ImpactModelParam(BaseModel):
@@ -73,6 +74,15 @@ class ImpactModelParam(BaseModel):
         """
         self.default = new_value
 
+    @property
+    def symbols(self) -> List[str]:
+        """
+        Names of the symbols standing for the parameter in impact models, i.e. the
+        keys of the dict returned by transform method.
+        :return: a list of symbols names.
+        """
+        return []
+
     def draw_to_distrib(self, samples) -> Union[List[str], List[float]]:
         return
 
@@ -120,6 +130,10 @@ class FloatParam(ImpactModelParam):
                 self.min = self.default - (self.default * self.pm_perc)
                 self.max = self.default + (self.default * self.pm_perc)
 
+    @property
+    def symbols(self) -> List[str]:
+        return [self.name]
+
     def transform(
         self, values: Union[float, List[float]]
     ) -> Dict[str, Union[float, np.array]]:
@@ -142,6 +156,75 @@ class FloatParam(ImpactModelParam):
         return symbol_name == self.name
 
 
+class EnumCodes(BaseModel):
+    """
+    Values of an enum parameter, stored as the index of each value in the options of
+    the parameter. Codes are much lighter than lists of options, and are one hot
+    encoded without going through options' names. Behaves like a list of options.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    codes: np.ndarray
+    "Index of each value in options, as small integers."
+    options: List[str]
+    _one_hot: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    @staticmethod
+    def codes_dtype(n_options: int) -> np.dtype:
+        """
+        Get the smallest integer type able to store the index of each option.
+        :param n_options: number of options.
+        :return: numpy integer type.
+        """
+        return np.min_scalar_type(-max(n_options, 1))
+
+    @staticmethod
+    def from_codes(codes: np.ndarray, options: List[str]) -> EnumCodes:
+        """
+        Build enum values from options' indexes.
+        :param codes: index of each value in options.
+        :param options: options of the enum parameter.
+        :return: enum values.
+        """
+        return EnumCodes(
+            codes=np.asarray(codes, dtype=EnumCodes.codes_dtype(len(options))),
+            options=list(options),
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_list())
+
+    def __getitem__(self, item: int) -> str:
+        return self.options[self.codes[item]]
+
+    def to_array(self) -> np.ndarray:
+        """
+        Get the options of each value.
+        :return: an object array of options' names.
+        """
+        return np.array(self.options, dtype=object)[self.codes]
+
+    def to_list(self) -> List[str]:
+        return self.to_array().tolist()
+
+    def one_hot(self) -> np.ndarray:
+        """
+        One hot encode the values. Encoding is computed at first call, and cached.
+        :return: an array of shape (options, values), 1 if value is row's option, 0
+        otherwise.
+        """
+        if self._one_hot is None:
+            self._one_hot = (
+                self.codes[np.newaxis, :] == np.arange(len(self.options))[:, np.newaxis]
+            ).astype(np.int64)
+        return self._one_hot
+
+
 class EnumParam(ImpactModelParam):
     """
     Impact model enum parameter.
@@ -165,6 +248,10 @@ class EnumParam(ImpactModelParam):
     def options(self):
         return self.weights.keys()
 
+    @property
+    def symbols(self) -> List[str]:
+        return self.dummies_names
+
     def update_default(self, new_value: str, weights_to_default: bool = False):
         """
         Change default value of the parameter, and optionally update the weights to match
@@ -209,8 +296,50 @@ class EnumParam(ImpactModelParam):
             for option in self.options
         }
 
+    def codes(self, values: Union[List[str], np.ndarray]) -> np.ndarray:
+        """
+        Get the index of each option of a list in parameter's options.
+        :param values: list of options.
+        :return: an array of options' indexes, -1 for unknown options.
+        """
+        return np.asarray(
+            pd.Categorical(values, categories=list(self.options)).codes, dtype=np.int64
+        )
+
+    def encode(self, values: Union[List[str], np.ndarray, EnumCodes]) -> EnumCodes:
+        """
+        Encode a list of options as options' indexes.
+        :param values: list of options.
+        :return: encoded values.
+        """
+        if isinstance(values, EnumCodes) and values.options == list(self.options):
+            return values
+        if isinstance(values, EnumCodes):
+            values = values.to_array()
+        codes = self.codes(values)
+        if np.any(codes < 0):
+            unknown_options = set(np.asarray(values, dtype=object)[codes < 0])
+            raise ValueError(
+                f"Unknown options {unknown_options} for parameter {self.name}"
+            )
+        return EnumCodes.from_codes(codes, list(self.options))
+
+    def one_hot(self, codes: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        One hot encode options' indexes.
+        :param codes: an array of options' indexes, as given by codes method.
+        :return: a dict mapping each dummy name to its values, 1 if sample's option is
+        dummy's option, 0 otherwise.
+        """
+        return dict(
+            zip(
+                self.dummies_names,
+                EnumCodes.from_codes(codes, list(self.options)).one_hot(),
+            )
+        )
+
     def transform(
-        self, values: Union[str, List[str]]
+        self, values: Union[str, List[str], EnumCodes]
     ) -> Dict[str, Union[float, np.array]]:
         """
         Transform option, or list of options to be readily usable by ImpactModel.
@@ -218,25 +347,41 @@ class EnumParam(ImpactModelParam):
         :param values:
         :return: a dict mapping parameter name and transformed values.
         """
-        if isinstance(values, list):
-            return (
-                pd.DataFrame([self.look_up_table().get(value) for value in values])
-                .apply(np.array, axis=0, result_type="reduce")
-                .to_dict()
-            )
+        if isinstance(values, (list, np.ndarray, EnumCodes)):
+            return dict(zip(self.dummies_names, self.encode(values).one_hot()))
         return self.look_up_table()[values]
 
+    def draw_to_codes(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Map samples of the unit interval to options' indexes, each option being drawn
+        with a probability proportional to its weight.
+        :param samples: an array of values between 0 and 1.
+        :return: an array of options' indexes.
+        """
+        weights = np.asarray(list(self.weights.values()), dtype=float)
+        bounds = np.cumsum(weights) / np.sum(weights)
+        codes = np.searchsorted(bounds, samples, side="right")
+        # Samples equal to 1 are given the last option with a non null weight
+        return np.minimum(codes, np.flatnonzero(weights)[-1])
+
+    def codes_to_options(self, codes: np.ndarray) -> List[str]:
+        """
+        Get the options corresponding to options' indexes.
+        :param codes: an array of options' indexes.
+        :return: list of options.
+        """
+        return np.array(list(self.options), dtype=object)[codes].tolist()
+
     def draw_to_distrib(self, samples: np.ndarray) -> List[str]:
-        bin_to_names = {
-            i + 1: list(self.weights.keys())[i] for i in range(len(self.weights))
-        }
-        weights = list(self.weights.values())
-        bins = [0] + list(np.cumsum(weights) / np.sum(weights))
-        transformed_samples = list(np.digitize(samples, bins))
-        transformed_samples = list(
-            pd.DataFrame(transformed_samples).replace(bin_to_names).values.ravel()
-        )
-        return transformed_samples
+        return self.codes_to_options(self.draw_to_codes(samples))
+
+    def draw_to_enum_codes(self, samples: np.ndarray) -> EnumCodes:
+        """
+        Map samples of the unit interval to options, as encoded values.
+        :param samples: an array of values between 0 and 1.
+        :return: encoded options.
+        """
+        return EnumCodes.from_codes(self.draw_to_codes(samples), list(self.options))
 
     def corresponds(self, symbol_name: str) -> bool:
         return symbol_name in self.dummies_names
@@ -250,6 +395,17 @@ class ImpactModelParams(BaseModel):
     def names(self):
         return [parameter.name for parameter in self.parameters]
 
+    @property
+    def symbols(self) -> List[str]:
+        """
+        Names of the symbols standing for all the parameters in impact models, once
+        transformed.
+        :return: a sorted list of symbols names.
+        """
+        return sorted(
+            [symbol for parameter in self.parameters for symbol in parameter.symbols]
+        )
+
     def to_list(self, sorted_by_name: Optional[bool] = False) -> List[Dict]:
         """
         Convert each parameter of parameters attributes to a dict, return them as a list,
@@ -342,21 +498,8 @@ class ImpactModelParams(BaseModel):
             ]
         )
 
-    def __init__(self, **args):
-        super().__init__(**args)
-        self.__curr = 0
-
-    def __iter__(self):
-        return self
-
-    def __next__(self) -> ImpactModelParam:
-        if self.__curr >= len(self.parameters):
-            self.__curr = 0
-            raise StopIteration()
-
-        param = self.parameters[self.__curr]
-        self.__curr += 1
-        return param
+    def __iter__(self) -> Iterator[ImpactModelParam]:
+        return iter(self.parameters)
 
     def __getitem__(self, key: int | str) -> ImpactModelParam:
         if isinstance(key, int):
@@ -371,20 +514,41 @@ class ImpactModelParams(BaseModel):
             "bounds": [[0, 1]] * len(self.parameters),
         }
 
-    def sobol_draw(self, n) -> np.ndarray:
+    def sobol_draw(self, n, calc_second_order: bool = True) -> np.ndarray:
         self.set_sobol_problem()
-        samples = sobol.sample(self.sobol_problem, n)
+        samples = sobol.sample(
+            self.sobol_problem, n, calc_second_order=calc_second_order
+        )
         return samples
 
     def uniform_draw(self, n) -> np.ndarray:
         return np.random.rand(n, len(self.parameters))
 
+    def draw(self, n, sampler: Optional[Sampler] = None) -> np.ndarray:
+        """
+        Draw samples of the unit hypercube, one dimension per parameter.
+        :param n: number of samples.
+        :param sampler: sampler drawing the samples. If None, uniform_draw is used.
+        :return: an array of shape (n, number of parameters).
+        """
+        if sampler is None:
+            return self.uniform_draw(n)
+        return sampler.draw(n, len(self.parameters))
+
     def draw_to_distrib(
         self, samples: np.ndarray
-    ) -> Dict[str, Union[List[float], List[str]]]:
+    ) -> Dict[str, Union[List[float], EnumCodes]]:
+        """
+        Map samples of the unit hypercube to the distributions of the parameters.
+        :param samples: an array of shape (samples, parameters).
+        :return: a dict mapping parameters' name with their values. Values of enum
+        parameters are encoded.
+        """
         return {
-            self.parameters[i].name: self.parameters[i].draw_to_distrib(samples[:, i])
-            for i in range(len(self.parameters))
+            parameter.name: parameter.draw_to_enum_codes(samples[:, i])
+            if parameter.type == "enum"
+            else parameter.draw_to_distrib(samples[:, i])
+            for i, parameter in enumerate(self.parameters)
         }
 
 
@@ -395,7 +559,8 @@ class ImpactModelParamsValues(BaseModel):
     ATTENTION!! Use the method from dict to build instance of this class.
     """
 
-    values: Dict[str, List[Union[float, int, str]]]
+    values: Dict[str, Union[List[Union[float, int, str]], EnumCodes]]
+    "Values of each parameter, enum parameters' values being encoded."
 
     def __getitem__(self, item):
         if item in self.values.keys():
@@ -404,13 +569,20 @@ class ImpactModelParamsValues(BaseModel):
             raise KeyError()
 
     @classmethod
-    def from_dict(
+    def to_list_values(
         cls,
         parameters: ImpactModelParams,
         values: Dict[
             str, Union[float, int, str, dict, List[Union[float, int, str, dict]]]
         ],
-    ) -> ImpactModelParamsValues:
+    ) -> Dict[str, List[Union[float, int, str, dict]]]:
+        """
+        Complete the values with the default values of the missing parameters, and
+        transform all the values into lists of the same size.
+        :param parameters: parameters of the impact model.
+        :param values: value, or list of values, of the parameters.
+        :return: a list of values for each parameter.
+        """
         # Values with the default values for the parameters not in the values
         all_values = {
             **values,
@@ -420,11 +592,10 @@ class ImpactModelParamsValues(BaseModel):
                 if param.name not in values
             },
         }
-        # Step 1 - Transform all values into lists
         empty_list_values = [
             name
             for name, value in values.items()
-            if isinstance(value, list) and len(value) == 0
+            if isinstance(value, (list, EnumCodes)) and len(value) == 0
         ]
         if empty_list_values:
             raise ValidationError.from_exception_data(
@@ -443,7 +614,9 @@ class ImpactModelParamsValues(BaseModel):
                 ],
             )
 
-        list_values = [value for value in values.values() if isinstance(value, list)]
+        list_values = [
+            value for value in values.values() if isinstance(value, (list, EnumCodes))
+        ]
         if any(
             len(list_values[0]) != len(list_values[i])
             for i in range(1, len(list_values))
@@ -462,20 +635,52 @@ class ImpactModelParamsValues(BaseModel):
             )
 
         size = max(map(len, list_values)) if list_values else 1
-        list_values = {
-            name: value if isinstance(value, list) else [value] * size
+        return {
+            name: value if isinstance(value, (list, EnumCodes)) else [value] * size
             for name, value in all_values.items()
         }
 
-        # Step 2 - Transform the values to expressions
-        exprs_sets = []
-        for idx in range(size):
-            exprs_sets.append(
-                ParamsValuesSet.build(
-                    {name: value[idx] for name, value in list_values.items()},
-                    parameters,
-                )
+    @classmethod
+    def from_dict(
+        cls,
+        parameters: ImpactModelParams,
+        values: Dict[
+            str, Union[float, int, str, dict, List[Union[float, int, str, dict]]]
+        ],
+    ) -> ImpactModelParamsValues:
+        # Step 1 - Transform all values into lists
+        list_values = cls.to_list_values(parameters, values)
+        size = len(next(iter(list_values.values()), [None]))
+
+        # Step 2 - Transform the values to expressions. Samples are grouped by
+        # expression, constant values being excluded, so each expression is only
+        # parsed once per group.
+        params_by_name = {param.name: param for param in parameters.parameters}
+        constant_names = [
+            name
+            for name, value in list_values.items()
+            if cls._is_constant_column(value, params_by_name[name])
+        ]
+        groups = {}
+        if len(constant_names) == len(list_values):
+            groups[()] = list(range(size))
+        for idx in range(size if not groups else 0):
+            key = tuple(
+                None
+                if cls._is_constant_value(value[idx], params_by_name[name])
+                else repr(value[idx])
+                for name, value in list_values.items()
+                if name not in constant_names
             )
+            groups.setdefault(key, []).append(idx)
+        groups = [np.array(group_idx) for group_idx in groups.values()]
+        exprs_sets = [
+            ParamsValuesSet.build(
+                {name: value[group_idx[0]] for name, value in list_values.items()},
+                parameters,
+            )
+            for group_idx in groups
+        ]
 
         # Step 3 - Dependencies cycles detection
         for exprs_set in exprs_sets:
@@ -499,41 +704,79 @@ class ImpactModelParamsValues(BaseModel):
             except nx.NetworkXNoCycle:
                 pass
 
-        # Step 4 - Expressions' evaluation
-        final_values = defaultdict(list)
-        for exprs_set in exprs_sets:
-            evals = exprs_set.evaluate()
-            for name, value in evals.items():
-                final_values[name].append(value)
+        # Step 4 - Expressions' evaluation, over the whole samples of each group
+        columns = {
+            name: value.to_array()
+            if isinstance(value, EnumCodes)
+            else np.array(
+                value,
+                dtype=np.float64
+                if params_by_name[name].type == "float" and name in constant_names
+                else object,
+            )
+            for name, value in list_values.items()
+        }
+        final_values = {
+            name: np.empty(size, dtype=np.float64 if param.type == "float" else object)
+            for name, param in params_by_name.items()
+        }
+        groups_idx = np.empty(size, dtype=int)
+        for group, (group_idx, exprs_set) in enumerate(zip(groups, exprs_sets)):
+            groups_idx[group_idx] = group
+            constant_values = {
+                name: columns[name][group_idx].astype(
+                    np.float64 if params_by_name[name].type == "float" else object
+                )
+                for name, value in list_values.items()
+                if name in constant_names
+                or cls._is_constant_value(value[group_idx[0]], params_by_name[name])
+            }
+            for name, value in exprs_set.evaluate_array(
+                constant_values, len(group_idx)
+            ).items():
+                final_values[name][group_idx] = value
 
         # Step 5 - Validation of the final values
         errors = []
         for name, value in final_values.items():
-            for idx, elem in enumerate(value):
-                parameter = parameters[name]
-                match parameter.type:
-                    case "float":
-                        if parameter.min is None or parameter.max is None:
+            parameter = params_by_name[name]
+            match parameter.type:
+                case "float":
+                    if parameter.min is None or parameter.max is None:
+                        logger.warning(
+                            f"Parameter {parameter.name} does not have valid bounds. "
+                            f"Consider calling update_bounds()."
+                        )
+                        continue
+                    for idx in np.flatnonzero(
+                        (value < parameter.min) | (value > parameter.max)
+                    ):
+                        elem = value[idx]
+                        if exprs_sets[groups_idx[idx]][name].is_complex:
                             logger.warning(
-                                f"Parameter {parameter.name} does not have valid bounds. "
-                                f"Consider calling update_bounds()."
+                                "The value %s (got after evaluating the expression %s) for the parameter %s is outside its [min, max] range",
+                                str(elem),
+                                name,
+                                str(exprs_sets[groups_idx[idx]][name].raw_version),
                             )
-                        elif elem < parameter.min or elem > parameter.max:
-                            if exprs_sets[idx][name].is_complex:
-                                logger.warning(
-                                    "The value %s (got after evaluating the expression %s) for the parameter %s is outside its [min, max] range",
-                                    str(elem),
-                                    name,
-                                    str(exprs_sets[idx][name].raw_version),
-                                )
-                            else:
-                                logger.warning(
-                                    "The value %s for the parameter %s is outside its [min, max] range",
-                                    str(elem),
-                                    name,
-                                )
-                    case "enum" if elem not in parameter.options:
-                        if exprs_sets[idx][name].is_complex:
+                        else:
+                            logger.warning(
+                                "The value %s for the parameter %s is outside its [min, max] range",
+                                str(elem),
+                                name,
+                            )
+                case "enum":
+                    if isinstance(list_values.get(name), EnumCodes):
+                        # Encoded values are valid options, and constant
+                        final_values[name] = parameter.encode(list_values[name])
+                        continue
+                    codes = parameter.codes(value)
+                    final_values[name] = EnumCodes.from_codes(
+                        codes, list(parameter.options)
+                    )
+                    for idx in np.flatnonzero(codes < 0):
+                        elem = value[idx]
+                        if exprs_sets[groups_idx[idx]][name].is_complex:
                             errors.append(
                                 {
                                     "type": PydanticCustomError(
@@ -543,7 +786,9 @@ class ImpactModelParamsValues(BaseModel):
                                             "value": elem,
                                             "target_parameter": name,
                                             "expr": str(
-                                                exprs_sets[idx][name].raw_version
+                                                exprs_sets[groups_idx[idx]][
+                                                    name
+                                                ].raw_version
                                             ),
                                         },
                                     )
@@ -562,7 +807,81 @@ class ImpactModelParamsValues(BaseModel):
         if errors:
             raise ValidationError.from_exception_data("", line_errors=errors)
 
-        return ImpactModelParamsValues(**{"values": final_values})
+        return ImpactModelParamsValues.model_construct(
+            values={
+                name: value if isinstance(value, EnumCodes) else value.tolist()
+                for name, value in final_values.items()
+            }
+        )
+
+    @classmethod
+    def _is_constant_column(
+        cls,
+        values: Union[List[Union[float, int, str, dict]], EnumCodes],
+        parameter: ImpactModelParam,
+    ) -> bool:
+        """
+        Tell if all the values given for a parameter are constants.
+        :param values: values given for the parameter.
+        :param parameter: parameter the values are given for.
+        :return: True if all values are constants.
+        """
+        if isinstance(values, EnumCodes):
+            return True
+        # Lists of numbers, or of strings, are converted to arrays without Python loop
+        kind = np.asarray(values).dtype.kind if len(values) > 0 else "O"
+        if kind in "biuf":
+            return parameter.type == "float"
+        if kind == "U":
+            return parameter.type == "enum"
+        return all(cls._is_constant_value(value, parameter) for value in values)
+
+    @staticmethod
+    def _is_constant_value(
+        value: Union[float, int, str, dict], parameter: ImpactModelParam
+    ) -> bool:
+        """
+        Tell if a value is a constant, which doesn't need to be parsed as an expression,
+        i.e. a number for a float parameter or an option for an enum parameter.
+        :param value: value given for the parameter.
+        :param parameter: parameter the value is given for.
+        :return: True if the value is a constant.
+        """
+        if parameter.type == "float":
+            return isinstance(value, (int, float))
+        return isinstance(value, str)
+
+    @classmethod
+    def from_dicts(
+        cls,
+        parameters: ImpactModelParams,
+        values_list: List[
+            Dict[str, Union[float, int, str, dict, List[Union[float, int, str, dict]]]]
+        ],
+    ) -> Tuple[ImpactModelParamsValues, List[int]]:
+        """
+        Build a single set of values from several sets of values, so they can be
+        evaluated at once. Values of each set are concatenated, in order.
+        :param parameters: parameters of the impact model.
+        :param values_list: sets of values, each set being a value, or list of values,
+        for each parameter.
+        :return: concatenated values, and the number of values of each set.
+        """
+        lists_values = [
+            cls.to_list_values(parameters, values) for values in values_list
+        ]
+        sizes = [len(next(iter(values.values()), [None])) for values in lists_values]
+        concatenated_values = {
+            name: [
+                value
+                for list_values, size in zip(lists_values, sizes)
+                for value in list_values.get(name, [parameters[name].default] * size)
+            ]
+            for name in dict.fromkeys(
+                name for list_values in lists_values for name in list_values
+            )
+        }
+        return cls.from_dict(parameters, concatenated_values), sizes
 
     def items(self):
         return self.values.items()
@@ -0,0 +1,249 @@
+"""
+This module contains the registry keeping impact models loaded in memory, so they are
+not loaded from disk each time they are used.
+"""
+from __future__ import annotations
+
+import gc
+import hashlib
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+from apparun.impact_model import ImpactModel
+from apparun.logger import logger
+
+APPARUN_REGISTRY_MAX_MODELS = int(os.environ.get("APPARUN_REGISTRY_MAX_MODELS", 32))
+APPARUN_REGISTRY_MAX_MEMORY = int(
+    os.environ.get("APPARUN_REGISTRY_MAX_MEMORY", 512 * 1024**2)
+)
+
+
+def file_hash(filepath: str) -> str:
+    """
+    Compute the hash of a file's content.
+    :param filepath: path of the file.
+    :return: sha256 hex digest of the file.
+    """
+    with open(filepath, "rb") as stream:
+        return hashlib.file_digest(stream, "sha256").hexdigest()
+
+
+def deep_sizeof(obj) -> int:
+    """
+    Estimate the memory used by an object and all the objects it references. Modules
+    and classes are not counted, nor the globals of functions, so only the code of
+    functions such as compiled models is counted. Objects referenced several times
+    are only counted once.
+    :param obj: object to measure.
+    :return: estimated size of the object, in bytes.
+    """
+    excluded_types = (type, types.ModuleType)
+    seen = set()
+    size = 0
+    objects = [obj]
+    while objects:
+        objects = [
+            referent
+            for referent in objects
+            if id(referent) not in seen and not isinstance(referent, excluded_types)
+        ]
+        for referent in objects:
+            seen.add(id(referent))
+            size += sys.getsizeof(referent)
+        functions = [
+            referent for referent in objects if isinstance(referent, types.FunctionType)
+        ]
+        objects = gc.get_referents(
+            *[
+                referent
+                for referent in objects
+                if not isinstance(referent, types.FunctionType)
+            ]
+        ) + [function.__code__ for function in functions]
+    return size
+
+
+class RegisteredModel(BaseModel):
+    """
+    An impact model kept in the registry, along with the state of the file it was
+    loaded from.
+    """
+
+    impact_model: ImpactModel
+    mtime_ns: int
+    file_size: int
+    file_hash: str
+    memory: int
+    "Estimated memory used by the impact model, in bytes."
+    tree_evaluators_count: int = 0
+    "Number of tree evaluators cached by the impact model when memory was estimated."
+
+
+class ModelRegistry(BaseModel):
+    """
+    In-process registry of impact models loaded from YAML files. Least recently used
+    models are evicted once the maximum number of models or the memory budget is
+    exceeded. A model is loaded again if its file's content changed since it was
+    loaded. Registered impact models are shared, they must not be modified.
+    """
+
+    max_models: int = APPARUN_REGISTRY_MAX_MODELS
+    "Maximum number of models kept in memory."
+    max_memory: int = APPARUN_REGISTRY_MAX_MEMORY
+    "Memory budget of the registry, in bytes."
+    hits: int = 0
+    misses: int = 0
+    _models: OrderedDict[str, RegisteredModel] = PrivateAttr(
+        default_factory=OrderedDict
+    )
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def memory(self) -> int:
+        """
+        Estimated memory used by all registered models.
+        :return: memory used, in bytes.
+        """
+        with self._lock:
+            return sum(model.memory for model in self._models.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+    def __contains__(self, filepath: str) -> bool:
+        with self._lock:
+            return os.path.abspath(filepath) in self._models
+
+    def get(self, filepath: str) -> ImpactModel:
+        """
+        Get the impact model stored in a YAML file, loading it only if it is not
+        registered yet or if the file changed since it was loaded.
+        :param filepath: path of the impact model's YAML file.
+        :return: the impact model.
+        """
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        # Registered models are only read and updated with the lock acquired, so
+        # concurrent calls don't race on their file's state nor on eviction. Loading
+        # a model is done outside of the lock, so it doesn't block other models.
+        with self._lock:
+            registered = self._models.get(filepath)
+            if registered is not None and (
+                registered.mtime_ns != stat.st_mtime_ns
+                or registered.file_size != stat.st_size
+            ):
+                if file_hash(filepath) != registered.file_hash:
+                    logger.info(f"Impact model {filepath} changed, reloading it")
+                    del self._models[filepath]
+                    registered = None
+                else:
+                    registered.mtime_ns = stat.st_mtime_ns
+                    registered.file_size = stat.st_size
+            if registered is not None:
+                self._models.move_to_end(filepath)
+                self.hits += 1
+                impact_model = registered.impact_model
+                if (
+                    impact_model.tree_evaluators_count
+                    != registered.tree_evaluators_count
+                ):
+                    # Tree evaluators compiled since the last estimate, by computations
+                    # of the model, count in the memory budget
+                    registered.memory = deep_sizeof(impact_model)
+                    registered.tree_evaluators_count = (
+                        impact_model.tree_evaluators_count
+                    )
+                    self.evict()
+                return impact_model
+            self.misses += 1
+        registered = self.load(filepath)
+        with self._lock:
+            self._models[filepath] = registered
+            self._models.move_to_end(filepath)
+            self.evict()
+        return registered.impact_model
+
+    def loaded(self, filepath: str, content_hash: str) -> Optional[ImpactModel]:
+        """
+        Get an impact model if it is already registered, without loading it nor
+        counting a hit or a miss.
+        :param filepath: path of the impact model's YAML file.
+        :param content_hash: hash of the file's current content.
+        :return: the impact model, or None if it is not registered or if its file
+        changed since it was loaded.
+        """
+        with self._lock:
+            registered = self._models.get(os.path.abspath(filepath))
+            if registered is None or registered.file_hash != content_hash:
+                return None
+            return registered.impact_model
+
+    @staticmethod
+    def load(filepath: str) -> RegisteredModel:
+        """
+        Load an impact model from disk.
+        :param filepath: path of the impact model's YAML file.
+        :return: the impact model, along with the state of its file.
+        """
+        stat = os.stat(filepath)
+        content_hash = file_hash(filepath)
+        impact_model = ImpactModel.from_yaml(filepath)
+        if impact_model is None:
+            raise ValueError(f"Invalid impact model {filepath}")
+        return RegisteredModel(
+            impact_model=impact_model,
+            mtime_ns=stat.st_mtime_ns,
+            file_size=stat.st_size,
+            file_hash=content_hash,
+            memory=deep_sizeof(impact_model),
+            tree_evaluators_count=impact_model.tree_evaluators_count,
+        )
+
+    def evict(self):
+        """
+        Remove least recently used models until the number of models and the memory
+        used fit in the registry's limits. Most recently used model is always kept.
+        Must be called with the lock acquired.
+        """
+        memory = sum(model.memory for model in self._models.values())
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models or memory > self.max_memory
+        ):
+            filepath, registered = self._models.popitem(last=False)
+            memory -= registered.memory
+            logger.info(f"Impact model {filepath} evicted from the registry")
+
+    def invalidate(self, filepath: Optional[str] = None):
+        """
+        Remove a model from the registry, or all the models.
+        :param filepath: path of the impact model's YAML file. If None, all models are
+        removed.
+        """
+        with self._lock:
+            if filepath is None:
+                self._models.clear()
+            else:
+                self._models.pop(os.path.abspath(filepath), None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the usage statistics of the registry.
+        :return: a dict with the number of models, memory used, hits and misses.
+        """
+        return {
+            "models": len(self),
+            "memory": self.memory,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+model_registry = ModelRegistry()
+"Registry shared by the whole process."
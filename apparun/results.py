@@ -1,14 +1,16 @@
 from __future__ import annotations
 
+import copy
 import os
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 from apparun.impact_model import ImpactModel
+from apparun.samplers import new_sampler
 
 RESULTS = {}
 
@@ -246,6 +248,10 @@ class SobolIndexResult(ImpactModelResult):
 
     parameters: Optional[dict[str, Union[float, str]]] = None
     n: int
+    calc_second_order: bool = True
+    "If False, samples needed by second order indices are not drawn."
+    bootstrap: bool = True
+    "If False, only first order indices are estimated, without bootstrap."
 
     def get_table(self) -> pd.DataFrame:
         """
@@ -253,7 +259,11 @@ class SobolIndexResult(ImpactModelResult):
         Save it to disk according to configuration specified in result attributes.
         :return: tabular results as a pandas DataFrame.
         """
-        sobol_indices = self.impact_model.get_sobol_s1_indices(n=self.n)
+        sobol_indices = self.impact_model.get_sobol_s1_indices(
+            n=self.n,
+            calc_second_order=self.calc_second_order,
+            bootstrap=self.bootstrap,
+        )
         table = pd.DataFrame(sobol_indices)
         if self.table_save_path is not None:
             os.makedirs(self.table_save_path, exist_ok=True)
@@ -285,10 +295,19 @@ class NodesSobolIndexResult(ImpactModelResult):
 
     parameters: Optional[dict[str, Union[float, str]]] = None
     n: int
+    calc_second_order: bool = True
+    "If False, samples needed by second order indices are not drawn."
+    bootstrap: bool = True
+    "If False, only first order indices are estimated, without bootstrap."
 
     def get_table(self) -> pd.DataFrame:
         """ """
-        sobol_indices = self.impact_model.get_sobol_s1_indices(n=self.n, all_nodes=True)
+        sobol_indices = self.impact_model.get_sobol_s1_indices(
+            n=self.n,
+            all_nodes=True,
+            calc_second_order=self.calc_second_order,
+            bootstrap=self.bootstrap,
+        )
         table = pd.DataFrame(sobol_indices)
         if self.table_save_path is not None:
             os.makedirs(self.table_save_path, exist_ok=True)
@@ -318,13 +337,19 @@ class NodesUncertaintyResult(ImpactModelResult):
     """
 
     n: int
+    sampler: Optional[str] = None
+    "Registered name of the sampler drawing the samples, such as lhs or sobol."
+    seed: Optional[int] = None
+    "Seed of the sampler, for reproducible results."
 
     def get_table(self) -> pd.DataFrame:
         """
         Run monte carlo simulation for each node, get all values as a long format table.
         :return: results of each draw for each node as a long format table
         """
-        nodes_scores = self.impact_model.get_uncertainty_nodes_scores(n=self.n)
+        nodes_scores = self.impact_model.get_uncertainty_nodes_scores(
+            n=self.n, as_array=True, sampler=new_sampler(self.sampler, self.seed)
+        )
         nodes_scores = [node_scores.to_unpivoted_df() for node_scores in nodes_scores]
         table = pd.concat(nodes_scores)
         table = table.rename(columns={"name": "node"})
@@ -352,13 +377,19 @@ class UncertaintyResult(ImpactModelResult):
     """
     Generate uncertainty for FU using Monte Carlo. Result figure as a boxplot.
     """
+    sampler: Optional[str] = None
+    "Registered name of the sampler drawing the samples, such as lhs or sobol."
+    seed: Optional[int] = None
+    "Seed of the sampler, for reproducible results."
 
     def get_table(self) -> pd.DataFrame:
         """
         Run monte carlo simulation for FU, get all values as a long format table.
         :return: results of each draw as a long format table
         """
-        lcia_score = self.impact_model.get_uncertainty_scores(n=self.n)
+        lcia_score = self.impact_model.get_uncertainty_scores(
+            n=self.n, as_array=True, sampler=new_sampler(self.sampler, self.seed)
+        )
         lcia_score = lcia_score.to_unpivoted_df()
         lcia_score = lcia_score.rename(columns={"name": "node"})
         lcia_score["node"] = "fu"
@@ -382,26 +413,58 @@ class UncertaintyResult(ImpactModelResult):
 
 @register_result("scenario_comparison")
 class ScenarioComparisonResult(ImpactModelResult):
+    """
+    Compare nodes scores of several scenarios. Table of each scenario is kept, so
+    only scenarios added, or whose parameters changed, since last get_table call are
+    computed, all together as a single batch.
+    """
+
     scenarios_parameters: Dict[str, Dict[str, Any]]
     by_property: Optional[str] = None
+    _scenarios_tables: Dict[str, Tuple[Dict[str, Any], pd.DataFrame]] = PrivateAttr(
+        default_factory=dict
+    )
 
-    def get_table(self) -> pd.DataFrame:
-        results = {
-            scenario_name: self.impact_model.get_nodes_scores(
-                **scenario_params, by_property=self.by_property
-            )
+    def get_scenarios_tables(self) -> Dict[str, pd.DataFrame]:
+        """
+        Get the nodes scores table of each scenario, computing only the scenarios
+        whose table is not already kept.
+        :return: table of each scenario, by scenario name.
+        """
+        pending = {
+            scenario_name: scenario_params
             for scenario_name, scenario_params in self.scenarios_parameters.items()
+            if scenario_name not in self._scenarios_tables
+            or self._scenarios_tables[scenario_name][0]
+            != {"by_property": self.by_property, **scenario_params}
         }
-        results = {
-            scenario_name: pd.concat(
-                [node_data.to_unpivoted_df() for node_data in scenario_results]
+        if len(pending) > 0:
+            results = self.impact_model.get_nodes_scores_batch(
+                list(pending.values()), by_property=self.by_property
             )
-            for scenario_name, scenario_results in results.items()
+            for (scenario_name, scenario_params), scenario_results in zip(
+                pending.items(), results
+            ):
+                self._scenarios_tables[scenario_name] = (
+                    copy.deepcopy({"by_property": self.by_property, **scenario_params}),
+                    pd.concat(
+                        [node_data.to_unpivoted_df() for node_data in scenario_results]
+                    ),
+                )
+        self._scenarios_tables = {
+            scenario_name: self._scenarios_tables[scenario_name]
+            for scenario_name in self.scenarios_parameters
         }
+        return {
+            scenario_name: scenario_table
+            for scenario_name, (_, scenario_table) in self._scenarios_tables.items()
+        }
+
+    def get_table(self) -> pd.DataFrame:
         results = pd.concat(
             [
                 pd.DataFrame({"scenario_name": scenario_name, **scenario_results})
-                for scenario_name, scenario_results in results.items()
+                for scenario_name, scenario_results in self.get_scenarios_tables().items()
             ]
         )
         return results
@@ -0,0 +1,196 @@
+"""
+This module contains the samplers drawing points of the unit hypercube, which are then
+mapped to the distributions of impact model's parameters for Monte Carlo runs.
+"""
+from __future__ import annotations
+
+import warnings
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+from pydantic import BaseModel, PrivateAttr
+from scipy.stats import qmc
+
+SAMPLERS = {}
+
+
+def register_sampler(sampler_name):
+    """
+    This decorator registers a new Sampler class in SAMPLERS registry.
+    :param sampler_name: name of the new sampler to register
+    :return: new Sampler class
+    """
+
+    def decorator(decorated_class):
+        if sampler_name not in SAMPLERS:
+            SAMPLERS[sampler_name] = decorated_class
+        return decorated_class
+
+    return decorator
+
+
+def get_sampler(sampler_name: str):
+    """
+    Get a registered Sampler class by name.
+    :param sampler_name: registered name of the desired Sampler.
+    :return: registered Sampler class corresponding to the name.
+    """
+    return SAMPLERS[sampler_name]
+
+
+def registered_samplers() -> List[str]:
+    """
+    Get a list of registered Sampler names.
+    :return: list of registered Sampler names.
+    """
+    return list(SAMPLERS.keys())
+
+
+def new_sampler(
+    sampler_name: Optional[str] = None, seed: Optional[int] = None
+) -> Optional[Sampler]:
+    """
+    Create a sampler from its registered name, as given in results configuration.
+    :param sampler_name: registered name of the sampler. If None and no seed is given,
+    no sampler is created, and parameters' default sampling is used.
+    :param seed: seed of the sampler.
+    :return: the sampler, or None.
+    """
+    if sampler_name is None and seed is None:
+        return None
+    return get_sampler(sampler_name or "uniform")(seed=seed)
+
+
+class Sampler(BaseModel, ABC):
+    """
+    Draws samples of the unit hypercube. Successive draws of a sampler continue the
+    same sequence, so drawing by chunks gives the same samples as drawing at once,
+    except for Latin hypercube sampling. Sampling is reproducible if a seed is given.
+    """
+
+    seed: Optional[int] = None
+    "Seed of the random number generator. If None, samples are not reproducible."
+    _rng: Optional[np.random.Generator] = PrivateAttr(default=None)
+
+    @property
+    def rng(self) -> np.random.Generator:
+        if self._rng is None:
+            self._rng = np.random.default_rng(self.seed)
+        return self._rng
+
+    def reset(self):
+        """
+        Restart the sequence of samples, from the seed.
+        """
+        self._rng = None
+
+    @abstractmethod
+    def draw(self, n: int, d: int) -> np.ndarray:
+        """
+        Draw samples of the unit hypercube.
+        :param n: number of samples.
+        :param d: number of dimensions, i.e. of parameters.
+        :return: an array of shape (n, d), with values between 0 and 1.
+        """
+        raise NotImplementedError()
+
+
+@register_sampler("uniform")
+class UniformSampler(Sampler):
+    """
+    Draws independent uniform samples.
+    """
+
+    def draw(self, n: int, d: int) -> np.ndarray:
+        return self.rng.random((n, d))
+
+
+@register_sampler("antithetic")
+class AntitheticSampler(Sampler):
+    """
+    Draws uniform samples by pairs of antithetic variates u and 1 - u, whose negative
+    correlation reduces the variance of the mean of monotonic models.
+    """
+
+    _pending: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    def reset(self):
+        super().reset()
+        self._pending = None
+
+    def draw(self, n: int, d: int) -> np.ndarray:
+        pending = self._pending if self._pending is not None else np.empty((0, d))
+        self._pending = None
+        half = self.rng.random(((n - len(pending) + 1) // 2, d))
+        pairs = np.stack([half, 1 - half], axis=1).reshape(-1, d)
+        samples = np.concatenate([pending, pairs])
+        if len(samples) > n:
+            # Antithetic of the last sample is kept for the next draw
+            self._pending = samples[n:]
+        return samples[:n]
+
+
+class QMCSampler(Sampler):
+    """
+    Draws samples with an engine of scipy.stats.qmc, created at first draw.
+    """
+
+    _engine: Optional[qmc.QMCEngine] = PrivateAttr(default=None)
+
+    def reset(self):
+        super().reset()
+        self._engine = None
+
+    @abstractmethod
+    def new_engine(self, d: int) -> qmc.QMCEngine:
+        """
+        Create the scipy engine drawing the samples.
+        :param d: number of dimensions.
+        :return: the engine.
+        """
+        raise NotImplementedError()
+
+    def draw(self, n: int, d: int) -> np.ndarray:
+        if self._engine is None or self._engine.d != d:
+            self._engine = self.new_engine(d)
+        return self._engine.random(n)
+
+
+@register_sampler("lhs")
+class LatinHypercubeSampler(QMCSampler):
+    """
+    Draws Latin hypercube samples: each parameter's range is split into n strata of
+    equal probability, each one holding one sample. Each draw is a new hypercube.
+    """
+
+    def new_engine(self, d: int) -> qmc.QMCEngine:
+        return qmc.LatinHypercube(d, rng=self.rng)
+
+
+@register_sampler("sobol")
+class SobolSampler(QMCSampler):
+    """
+    Draws scrambled Sobol' low-discrepancy samples. Balance properties of the
+    sequence hold for numbers of samples which are powers of 2.
+    """
+
+    def new_engine(self, d: int) -> qmc.QMCEngine:
+        return qmc.Sobol(d, scramble=True, rng=self.rng)
+
+    def draw(self, n: int, d: int) -> np.ndarray:
+        # Scipy warns about each draw whose size is not a power of 2, whereas only the
+        # total number of samples matters when drawing by chunks.
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message=".*balance properties.*")
+            return super().draw(n, d)
+
+
+@register_sampler("halton")
+class HaltonSampler(QMCSampler):
+    """
+    Draws scrambled Halton low-discrepancy samples, which can be drawn by any number.
+    """
+
+    def new_engine(self, d: int) -> qmc.QMCEngine:
+        return qmc.Halton(d, scramble=True, rng=self.rng)
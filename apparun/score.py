@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Set, Union
+import os
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 import pandas as pd
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr, field_serializer
 
 from apparun.exceptions import InvalidFileError
 from apparun.impact_methods import MethodUniqueScore
@@ -46,24 +48,11 @@ class LCIAScores(BaseModel):
         :param: filenorm: allows to give a personal .csv file with normalisation factors.
         :return: LCIAScores after normalisation.
         """
-        if filenorm is None:
-            filenorm = method.path_to_norm()
-            logger.warning(f"No given normalisation file, using default {filenorm}")
-        score = LCIAScores(scores=self.scores.copy())
-        normalisation_factor = pd.read_csv(filenorm).sort_values(by=["method"])
-        normalisation_factor = normalisation_factor[
-            normalisation_factor["method"].isin(score.scores.keys())
-        ].set_index("method", drop=True)
-        if len(normalisation_factor) != len(score.scores.keys()):
-            raise InvalidFileError(filenorm)
-        for method_name in score.scores.keys():
-            for i in range(0, len(score.scores[method_name])):
-                score.scores[method_name][i] = (
-                    score.scores[method_name][i]
-                    / normalisation_factor.at[method_name, "score"]
-                )
-
-        return LCIAScores(scores=score.scores)
+        return (
+            ArrayLCIAScores.from_lcia_scores(self)
+            .to_normalised(method=method, filenorm=filenorm)
+            .to_lcia_scores()
+        )
 
     def to_weighted(
         self,
@@ -76,25 +65,11 @@ class LCIAScores(BaseModel):
         :param: fileweight: allows to give a personal .csv file with weighting factors.
         :return: LCIAScores after normalisation.
         """
-        if fileweight is None:
-            fileweight = method.path_to_weight()
-            logger.warning(f"No given weighting file, using default {fileweight}")
-        score = LCIAScores(scores=self.scores.copy())
-        weighting_factor = pd.read_csv(fileweight).sort_values(by=["method"])
-        weighting_factor = weighting_factor[
-            weighting_factor["method"].isin(score.scores.keys())
-        ].set_index("method", drop=True)
-        if len(weighting_factor) != len(score.scores.keys()):
-            raise InvalidFileError(fileweight)
-
-        for method_name in score.scores.keys():
-            for i in range(0, len(score.scores[method_name])):
-                score.scores[method_name][i] = (
-                    score.scores[method_name][i]
-                    * weighting_factor.at[method_name, "score"]
-                )
-
-        return LCIAScores(scores=score.scores)
+        return (
+            ArrayLCIAScores.from_lcia_scores(self)
+            .to_weighted(method=method, fileweight=fileweight)
+            .to_lcia_scores()
+        )
 
     def to_unique_score(
         self,
@@ -113,43 +88,29 @@ class LCIAScores(BaseModel):
         :param: filenorm: allows to give a personal .csv file with normalisation factors.
         :param: fileweight: allows to give a personal .csv file with weighting factors.
         """
-        score = LCIAScores(scores=self.scores.copy())
-        if is_normalised is not False:
-            score = score.to_normalised(method=method, filenorm=filenorm)
-        if is_weighted is not False:
-            score = score.to_weighted(method=method, fileweight=fileweight)
-
-        sum_score = [sum(x) for x in zip(*score.scores.values())]
-        unique_score = {"UNIQUE_SCORE": sum_score}
-        return LCIAScores(scores=unique_score)
+        return (
+            ArrayLCIAScores.from_lcia_scores(self)
+            .to_unique_score(
+                is_normalised=is_normalised,
+                is_weighted=is_weighted,
+                method=method,
+                filenorm=filenorm,
+                fileweight=fileweight,
+            )
+            .to_lcia_scores()
+        )
 
     def __add__(self, other) -> LCIAScores:
-        scores = {
-            method_name: self.scores[method_name] + other.scores[method_name]
-            if isinstance(self.scores[method_name], float)
-            else [
-                self.scores[method_name][i] + other.scores[method_name][i]
-                if method_name in other.scores
-                else self.scores[method_name][i]
-                for i in range(len(self.scores[method_name]))
-            ]
-            for method_name in self.scores.keys()
-        }
-        return LCIAScores(scores=scores)
+        return (
+            ArrayLCIAScores.from_lcia_scores(self)
+            + ArrayLCIAScores.from_lcia_scores(other)
+        ).to_lcia_scores()
 
     def __sub__(self, other) -> LCIAScores:
-        scores = {
-            method_name: self.scores[method_name] - other.scores[method_name]
-            if isinstance(self.scores[method_name], float)
-            else [
-                self.scores[method_name][i] - other.scores[method_name][i]
-                if method_name in other.scores
-                else self.scores[method_name][i]
-                for i in range(len(self.scores[method_name]))
-            ]
-            for method_name in self.scores.keys()
-        }
-        return LCIAScores(scores=scores)
+        return (
+            ArrayLCIAScores.from_lcia_scores(self)
+            - ArrayLCIAScores.from_lcia_scores(other)
+        ).to_lcia_scores()
 
     @staticmethod
     def sum(lcia_scores: List[LCIAScores]) -> LCIAScores:
@@ -160,14 +121,366 @@ class LCIAScores(BaseModel):
         """
         if len(lcia_scores) == 0:
             return LCIAScores()
-        scores = {
-            method_name: [lcia_score.scores[method_name] for lcia_score in lcia_scores]
-            for method_name in lcia_scores[0].method_names
-        }
-        scores = {
-            method_name: sum(score)
-            if isinstance(score[0], float)
-            else [sum(x) for x in zip(*score)]
-            for method_name, score in scores.items()
-        }
-        return LCIAScores(scores=scores)
+        return ArrayLCIAScores.sum(
+            [ArrayLCIAScores.from_lcia_scores(lcia_score) for lcia_score in lcia_scores]
+        ).to_lcia_scores()
+
+
+class FactorsTable(BaseModel):
+    """
+    Normalisation or weighting factors of a .csv file, with a "method" and a "score"
+    column. Factors aligned on a list of impact methods are computed once as a numpy
+    vector, and kept for later requests.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    filepath: str
+    "Path of the .csv file."
+    factors: Dict[str, float]
+    "Factor of each impact method of the file."
+    duplicated_methods: Set[str] = set()
+    "Impact methods appearing more than once in the file, having no valid factor."
+    _vectors: Dict[Tuple[str, ...], np.ndarray] = PrivateAttr(default_factory=dict)
+
+    @staticmethod
+    def from_csv(filepath: str) -> FactorsTable:
+        """
+        Read the factors of a .csv file.
+        :param filepath: .csv file containing the factors.
+        :return: constructed FactorsTable.
+        """
+        factors = pd.read_csv(filepath)
+        methods = factors["method"]
+        return FactorsTable(
+            filepath=filepath,
+            factors=dict(zip(methods, factors["score"].to_numpy(dtype=np.float64))),
+            duplicated_methods=set(methods[methods.duplicated()]),
+        )
+
+    def vector(self, methods: List[str]) -> np.ndarray:
+        """
+        Get the factors of the given impact methods.
+        :param methods: impact methods to get the factors of.
+        :return: factors, in the same order as methods.
+        """
+        key = tuple(methods)
+        if key not in self._vectors:
+            if any(
+                method not in self.factors or method in self.duplicated_methods
+                for method in methods
+            ):
+                raise InvalidFileError(self.filepath)
+            vector = np.array(
+                [self.factors[method] for method in methods], dtype=np.float64
+            )
+            # Vector is shared by all requests
+            vector.flags.writeable = False
+            self._vectors[key] = vector
+        return self._vectors[key]
+
+
+FACTORS_TABLES: Dict[str, Tuple[int, FactorsTable]] = {}
+
+
+def get_factors_table(filepath: str) -> FactorsTable:
+    """
+    Get the factors of a .csv file. File is only read at first request, and read
+    again if it has been modified since.
+    :param filepath: .csv file containing the factors, such as the ones of a
+    MethodUniqueScore.
+    :return: factors of the file.
+    """
+    path = os.path.abspath(filepath)
+    modification_time = os.stat(path).st_mtime_ns
+    if path not in FACTORS_TABLES or FACTORS_TABLES[path][0] != modification_time:
+        FACTORS_TABLES[path] = (modification_time, FactorsTable.from_csv(filepath))
+    return FACTORS_TABLES[path][1]
+
+
+def read_factors(filepath: str, methods: List[str]) -> np.ndarray:
+    """
+    Read normalisation or weighting factors of the given impact methods from a .csv
+    file, with a "method" and a "score" column.
+    :param filepath: .csv file containing the factors.
+    :param methods: impact methods to get the factors of.
+    :return: factors, in the same order as methods.
+    """
+    return get_factors_table(filepath).vector(methods)
+
+
+def unique_score_factors(
+    methods: List[str],
+    is_normalised: Optional[bool] = False,
+    is_weighted: Optional[bool] = False,
+    method: Optional[MethodUniqueScore] = MethodUniqueScore.EF30,
+    filenorm: Optional[str] = None,
+    fileweight: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Combine normalisation and weighting factors into the vector whose dot product
+    with the scores of the impact methods gives the unique score.
+    :param methods: impact methods of the scores.
+    :param: is_normalised: if True, apply normalisation factors.
+    :param: is_weighted: if True, apply weighting factors.
+    :param: method: allows to use default MethodUniqueScore.EF30 or EF31
+    normalisation and weighting factors.
+    :param: filenorm: allows to give a personal .csv file with normalisation
+    factors.
+    :param: fileweight: allows to give a personal .csv file with weighting factors.
+    :return: a factor for each impact method, in the same order as methods.
+    """
+    factors = np.ones(len(methods))
+    if is_normalised is not False:
+        if filenorm is None:
+            filenorm = method.path_to_norm()
+            logger.warning(f"No given normalisation file, using default {filenorm}")
+        factors = factors / read_factors(filenorm, methods)
+    if is_weighted is not False:
+        if fileweight is None:
+            fileweight = method.path_to_weight()
+            logger.warning(f"No given weighting file, using default {fileweight}")
+        factors = factors * read_factors(fileweight, methods)
+    return factors
+
+
+class ArrayLCIAScores(BaseModel):
+    """
+    Scores for each impact method, stored as a dense 2-D array with one row per
+    impact method and one column per sample. Arithmetic, normalisation and weighting
+    are numpy operations; conversion to lists of floats only happens when converting
+    to LCIAScores.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    methods: List[str] = []
+    "Name of the impact methods, in the order of values' rows."
+    values: np.ndarray = np.empty((0, 1))
+    "Scores as a (methods, samples) array."
+    scalar: bool = False
+    "If True, scores are single floats instead of lists once converted to LCIAScores."
+
+    @field_serializer("values")
+    def serialize_values(self, values: np.ndarray) -> List[List[float]]:
+        return values.tolist()
+
+    @property
+    def method_names(self) -> Set[str]:
+        """
+        Get all LCIA methods assessed.
+        :return: LCIA methods assessed
+        """
+        return set(self.methods)
+
+    @property
+    def method_index(self) -> Dict[str, int]:
+        """
+        Map each impact method with its row in values.
+        :return: a dict mapping impact methods' name and row index.
+        """
+        return {method: index for index, method in enumerate(self.methods)}
+
+    def __getitem__(self, method: str) -> np.ndarray:
+        return self.values[self.method_index[method]]
+
+    @staticmethod
+    def from_lcia_scores(lcia_scores: LCIAScores) -> ArrayLCIAScores:
+        """
+        Convert LCIAScores to ArrayLCIAScores.
+        :param lcia_scores: scores to convert.
+        :return: converted scores.
+        """
+        scores = lcia_scores.scores
+        if len(scores) == 0:
+            return ArrayLCIAScores()
+        return ArrayLCIAScores(
+            methods=list(scores.keys()),
+            values=np.array(
+                [np.atleast_1d(score) for score in scores.values()], dtype=np.float64
+            ),
+            scalar=all(not isinstance(score, list) for score in scores.values()),
+        )
+
+    def read_only_copy(self) -> ArrayLCIAScores:
+        """
+        Make values read-only, and copy self without copying values, so scores kept
+        by a cache can be returned without being modifiable by the caller.
+        :return: copied scores, sharing self's values.
+        """
+        self.values.flags.writeable = False
+        return self.model_copy(update={"methods": list(self.methods)})
+
+    def to_lcia_scores(self) -> LCIAScores:
+        """
+        Convert self to LCIAScores, with a list of floats (or a float if scalar is
+        True) for each impact method.
+        :return: converted scores.
+        """
+        if self.scalar:
+            return LCIAScores(
+                scores={
+                    method: float(self.values[index, 0])
+                    for index, method in enumerate(self.methods)
+                }
+            )
+        return LCIAScores(
+            scores={
+                method: values
+                for method, values in zip(self.methods, self.values.tolist())
+            }
+        )
+
+    def split(self, sizes: List[int]) -> List[ArrayLCIAScores]:
+        """
+        Split samples into consecutive groups of samples.
+        :param sizes: number of samples of each group. If scores are scalar, each group
+        gets the same scores.
+        :return: the scores of each group, in order.
+        """
+        if self.scalar:
+            return [self.model_copy() for _ in sizes]
+        return [
+            ArrayLCIAScores(methods=self.methods, values=values)
+            for values in np.split(self.values, np.cumsum(sizes)[:-1], axis=1)
+        ]
+
+    def to_unpivoted_df(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "method": np.repeat(self.methods, self.values.shape[1]),
+                "score": self.values.ravel(),
+            }
+        )
+
+    def aligned_values(self, other: ArrayLCIAScores) -> np.ndarray:
+        """
+        Get other's values aligned on self's impact methods. Methods missing in other
+        are filled with zeros.
+        :param other: scores to align.
+        :return: a (methods, samples) array, with the same methods as self.
+        """
+        if other.methods == self.methods:
+            return other.values
+        aligned = np.zeros((len(self.methods), other.values.shape[1]))
+        other_index = other.method_index
+        for index, method in enumerate(self.methods):
+            if method in other_index:
+                aligned[index] = other.values[other_index[method]]
+        return aligned
+
+    def __add__(self, other: ArrayLCIAScores) -> ArrayLCIAScores:
+        return ArrayLCIAScores(
+            methods=self.methods,
+            values=self.values + self.aligned_values(other),
+            scalar=self.scalar,
+        )
+
+    def __sub__(self, other: ArrayLCIAScores) -> ArrayLCIAScores:
+        return ArrayLCIAScores(
+            methods=self.methods,
+            values=self.values - self.aligned_values(other),
+            scalar=self.scalar,
+        )
+
+    @staticmethod
+    def sum(lcia_scores: List[ArrayLCIAScores]) -> ArrayLCIAScores:
+        """
+        Sum element-wise all scores for each method of the first LCIA scores.
+        :param lcia_scores: LCIA scores to sum up.
+        :return: summed LCIA scores
+        """
+        if len(lcia_scores) == 0:
+            return ArrayLCIAScores()
+        first = lcia_scores[0]
+        return ArrayLCIAScores(
+            methods=first.methods,
+            values=np.sum(
+                [first.aligned_values(lcia_score) for lcia_score in lcia_scores],
+                axis=0,
+            ),
+            scalar=first.scalar,
+        )
+
+    def to_normalised(
+        self,
+        method: Optional[MethodUniqueScore] = MethodUniqueScore.EF30,
+        filenorm: Optional[str] = None,
+    ) -> ArrayLCIAScores:
+        """
+        Computes normalisation of scores using .csv file with impact categories and
+        normalisation factors.
+        :param: method: allows to use default MethodUniqueScore.EF30 or EF31
+        normalisation factors.
+        :param: filenorm: allows to give a personal .csv file with normalisation
+        factors.
+        :return: scores after normalisation.
+        """
+        if filenorm is None:
+            filenorm = method.path_to_norm()
+            logger.warning(f"No given normalisation file, using default {filenorm}")
+        factors = read_factors(filenorm, self.methods)
+        return ArrayLCIAScores(
+            methods=self.methods,
+            values=self.values / factors[:, np.newaxis],
+            scalar=self.scalar,
+        )
+
+    def to_weighted(
+        self,
+        method: Optional[MethodUniqueScore] = MethodUniqueScore.EF30,
+        fileweight: Optional[str] = None,
+    ) -> ArrayLCIAScores:
+        """
+        Computes weighting of scores using .csv file with impact categories and
+        weighting factors.
+        :param: method: allows to use default MethodUniqueScore.EF30 or EF31 weighting
+        factors.
+        :param: fileweight: allows to give a personal .csv file with weighting factors.
+        :return: scores after weighting.
+        """
+        if fileweight is None:
+            fileweight = method.path_to_weight()
+            logger.warning(f"No given weighting file, using default {fileweight}")
+        factors = read_factors(fileweight, self.methods)
+        return ArrayLCIAScores(
+            methods=self.methods,
+            values=self.values * factors[:, np.newaxis],
+            scalar=self.scalar,
+        )
+
+    def to_unique_score(
+        self,
+        is_normalised: Optional[bool] = False,
+        is_weighted: Optional[bool] = False,
+        method: Optional[MethodUniqueScore] = MethodUniqueScore.EF30,
+        filenorm: Optional[str] = None,
+        fileweight: Optional[str] = None,
+    ) -> ArrayLCIAScores:
+        """
+        Computes sum of impact category scores into unique score. Possible to apply
+        normalisation and/or weighting before aggregating scores.
+        :param: is_normalised: if True, apply normalisation before sum into unique
+        score.
+        :param: is_weighted: if True, apply weighting (after normalisation) before sum
+        into unique score.
+        :param: method: allows to use default MethodUniqueScore.EF30 or EF31
+        normalisation and weighting factors.
+        :param: filenorm: allows to give a personal .csv file with normalisation
+        factors.
+        :param: fileweight: allows to give a personal .csv file with weighting factors.
+        """
+        factors = unique_score_factors(
+            self.methods,
+            is_normalised=is_normalised,
+            is_weighted=is_weighted,
+            method=method,
+            filenorm=filenorm,
+            fileweight=fileweight,
+        )
+        return ArrayLCIAScores(
+            methods=["UNIQUE_SCORE"],
+            values=factors[np.newaxis] @ self.values,
+        )
@@ -0,0 +1,161 @@
+"""
+This module contains the functions used to compute Sobol sensitivity indices of the
+scores of several nodes and impact methods at once.
+"""
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from SALib.analyze import sobol
+
+from apparun.execution import ExecutionBackend, default_backend
+
+
+def saltelli_indices(
+    scores: np.ndarray, n_vars: int, calc_second_order: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the Sobol first and total order indices of several series of scores at
+    once, with the estimators of SALib: Saltelli et al. (2010) for first order, and
+    Jansen for total order. As in SALib, each series is normalized beforehand, and
+    indices of series whose A and B samples are constant are 0.
+    :param scores: an array of shape (series, samples), samples being drawn with
+    SALib's sobol sampler.
+    :param n_vars: number of parameters of the problem the samples were drawn for.
+    :param calc_second_order: must match the option used to draw the samples.
+    :return: first and total order indices, as arrays of shape (series, parameters).
+    """
+    step = 2 * n_vars + 2 if calc_second_order else n_vars + 2
+    if scores.shape[1] % step != 0:
+        raise ValueError(
+            "Incorrect number of samples, confirm calc_second_order matches option "
+            "used during sampling."
+        )
+    mean = scores.mean(axis=1, keepdims=True)
+    std = scores.std(axis=1, keepdims=True)
+    scores = (scores - mean) / np.where(std == 0, 1, std)
+    scores = scores.reshape(len(scores), -1, step)
+    a = scores[:, :, :1]
+    b = scores[:, :, -1:]
+    ab = scores[:, :, 1 : n_vars + 1]
+    variance = np.concatenate([a, b], axis=1).var(axis=1)
+    constant = np.ptp(np.concatenate([a, b], axis=1), axis=1) == 0
+    variance = np.where(constant, 1, variance)
+    s1 = np.where(constant, 0, (b * (ab - a)).mean(axis=1) / variance)
+    st = np.where(constant, 0, 0.5 * ((a - ab) ** 2).mean(axis=1) / variance)
+    return s1, st
+
+
+def sobol_s1_block(
+    problem: Dict,
+    scores: np.ndarray,
+    calc_second_order: bool = True,
+    bootstrap: bool = True,
+) -> np.ndarray:
+    """
+    Compute the Sobol first order indices of several series of scores.
+    :param problem: SALib problem the samples were drawn for.
+    :param scores: an array of shape (series, samples).
+    :param calc_second_order: must match the option used to draw the samples.
+    :param bootstrap: if True, SALib's analysis is run for each series, including the
+    bootstrap of confidence intervals and second order indices if calc_second_order
+    is True. Else, only first order indices are estimated, for all series at once.
+    :return: an array of shape (series, parameters).
+    """
+    if not bootstrap:
+        return saltelli_indices(scores, problem["num_vars"], calc_second_order)[0]
+    return np.array(
+        [
+            sobol.analyze(problem, series_scores, calc_second_order=calc_second_order)[
+                "S1"
+            ]
+            for series_scores in scores
+        ]
+    ).reshape(len(scores), problem["num_vars"])
+
+
+def sobol_s1_indices(
+    problem: Dict,
+    series: List[Tuple[str, str]],
+    scores: np.ndarray,
+    calc_second_order: bool = True,
+    bootstrap: bool = True,
+    backend: Optional[ExecutionBackend] = None,
+) -> List[Dict[str, Union[str, float]]]:
+    """
+    Compute the Sobol first order indices of several series of scores, series being
+    split into blocks analysed in parallel by the execution backend.
+    :param problem: SALib problem the samples were drawn for.
+    :param series: node name and impact method of each series.
+    :param scores: an array of shape (series, samples).
+    :param calc_second_order: must match the option used to draw the samples.
+    :param bootstrap: see sobol_s1_block function. If False, all series are analysed
+    at once in the current process.
+    :param backend: backend running the analyses. If None, the default backend of the
+    process is used.
+    :return: the first order index of each parameter, for each series.
+    """
+    if not bootstrap:
+        s1 = sobol_s1_block(problem, scores, calc_second_order, bootstrap=False)
+    else:
+        if backend is None:
+            backend = default_backend()
+        n_blocks = min(len(series), 4 * (os.cpu_count() or 1))
+        blocks = np.array_split(scores, n_blocks) if n_blocks > 0 else []
+        s1 = backend.map(
+            sobol_s1_block,
+            [
+                {
+                    "problem": problem,
+                    "scores": block,
+                    "calc_second_order": calc_second_order,
+                }
+                for block in blocks
+            ],
+            size=scores.shape[1] * (len(series) // max(n_blocks, 1)),
+        )
+        s1 = np.concatenate(s1) if len(s1) > 0 else np.empty((0, problem["num_vars"]))
+    return [
+        {
+            "node": node,
+            "method": method,
+            "parameter": parameter,
+            "sobol_s1": s1[series_index, parameter_index],
+        }
+        for series_index, (node, method) in enumerate(series)
+        for parameter_index, parameter in enumerate(problem["names"])
+    ]
+
+
+def sobol_indices(
+    problem: Dict,
+    series: List[Tuple[str, str]],
+    scores: np.ndarray,
+    calc_second_order: bool = True,
+) -> pd.DataFrame:
+    """
+    Compute the Sobol first and total order indices of several series of scores at
+    once, without bootstrap.
+    :param problem: SALib problem the samples were drawn for.
+    :param series: node name and impact method of each series.
+    :param scores: an array of shape (series, samples), or (nodes, methods, samples)
+    with one series per node and impact method.
+    :param calc_second_order: must match the option used to draw the samples.
+    :return: a dataframe with node, method, parameter, and first and total order
+    indices.
+    """
+    scores = scores.reshape(-1, scores.shape[-1])
+    s1, st = saltelli_indices(scores, problem["num_vars"], calc_second_order)
+    n_vars = problem["num_vars"]
+    return pd.DataFrame(
+        {
+            "node": np.repeat([node for node, _ in series], n_vars),
+            "method": np.repeat([method for _, method in series], n_vars),
+            "parameter": np.tile(problem["names"], len(series)),
+            "sobol_s1": s1.ravel(),
+            "sobol_st": st.ravel(),
+        }
+    )
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Set, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel
+from scipy import sparse
 
 from apparun.impact_methods import MethodUniqueScore
-from apparun.score import LCIAScores
+from apparun.score import ArrayLCIAScores, LCIAScores, unique_score_factors
 
 
 class NodeProperties(BaseModel):
@@ -51,9 +53,36 @@ class NodeScores(BaseModel):
     "Name of parent node."
     properties: NodeProperties
     "Properties of the node."
-    lcia_scores: LCIAScores
+    lcia_scores: Union[LCIAScores, ArrayLCIAScores]
     "Computed LCIA scores, for each method."
 
+    @staticmethod
+    def property_groups(
+        nodes_properties: List[NodeProperties], property_name: str
+    ) -> Tuple[List[Optional[Union[str, float, bool]]], np.ndarray]:
+        """
+        Group nodes by value of a property. Nodes without any property only belong
+        to the group of nodes lacking the property if another node lacks it.
+        :param nodes_properties: properties of each node.
+        :param property_name: name of the property under consideration
+        :return: the distinct property values, in order of first appearance, and the
+        index of each node's group in these values, -1 if the node belongs to none.
+        """
+        all_values = {}
+        for properties in nodes_properties:
+            if len(properties.properties) > 0:
+                all_values.setdefault(
+                    properties.get_property_value(property_name), len(all_values)
+                )
+        groups = np.array(
+            [
+                all_values.get(properties.get_property_value(property_name), -1)
+                for properties in nodes_properties
+            ],
+            dtype=np.int64,
+        )
+        return list(all_values), groups
+
     @staticmethod
     def combine_by_property(
         nodes_scores: List[NodeScores], property_name: str
@@ -66,55 +95,98 @@ class NodeScores(BaseModel):
         :return: list of newly created nodes. Name of the node will be the property
         value.
         """
-        all_values = set(
-            [
-                node.properties.get_property_value(property_name)
-                for node in nodes_scores
-                if len(node.properties.properties) > 0
-            ]
+        all_values, groups = NodeScores.property_groups(
+            [node.properties for node in nodes_scores], property_name
         )
-        nodes_by_value = {
-            value: [
-                node
-                for node in nodes_scores
-                if node.properties.get_property_value(property_name) == value
-            ]
-            for value in all_values
-        }
-        scores_by_values = {
-            value: LCIAScores.sum([node.lcia_scores for node in nodes])
-            for value, nodes in nodes_by_value.items()
-        }
+        nodes_by_value = [[] for _ in all_values]
+        for node, group in zip(nodes_scores, groups):
+            if group >= 0:
+                nodes_by_value[group].append(node)
         return [
             NodeScores(
                 name=str(value),
                 parent="",
                 properties=NodeProperties(),
-                lcia_scores=scores_by_values[value],
+                lcia_scores=nodes[0].lcia_scores.sum(
+                    [node.lcia_scores for node in nodes]
+                ),
             )
-            for value in all_values
+            for value, nodes in zip(all_values, nodes_by_value)
         ]
 
     @staticmethod
-    def full_to_direct_impacts(node_scores: List[NodeScores]) -> NodeScores:
-        direct_impact_scores = []
+    def combine_by_property_array(
+        scores: np.ndarray,
+        mask: np.ndarray,
+        nodes_properties: List[NodeProperties],
+        property_name: str,
+    ) -> Tuple[List[Optional[Union[str, float, bool]]], np.ndarray, np.ndarray]:
+        """
+        Array counterpart of combine_by_property, summing up the scores of the nodes
+        of each group with a single sparse matrix product.
+        :param scores: nodes' scores, as an array of shape (nodes, methods, samples).
+        :param mask: a boolean array of shape (nodes, methods), telling which node has
+        a score for which method.
+        :param nodes_properties: properties of each node.
+        :param property_name: name of the property under consideration
+        :return: the property values, their combined scores as an array of shape
+        (values, methods, samples), and the mask of these scores. Like
+        combine_by_property, a property value has the methods of its first node.
+        """
+        all_values, groups = NodeScores.property_groups(nodes_properties, property_name)
+        nodes = np.flatnonzero(groups >= 0)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(nodes)), (groups[nodes], nodes)),
+            shape=(len(all_values), len(scores)),
+        )
+        combined_scores = (
+            matrix @ np.where(mask[:, :, None], scores, 0.0).reshape(len(scores), -1)
+        ).reshape(len(all_values), *scores.shape[1:])
+        _, first_nodes = np.unique(groups[nodes], return_index=True)
+        combined_mask = mask[nodes[first_nodes]]
+        combined_scores[~combined_mask] = np.nan
+        return all_values, combined_scores, combined_mask
+
+    @staticmethod
+    def full_to_direct_impacts(node_scores: List[NodeScores]) -> List[NodeScores]:
+        children = {}
         for node_score in node_scores:
-            to_substract = LCIAScores.sum(
-                [
-                    nd_sc.lcia_scores
-                    for nd_sc in node_scores
-                    if nd_sc.parent == node_score.name
-                ]
-            )
-            direct_lcia_scores = node_score.lcia_scores - to_substract
-            direct_impact_score = NodeScores(
+            children.setdefault(node_score.parent, []).append(node_score.lcia_scores)
+        return [
+            NodeScores(
                 name=node_score.name,
                 parent=node_score.parent,
                 properties=node_score.properties,
-                lcia_scores=direct_lcia_scores,
+                lcia_scores=node_score.lcia_scores
+                - node_score.lcia_scores.sum(children.get(node_score.name, [])),
             )
-            direct_impact_scores.append(direct_impact_score)
-        return direct_impact_scores
+            for node_score in node_scores
+        ]
+
+    @staticmethod
+    def full_to_direct_impacts_array(
+        scores: np.ndarray, mask: np.ndarray, parents: np.ndarray
+    ) -> np.ndarray:
+        """
+        Array counterpart of full_to_direct_impacts, subtracting the scores of each
+        node's children with a single sparse matrix product.
+        :param scores: nodes' full impacts, as an array of shape (nodes, methods,
+        samples).
+        :param mask: a boolean array of shape (nodes, methods), telling which node has
+        a score for which method. Missing children's scores count as zeros.
+        :param parents: index of each node's parent, -1 for nodes without parent, as
+        given by ImpactTreeNode's unnested_parents.
+        :return: nodes' direct impacts, as an array of the same shape as scores.
+        """
+        children = np.flatnonzero(parents >= 0)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(children)), (parents[children], children)),
+            shape=(len(scores), len(scores)),
+        )
+        children_scores = matrix @ np.where(mask[:, :, None], scores, 0.0).reshape(
+            len(scores), -1
+        )
+        return scores - children_scores.reshape(scores.shape)
 
     def to_unpivoted_df(self) -> pd.DataFrame:
         df = self.lcia_scores.to_unpivoted_df()
@@ -152,6 +224,73 @@ class NodeScores(BaseModel):
         )
         return score
 
+    @staticmethod
+    def unique_scores(
+        nodes_scores: List[NodeScores],
+        is_normalised: Optional[bool] = False,
+        is_weighted: Optional[bool] = False,
+        method: Optional[MethodUniqueScore] = MethodUniqueScore.EF30,
+        filenorm: Optional[str] = None,
+        fileweight: Optional[str] = None,
+    ) -> List[NodeScores]:
+        """
+        Compute the unique score of several nodes, as to_unique_score does for each
+        node. Scores of nodes sharing the same impact methods and number of samples
+        are stacked, and their unique scores computed with a single matrix-vector
+        product.
+        :param nodes_scores: nodes' scores.
+        :param: is_normalised: if True, apply normalisation before sum into unique
+        score.
+        :param: is_weighted: if True, apply weighting (after normalisation) before sum
+        into unique score.
+        :param: method: allows to use default MethodUniqueScore.EF30 or EF31
+        normalisation and weighting factors.
+        :param: filenorm: allows to give a personal .csv file with normalisation
+        factors.
+        :param: fileweight: allows to give a personal .csv file with weighting factors.
+        :return: unique score of each node, in order.
+        """
+        array_scores = [
+            node_scores.lcia_scores
+            if isinstance(node_scores.lcia_scores, ArrayLCIAScores)
+            else ArrayLCIAScores.from_lcia_scores(node_scores.lcia_scores)
+            for node_scores in nodes_scores
+        ]
+        nodes_by_shape = {}
+        for node_index, lcia_scores in enumerate(array_scores):
+            nodes_by_shape.setdefault(
+                (tuple(lcia_scores.methods), lcia_scores.values.shape[1]), []
+            ).append(node_index)
+        unique_scores = [None] * len(nodes_scores)
+        for (methods, _), nodes in nodes_by_shape.items():
+            factors = unique_score_factors(
+                list(methods),
+                is_normalised=is_normalised,
+                is_weighted=is_weighted,
+                method=method,
+                filenorm=filenorm,
+                fileweight=fileweight,
+            )
+            values = np.tensordot(
+                factors,
+                np.stack([array_scores[node_index].values for node_index in nodes]),
+                axes=(0, 1),
+            )
+            for node_index, node_values in zip(nodes, values):
+                unique_score = ArrayLCIAScores(
+                    methods=["UNIQUE_SCORE"], values=node_values[np.newaxis]
+                )
+                node_scores = nodes_scores[node_index]
+                unique_scores[node_index] = NodeScores(
+                    name=node_scores.name,
+                    parent=node_scores.parent,
+                    properties=node_scores.properties,
+                    lcia_scores=unique_score
+                    if isinstance(node_scores.lcia_scores, ArrayLCIAScores)
+                    else unique_score.to_lcia_scores(),
+                )
+        return unique_scores
+
     def to_unique_score(
         self,
         is_normalised: Optional[bool] = False,
@@ -0,0 +1,316 @@
+"""
+This module contains the online statistics used to run Monte Carlo uncertainty
+analysis on chunks of samples, in bounded memory. Statistics are computed for several
+series at once, one series being the scores of a node for an impact method.
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+
+class OnlineStatistics(BaseModel):
+    """
+    Running count, mean, variance, min and max of several series, updated chunk by
+    chunk with Chan's parallel algorithm.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    count: int = 0
+    mean: np.ndarray
+    m2: np.ndarray
+    "Sum of squared differences to the mean."
+    min: np.ndarray
+    max: np.ndarray
+
+    @staticmethod
+    def empty(n_series: int) -> OnlineStatistics:
+        """
+        Create statistics of series with no values yet.
+        :param n_series: number of series.
+        :return: empty statistics.
+        """
+        return OnlineStatistics(
+            mean=np.zeros(n_series),
+            m2=np.zeros(n_series),
+            min=np.full(n_series, np.inf),
+            max=np.full(n_series, -np.inf),
+        )
+
+    def update(self, values: np.ndarray):
+        """
+        Add a chunk of values to the statistics.
+        :param values: an array of shape (series, chunk size).
+        """
+        size = values.shape[1]
+        if size == 0:
+            return
+        chunk_mean = values.mean(axis=1)
+        chunk_m2 = ((values - chunk_mean[:, np.newaxis]) ** 2).sum(axis=1)
+        count = self.count + size
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * size / count
+        self.m2 = self.m2 + chunk_m2 + delta**2 * self.count * size / count
+        self.count = count
+        self.min = np.minimum(self.min, values.min(axis=1))
+        self.max = np.maximum(self.max, values.max(axis=1))
+
+    @property
+    def variance(self) -> np.ndarray:
+        """
+        Sample variance of each series.
+        """
+        if self.count < 2:
+            return np.full(self.mean.shape, np.nan)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    @property
+    def standard_error(self) -> np.ndarray:
+        """
+        Standard error of the mean of each series.
+        """
+        return self.std / np.sqrt(max(self.count, 1))
+
+
+class QuantileSketch(BaseModel):
+    """
+    Mergeable quantile sketch of several series, in the spirit of KLL sketches.
+    Values are kept in levels, a value of level h standing for 2^h values. Once a level
+    holds more than k values, they are sorted and one value out of two is promoted to
+    the next level. As all series receive the same number of values, their levels
+    have the same sizes, and are stored as 2-D arrays.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    k: int = 256
+    "Maximum number of values of each level, the higher the more accurate."
+    levels: List[np.ndarray] = []
+    "Values of each level, as arrays of shape (series, level size)."
+    seed: Optional[int] = None
+    _rng: Optional[np.random.Generator] = None
+
+    @property
+    def rng(self) -> np.random.Generator:
+        if self._rng is None:
+            self._rng = np.random.default_rng(self.seed)
+        return self._rng
+
+    def update(self, values: np.ndarray):
+        """
+        Add a chunk of values to the sketch.
+        :param values: an array of shape (series, chunk size).
+        """
+        if len(self.levels) == 0:
+            self.levels = [values.copy()]
+        else:
+            self.levels[0] = np.concatenate([self.levels[0], values], axis=1)
+        level = 0
+        while level < len(self.levels):
+            if self.levels[level].shape[1] > self.k:
+                self.compact(level)
+            level += 1
+
+    def compact(self, level: int):
+        """
+        Sort the values of a level, and promote one value out of two to the next
+        level. If the level holds an odd number of values, the largest one stays.
+        :param level: level to compact.
+        """
+        values = np.sort(self.levels[level], axis=1)
+        size = values.shape[1] - values.shape[1] % 2
+        offset = int(self.rng.integers(2))
+        promoted = values[:, offset:size:2]
+        self.levels[level] = values[:, size:]
+        if level + 1 == len(self.levels):
+            self.levels.append(promoted)
+        else:
+            self.levels[level + 1] = np.concatenate(
+                [self.levels[level + 1], promoted], axis=1
+            )
+
+    def quantiles(self, quantiles: List[float]) -> np.ndarray:
+        """
+        Estimate quantiles of each series.
+        :param quantiles: quantiles to estimate, between 0 and 1.
+        :return: an array of shape (series, quantiles).
+        """
+        values = np.concatenate(self.levels, axis=1)
+        weights = np.concatenate(
+            [
+                np.full(level_values.shape[1], 2.0**level)
+                for level, level_values in enumerate(self.levels)
+            ]
+        )
+        order = np.argsort(values, axis=1)
+        sorted_values = np.take_along_axis(values, order, axis=1)
+        cumulated_weights = np.cumsum(weights[order], axis=1)
+        targets = (
+            np.asarray(quantiles)[np.newaxis, :] * cumulated_weights[:, -1:]
+        ).clip(min=1e-12)
+        indexes = (
+            (cumulated_weights[:, np.newaxis, :] < targets[:, :, np.newaxis])
+            .sum(axis=2)
+            .clip(max=values.shape[1] - 1)
+        )
+        return np.take_along_axis(sorted_values, indexes, axis=1)
+
+
+class StreamingHistogram(BaseModel):
+    """
+    Histograms of several series. Bin edges of each series are set from its first chunk
+    of values, values out of these edges are counted as underflow or overflow.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    bins: int = 50
+    edges: Optional[np.ndarray] = None
+    "Bin edges of each series, as an array of shape (series, bins + 1)."
+    counts: Optional[np.ndarray] = None
+    "Number of values in each bin, as an array of shape (series, bins)."
+    underflow: Optional[np.ndarray] = None
+    overflow: Optional[np.ndarray] = None
+
+    def update(self, values: np.ndarray):
+        """
+        Add a chunk of values to the histograms.
+        :param values: an array of shape (series, chunk size).
+        """
+        n_series = values.shape[0]
+        if self.edges is None:
+            low, high = values.min(axis=1), values.max(axis=1)
+            margin = np.where(high > low, (high - low) * 0.05, np.abs(low) * 0.05 + 1)
+            self.edges = np.linspace(low - margin, high + margin, self.bins + 1, axis=1)
+            self.counts = np.zeros((n_series, self.bins), dtype=np.int64)
+            self.underflow = np.zeros(n_series, dtype=np.int64)
+            self.overflow = np.zeros(n_series, dtype=np.int64)
+        low, high = self.edges[:, :1], self.edges[:, -1:]
+        positions = np.floor((values - low) / (high - low) * self.bins)
+        self.underflow += (positions < 0).sum(axis=1)
+        self.overflow += (positions >= self.bins).sum(axis=1)
+        inside = (positions >= 0) & (positions < self.bins)
+        series = np.broadcast_to(np.arange(n_series)[:, np.newaxis], values.shape)
+        np.add.at(
+            self.counts,
+            (series[inside], positions[inside].astype(np.int64)),
+            1,
+        )
+
+
+class UncertaintyStatistics(BaseModel):
+    """
+    Online statistics of the scores of several nodes for several impact methods,
+    updated with chunks of Monte Carlo samples.
+    """
+
+    series: List[Tuple[str, str]]
+    "Node name and impact method of each series."
+    statistics: OnlineStatistics
+    sketch: QuantileSketch
+    histogram: StreamingHistogram
+    quantiles: List[float] = [0.025, 0.25, 0.5, 0.75, 0.975]
+    "Quantiles given by to_df method."
+
+    @staticmethod
+    def from_series(
+        series: List[Tuple[str, str]],
+        quantiles: Optional[List[float]] = None,
+        bins: int = 50,
+        sketch_size: int = 256,
+        seed: Optional[int] = None,
+    ) -> UncertaintyStatistics:
+        """
+        Create statistics of series with no values yet.
+        :param series: node name and impact method of each series.
+        :param quantiles: quantiles given by to_df method.
+        :param bins: number of bins of the histograms.
+        :param sketch_size: size of the levels of the quantile sketch.
+        :param seed: seed of the quantile sketch's compactions.
+        :return: empty statistics.
+        """
+        uncertainty_statistics = UncertaintyStatistics(
+            series=series,
+            statistics=OnlineStatistics.empty(len(series)),
+            sketch=QuantileSketch(k=sketch_size, seed=seed),
+            histogram=StreamingHistogram(bins=bins),
+        )
+        if quantiles is not None:
+            uncertainty_statistics.quantiles = quantiles
+        return uncertainty_statistics
+
+    @property
+    def count(self) -> int:
+        return self.statistics.count
+
+    def update(self, values: np.ndarray):
+        """
+        Add a chunk of scores to the statistics.
+        :param values: an array of shape (series, chunk size).
+        """
+        self.statistics.update(values)
+        self.sketch.update(values)
+        self.histogram.update(values)
+
+    def converged(self, rtol: float) -> bool:
+        """
+        Tell if the mean of every series is known precisely enough, i.e. if the
+        standard error of the mean is lower than rtol times the mean.
+        :param rtol: relative tolerance on the standard error of the mean.
+        :return: True if all the series converged.
+        """
+        return bool(
+            np.all(
+                self.statistics.standard_error <= rtol * np.abs(self.statistics.mean)
+            )
+        )
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Summarize the statistics of each series.
+        :return: a dataframe with node, method, count, mean, std, standard error, min,
+        max and quantiles of each series.
+        """
+        df = pd.DataFrame(
+            {
+                "node": [node for node, _ in self.series],
+                "method": [method for _, method in self.series],
+                "count": self.statistics.count,
+                "mean": self.statistics.mean,
+                "std": self.statistics.std,
+                "standard_error": self.statistics.standard_error,
+                "min": self.statistics.min,
+                "max": self.statistics.max,
+            }
+        )
+        quantiles = self.sketch.quantiles(self.quantiles)
+        for index, quantile in enumerate(self.quantiles):
+            df[f"q{quantile:g}"] = quantiles[:, index]
+        return df
+
+    def histograms_to_df(self) -> pd.DataFrame:
+        """
+        Get the histograms of each series, in long format.
+        :return: a dataframe with node, method, bin bounds and count of each bin.
+        """
+        n_series, bins = self.histogram.counts.shape
+        return pd.DataFrame(
+            {
+                "node": np.repeat([node for node, _ in self.series], bins),
+                "method": np.repeat([method for _, method in self.series], bins),
+                "bin_start": self.histogram.edges[:, :-1].ravel(),
+                "bin_end": self.histogram.edges[:, 1:].ravel(),
+                "count": self.histogram.counts.ravel(),
+            }
+        )
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+import apparun.core
+from apparun.api.service import ComputeService
+from apparun.exceptions import ClientDisconnectedError, ServiceOverloadedError
+
+
+class FakeRequest:
+    def __init__(self, disconnected: bool = False):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+@pytest.fixture()
+def compute_service():
+    # Workers are forked, as spawned workers would import the main module, which
+    # can be a temporary script of another test.
+    compute_service = ComputeService(
+        max_workers=1,
+        max_queue=1,
+        warm_models=["nvidia_ai_gpu_chip"],
+        start_method="fork",
+    )
+    yield compute_service
+    compute_service.shutdown()
+
+
+def test_service_computes_in_workers(compute_service):
+    """
+    Check computations made by the service's workers give the same scores as
+    computations made in the current process.
+    """
+    params = {"cuda_core": [256, 512]}
+    scores = asyncio.run(
+        compute_service.run(apparun.core.compute_impacts, "nvidia_ai_gpu_chip", params)
+    )
+    assert scores == apparun.core.compute_impacts("nvidia_ai_gpu_chip", params)
+
+
+def test_service_backpressure_and_cancellation(compute_service):
+    """
+    Check requests are rejected once the queue is full, and queued requests are
+    dropped when their client disconnects.
+    """
+
+    async def run_requests():
+        disconnecting_request = FakeRequest()
+        running = asyncio.ensure_future(compute_service.run(time.sleep, 1))
+        await asyncio.sleep(0.1)
+        queued = asyncio.ensure_future(
+            compute_service.run(time.sleep, 0, request=disconnecting_request)
+        )
+        await asyncio.sleep(0.1)
+        assert compute_service.queued == 1
+        with pytest.raises(ServiceOverloadedError):
+            await compute_service.run(time.sleep, 0)
+
+        disconnecting_request.disconnected = True
+        with pytest.raises(ClientDisconnectedError):
+            await queued
+        assert compute_service.queued == 0
+        await running
+        # Worker slot is available again
+        await compute_service.run(time.sleep, 0)
+
+    asyncio.run(run_requests())
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from apparun.impact_model import ImpactModel
+from apparun.parameters import EnumCodes, EnumParam
+from tests import DATA_DIR
+
+
+@pytest.fixture()
+def enum_param():
+    return EnumParam(
+        name="architecture",
+        default="Maxwell",
+        weights={"Maxwell": 0.2, "Kepler": 0, "Pascal": 0.5, "Turing": 0.3},
+    )
+
+
+def test_enum_draw_to_distrib(enum_param):
+    """
+    Check samples of the unit interval are mapped to options according to their
+    weights, options with a null weight never being drawn.
+    """
+    samples = np.array([0.0, 0.1, 0.2, 0.5, 0.69, 0.7, 0.99, 1.0])
+    np.testing.assert_array_equal(
+        enum_param.draw_to_codes(samples), [0, 0, 2, 2, 2, 3, 3, 3]
+    )
+    assert enum_param.draw_to_distrib(samples) == [
+        "Maxwell",
+        "Maxwell",
+        "Pascal",
+        "Pascal",
+        "Pascal",
+        "Turing",
+        "Turing",
+        "Turing",
+    ]
+
+
+def test_enum_transform(enum_param):
+    """
+    Check options are one hot encoded, one dummy per option.
+    """
+    dummies = enum_param.transform(["Pascal", "Maxwell", "Kepler", "Pascal"])
+    assert list(dummies) == enum_param.dummies_names
+    np.testing.assert_array_equal(dummies["architecture_Maxwell"], [0, 1, 0, 0])
+    np.testing.assert_array_equal(dummies["architecture_Kepler"], [0, 0, 1, 0])
+    np.testing.assert_array_equal(dummies["architecture_Pascal"], [1, 0, 0, 1])
+    np.testing.assert_array_equal(dummies["architecture_Turing"], [0, 0, 0, 0])
+    assert enum_param.transform("Turing") == {
+        "architecture_Maxwell": 0,
+        "architecture_Kepler": 0,
+        "architecture_Pascal": 0,
+        "architecture_Turing": 1,
+    }
+    with pytest.raises(ValueError):
+        enum_param.transform(["Pascal", "Volta"])
+
+
+def test_enum_codes_through_params_values():
+    """
+    Check enum values are carried as int8 codes, whether they are drawn or given as
+    options, and are one hot encoded like lists of options.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    samples = impact_model.parameters.draw_to_distrib(
+        impact_model.parameters.uniform_draw(100)
+    )
+    assert isinstance(samples["architecture"], EnumCodes)
+    drawn_values = impact_model.params_values(**samples)
+    values = impact_model.params_values(
+        **{
+            name: list(value) if isinstance(value, EnumCodes) else value
+            for name, value in samples.items()
+        }
+    )
+    for name in ["architecture", "usage_location"]:
+        assert isinstance(values[name], EnumCodes)
+        assert values[name].codes.dtype == np.int8
+        assert list(values[name]) == list(drawn_values[name])
+        assert values[name][0] == samples[name][0]
+
+    transformed_params = impact_model.transform_parameters(values)
+    architecture = impact_model.parameters["architecture"]
+    expected_dummies = architecture.transform(list(samples["architecture"]))
+    for dummy_name in architecture.dummies_names:
+        np.testing.assert_array_equal(
+            transformed_params[dummy_name], expected_dummies[dummy_name]
+        )
+    np.testing.assert_array_equal(
+        impact_model.get_scores_from_values(drawn_values, as_array=True).values,
+        impact_model.get_scores_from_values(values, as_array=True).values,
+    )
@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pytest
+
+from apparun.execution import get_backend, registered_backends
+from apparun.impact_model import ImpactModel
+from tests import DATA_DIR
+
+
+@pytest.fixture(params=registered_backends())
+def backend(request):
+    backend = get_backend(request.param)()
+    yield backend
+    backend.shutdown()
+
+
+def test_backends_give_same_scores(backend):
+    """
+    Check every execution backend gives the same scores as the serial backend, and
+    can be reused for several computations.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    params = {"cuda_core": [256, 512, 1024], "usage_location": ["FR", "EU", "EU"]}
+    expected_scores = impact_model.model_copy(
+        update={"execution_backend": get_backend("serial")()}
+    ).get_scores(**params)
+
+    impact_model.execution_backend = backend
+    for _ in range(2):
+        scores = impact_model.get_scores(**params)
+        for method, expected_score in expected_scores.scores.items():
+            np.testing.assert_allclose(scores.scores[method], expected_score)
@@ -5,6 +5,8 @@ import pytest
 from apparun.exceptions import InvalidFileError
 from apparun.impact_methods import MethodFullName, MethodShortName, MethodUniqueScore
 from apparun.impact_model import ImpactModel
+from apparun.score import FACTORS_TABLES
+from apparun.tree_node import NodeScores
 
 
 @pytest.fixture()
@@ -174,3 +176,28 @@ def test_impact_methods_consistency():
     assert {elem.name for elem in MethodFullName} == {
         elem.name for elem in MethodShortName
     }
+
+
+def test_unique_scores_of_all_nodes(impact_model_5):
+    """
+    Check unique scores of all the nodes computed at once are the ones of each node,
+    and that factors files are only read once.
+    """
+    FACTORS_TABLES.clear()
+    node_scores = impact_model_5.get_nodes_scores(test_param=[1, 2, 3])
+    unique_node_scores = NodeScores.unique_scores(
+        node_scores, is_normalised=True, is_weighted=True
+    )
+    assert len(FACTORS_TABLES) == 2
+    for node_score, unique_node_score in zip(node_scores, unique_node_scores):
+        assert unique_node_score.name == node_score.name
+        expected_score = node_score.to_unique_score(
+            is_normalised=True, is_weighted=True
+        )
+        for unique_score, expected in zip(
+            unique_node_score.lcia_scores.scores["UNIQUE_SCORE"],
+            expected_score.lcia_scores.scores["UNIQUE_SCORE"],
+        ):
+            assert math.isclose(unique_score, expected, rel_tol=1e-12)
+            assert math.isclose(unique_score, 0.00361857, abs_tol=1e-6)
+    assert len(FACTORS_TABLES) == 2
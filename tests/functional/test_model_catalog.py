@@ -0,0 +1,92 @@
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from apparun.catalog import ModelCatalog
+from apparun.impact_model import ImpactModel
+from apparun.registry import ModelRegistry
+from tests import DATA_DIR
+
+
+@pytest.fixture()
+def models_dir(tmp_path):
+    for file in ["nvidia_ai_gpu_chip.yaml", "multi_indicator_model.yaml"]:
+        shutil.copy(os.path.join(DATA_DIR, "impact_models", file), tmp_path)
+    with open(os.path.join(tmp_path, "invalid_model.yaml"), "w") as stream:
+        stream.write("tree: [\n")
+    return str(tmp_path)
+
+
+def test_catalog_lists_valid_models(models_dir):
+    """
+    Check the catalog lists the valid models with their parameters, and records why
+    the other models are invalid.
+    """
+    catalog = ModelCatalog(models_dir=models_dir)
+    assert sorted(catalog.get_valid_models()) == [
+        "multi_indicator_model",
+        "nvidia_ai_gpu_chip",
+    ]
+    invalid_entry = [entry for entry in catalog.entries if not entry.valid][0]
+    assert invalid_entry.name == "invalid_model"
+    assert invalid_entry.error is not None
+
+    expected_params = [
+        parameter.to_dict()
+        for parameter in ImpactModel.from_yaml(
+            os.path.join(models_dir, "nvidia_ai_gpu_chip.yaml")
+        ).parameters
+    ]
+    assert catalog.get_model_params("nvidia_ai_gpu_chip") == expected_params
+    assert catalog.get_model_params("invalid_model") is None
+    assert catalog.get_model_params("no_such_model") is None
+
+
+def test_catalog_only_validates_modified_models(models_dir):
+    """
+    Check models are only loaded again when their file changed.
+    """
+    catalog = ModelCatalog(models_dir=models_dir)
+    catalog.refresh()
+    with patch.object(ImpactModel, "from_yaml", wraps=ImpactModel.from_yaml) as load:
+        catalog.refresh()
+        assert load.call_count == 0
+
+        # Same content, new modification time
+        os.utime(os.path.join(models_dir, "nvidia_ai_gpu_chip.yaml"), ns=(0, 0))
+        catalog.refresh()
+        assert load.call_count == 0
+
+        shutil.copy(
+            os.path.join(models_dir, "multi_indicator_model.yaml"),
+            os.path.join(models_dir, "nvidia_ai_gpu_chip.yaml"),
+        )
+        catalog.refresh()
+        assert load.call_count == 1
+
+    os.remove(os.path.join(models_dir, "multi_indicator_model.yaml"))
+    assert catalog.get_valid_models() == ["nvidia_ai_gpu_chip"]
+
+
+def test_catalog_loads_models_lazily(models_dir, monkeypatch):
+    """
+    Check the catalog doesn't parse the models of the impact models it validates,
+    and reuses the models already loaded by the models registry.
+    """
+    registry = ModelRegistry()
+    monkeypatch.setattr("apparun.catalog.model_registry", registry)
+    impact_model = registry.get(os.path.join(models_dir, "nvidia_ai_gpu_chip.yaml"))
+    catalog = ModelCatalog(models_dir=models_dir)
+    with patch.object(ImpactModel, "from_yaml", wraps=ImpactModel.from_yaml) as load:
+        catalog.refresh()
+        assert load.call_count == 2
+        assert all(call.kwargs == {"lazy": True} for call in load.call_args_list)
+        assert not any(
+            "nvidia_ai_gpu_chip" in call.args[0] for call in load.call_args_list
+        )
+    assert catalog.get_model_params("nvidia_ai_gpu_chip") == [
+        parameter.to_dict() for parameter in impact_model.parameters
+    ]
+    assert registry.stats()["hits"] == 0
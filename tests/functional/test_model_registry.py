@@ -0,0 +1,91 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from apparun.registry import ModelRegistry
+from tests import DATA_DIR
+
+
+@pytest.fixture()
+def model_path(tmp_path):
+    filepath = os.path.join(tmp_path, "nvidia_ai_gpu_chip.yaml")
+    shutil.copy(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml"), filepath
+    )
+    return filepath
+
+
+def test_registered_model_is_reused(model_path):
+    """
+    Check a model is only loaded once, and loaded again only if its content changed.
+    """
+    registry = ModelRegistry()
+    impact_model = registry.get(model_path)
+    assert registry.get(model_path) is impact_model
+
+    # Same content, new modification time
+    os.utime(model_path, ns=(0, 0))
+    assert registry.get(model_path) is impact_model
+
+    with open(model_path, "a") as stream:
+        stream.write("\n# comment\n")
+    assert registry.get(model_path) is not impact_model
+    assert registry.stats()["hits"] == 2
+    assert registry.stats()["misses"] == 2
+
+
+def test_least_recently_used_model_is_evicted(model_path, tmp_path):
+    """
+    Check least recently used models are evicted when the registry is full, or when
+    its memory budget is exceeded.
+    """
+    other_model_path = os.path.join(tmp_path, "other.yaml")
+    shutil.copy(model_path, other_model_path)
+
+    registry = ModelRegistry(max_models=1)
+    registry.get(model_path)
+    registry.get(other_model_path)
+    assert len(registry) == 1
+    assert other_model_path in registry
+
+    registry = ModelRegistry(max_memory=1)
+    registry.get(model_path)
+    registry.get(other_model_path)
+    assert len(registry) == 1
+    assert registry.memory > 0
+
+
+def test_concurrent_gets(model_path):
+    """
+    Check concurrent gets of a model whose file is touched are all counted, and keep
+    a single registered model.
+    """
+    registry = ModelRegistry()
+    registry.get(model_path)
+
+    def get(call: int):
+        if call % 4 == 0:
+            os.utime(model_path, ns=(call, call))
+        return registry.get(model_path)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        impact_models = list(executor.map(get, range(64)))
+    assert all(impact_model is impact_models[0] for impact_model in impact_models)
+    assert len(registry) == 1
+    assert registry.stats()["hits"] == 64
+    assert registry.stats()["misses"] == 1
+
+
+def test_tree_evaluators_memory(model_path):
+    """
+    Check tree evaluators compiled by computations of a registered model count in the
+    registry's memory budget.
+    """
+    registry = ModelRegistry()
+    impact_model = registry.get(model_path)
+    memory = registry.memory
+    impact_model.get_nodes_scores(cuda_core=[512, 1024])
+    registry.get(model_path)
+    assert registry.memory > memory
@@ -0,0 +1,294 @@
+import math
+import os
+from typing import List
+
+import numpy as np
+import pytest
+import yaml
+
+from apparun.cache import ScoresCache
+from apparun.codegen import CompiledExprs, CompiledModel, LambdifiedModel
+from apparun.evaluation import TreeEvaluator
+from apparun.impact_model import ImpactModel
+from apparun.impact_tree import ImpactTreeNode
+from tests import DATA_DIR
+
+
+@pytest.fixture()
+def impact_model():
+    return ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+
+
+@pytest.fixture()
+def special_functions_impact_model():
+    """
+    Impact model whose root models use functions numpy has no universal function
+    for.
+    """
+    with open(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    ) as stream:
+        impact_model = yaml.safe_load(stream)
+    impact_model["tree"]["models"] = {
+        method: f"{model} + erf(cuda_core / 1024) + gamma(2 + cuda_core / 1024)"
+        for method, model in impact_model["tree"]["models"].items()
+    }
+    return ImpactModel.from_dict(impact_model)
+
+
+def special_functions_scores(cuda_core: List[int]) -> np.ndarray:
+    return np.array(
+        [math.erf(value / 1024) + math.gamma(2 + value / 1024) for value in cuda_core]
+    )
+
+
+def test_compiled_models_are_reused(impact_model):
+    """
+    Check models are compiled once, and reused by following computations.
+    """
+    impact_model.compile_models()
+    compiled_models = {
+        node.name: node.compiled_models(tuple(impact_model.parameters.symbols))
+        for node in impact_model.tree.unnested_descendants
+    }
+    impact_model.get_nodes_scores(cuda_core=[512, 1024])
+    impact_model.get_scores(architecture="Pascal")
+    for node in impact_model.tree.unnested_descendants:
+        assert len(node._compiled_models) == 1
+        assert (
+            node.compiled_models(tuple(impact_model.parameters.symbols))
+            is compiled_models[node.name]
+        )
+
+
+def test_compiled_models_scores(impact_model):
+    """
+    Check scores are the same whether models are compiled at load time or not.
+    """
+    compiled_impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml"),
+        compile_models=True,
+    )
+    params = {"cuda_core": [512, 1024], "usage_location": ["EU", "FR"]}
+    assert compiled_impact_model.get_scores(**params) == pytest.approx(
+        impact_model.get_scores(**params)
+    )
+
+
+def test_compiled_yaml_loading(impact_model, tmp_path):
+    """
+    Check an impact model saved with compiled models is loaded without parsing its
+    models, and gives the same scores.
+    """
+    params = {"cuda_core": [512, 1024], "usage_location": ["EU", "FR"]}
+    initial_scores = impact_model.get_nodes_scores(**params)
+
+    filepath = os.path.join(tmp_path, "compiled_model.yaml")
+    impact_model.to_yaml(filepath, compile_models=True)
+    compiled_impact_model = ImpactModel.from_yaml(filepath)
+    for node in compiled_impact_model.tree.unnested_descendants:
+        assert all(isinstance(model, str) for model in dict.values(node.models))
+
+    scores = compiled_impact_model.get_nodes_scores(**params)
+    assert scores == pytest.approx(initial_scores)
+
+
+def test_compiled_yaml_round_trip(impact_model, tmp_path):
+    """
+    Check an impact model loaded with compiled models is saved again as the same
+    file, its models being left unparsed.
+    """
+    filepath = os.path.join(tmp_path, "compiled_model.yaml")
+    impact_model.to_yaml(filepath, compile_models=True)
+    compiled_impact_model = ImpactModel.from_yaml(filepath)
+    new_filepath = os.path.join(tmp_path, "new_compiled_model.yaml")
+    compiled_impact_model.to_yaml(new_filepath, compile_models=True)
+    with open(filepath) as stream, open(new_filepath) as new_stream:
+        assert new_stream.read() == stream.read()
+    for node in compiled_impact_model.tree.unnested_descendants:
+        assert all(isinstance(model, str) for model in dict.values(node.models))
+        assert dict(node.models) == {
+            method: node.models[method] for method in node.models.keys()
+        }
+
+
+def test_modified_compiled_yaml_loading(impact_model, tmp_path):
+    """
+    Check compiled models of a node are ignored, and its models compiled again, if
+    its models have been modified since the impact model was saved.
+    """
+    filepath = os.path.join(tmp_path, "compiled_model.yaml")
+    impact_model.to_yaml(filepath, compile_models=True)
+    with open(filepath) as stream:
+        impact_model_dict = yaml.safe_load(stream)
+    impact_model_dict["tree"]["models"] = {
+        method: "0" for method in impact_model_dict["tree"]["models"]
+    }
+    with open(filepath, "w") as stream:
+        yaml.dump(impact_model_dict, stream, sort_keys=False)
+
+    modified_impact_model = ImpactModel.from_yaml(filepath)
+    assert modified_impact_model.tree.children[0]._compiled_models != {}
+    assert modified_impact_model.tree._compiled_models == {}
+    scores = modified_impact_model.get_scores(cuda_core=[512, 1024])
+    assert all(np.all(np.asarray(score) == 0) for score in scores.scores.values())
+    assert impact_model.get_scores(cuda_core=[512, 1024]) != scores
+
+
+def test_modified_compiled_tree_evaluator_loading(impact_model, tmp_path):
+    """
+    Check the compiled tree evaluator saved with an impact model is ignored, and
+    compiled again, if a model of the tree has been modified since the impact model
+    was saved.
+    """
+    params = {"cuda_core": [512, 1024]}
+    filepath = os.path.join(tmp_path, "compiled_model.yaml")
+    impact_model.to_yaml(filepath, compile_models=True)
+    assert ImpactModel.from_yaml(filepath).tree_evaluators_count == 1
+    with open(filepath) as stream:
+        impact_model_dict = yaml.safe_load(stream)
+    leaf_dict = impact_model_dict["tree"]
+    while len(leaf_dict["children"]) > 0:
+        leaf_dict = leaf_dict["children"][0]
+    leaf_dict["models"] = {method: "0" for method in leaf_dict["models"]}
+    with open(filepath, "w") as stream:
+        yaml.dump(impact_model_dict, stream, sort_keys=False)
+
+    modified_impact_model = ImpactModel.from_yaml(filepath)
+    assert modified_impact_model.tree_evaluators_count == 0
+    nodes_scores = {
+        node_scores.name: node_scores.lcia_scores
+        for node_scores in modified_impact_model.get_nodes_scores(**params)
+    }
+    assert all(
+        np.all(np.asarray(score) == 0)
+        for score in nodes_scores[leaf_dict["name"]].scores.values()
+    )
+    initial_nodes_scores = {
+        node_scores.name: node_scores.lcia_scores
+        for node_scores in impact_model.get_nodes_scores(**params)
+    }
+    assert initial_nodes_scores[leaf_dict["name"]] != nodes_scores[leaf_dict["name"]]
+
+
+def test_compiled_model_is_not_parsed(impact_model, tmp_path, monkeypatch):
+    """
+    Check an impact model saved with compiled models is loaded and compiled without
+    compiling any model, and computes the scores of its nodes with its saved tree
+    evaluator, without parsing any model.
+    """
+    params = {"cuda_core": [512, 1024], "usage_location": ["EU", "FR"]}
+    initial_scores = impact_model.get_nodes_scores(**params)
+    filepath = os.path.join(tmp_path, "compiled_model.yaml")
+    impact_model.to_yaml(filepath, compile_models=True)
+
+    def forbidden(*args, **kwargs):
+        pytest.fail("Models of a compiled impact model must not be compiled again")
+
+    monkeypatch.setattr("sympy.lambdify", forbidden)
+    monkeypatch.setattr("sympy.cse", forbidden)
+    monkeypatch.setattr(TreeEvaluator, "from_models", forbidden)
+    with monkeypatch.context() as load_monkeypatch:
+        # Parameters' expressions are compiled by computations, not at load
+        load_monkeypatch.setattr(CompiledExprs, "from_exprs", forbidden)
+        compiled_impact_model = ImpactModel.from_yaml(filepath, compile_models=True)
+    # Amounts are parsed at load, models never are
+    monkeypatch.setattr("apparun.impact_tree.parse_expr", forbidden)
+    scores = compiled_impact_model.get_nodes_scores(**params)
+    assert scores == pytest.approx(initial_scores)
+    compiled_impact_model.get_nodes_scores(architecture="Pascal", direct_impacts=True)
+    compiled_impact_model.get_scores(**params)
+
+
+def test_special_functions_models(impact_model, special_functions_impact_model):
+    """
+    Check models which can't be compiled as numpy code, as they use functions numpy
+    has no universal function for, are lambdified instead, including when they are
+    loaded with compiled models.
+    """
+    symbols = tuple(special_functions_impact_model.parameters.symbols)
+    for compiled_model in special_functions_impact_model.tree.compiled_models(
+        symbols
+    ).values():
+        assert isinstance(compiled_model, LambdifiedModel)
+    cuda_core = [512, 1024]
+    scores = special_functions_impact_model.get_scores(cuda_core=cuda_core)
+    initial_scores = impact_model.get_scores(cuda_core=cuda_core)
+    for method, score in scores.scores.items():
+        assert score == pytest.approx(
+            np.asarray(initial_scores.scores[method])
+            + special_functions_scores(cuda_core)
+        )
+
+    tree = ImpactTreeNode.from_dict(
+        special_functions_impact_model.tree.to_dict(symbols)
+    )
+    transformed_params = special_functions_impact_model.transform_parameters(
+        special_functions_impact_model.params_values(cuda_core=cuda_core)
+    )
+    assert tree.compute(transformed_params).scores == pytest.approx(scores.scores)
+
+
+def test_special_functions_tree_evaluator(
+    impact_model, special_functions_impact_model, tmp_path, monkeypatch
+):
+    """
+    Check models which can't be compiled as numpy code are lambdified by the tree
+    evaluator, the other models being still compiled, and that impact models with
+    such models are saved and loaded with their compiled models.
+    """
+    monkeypatch.setattr("apparun.impact_model.scores_cache", ScoresCache(max_entries=0))
+    cuda_core = [512, 1024]
+    tree_evaluator = special_functions_impact_model.tree_evaluator(
+        tuple(special_functions_impact_model.parameters.symbols)
+    )
+    assert tree_evaluator.lambdified_exprs is not None
+    assert len(tree_evaluator.lambdified_outputs) == len(
+        special_functions_impact_model.tree.models
+    )
+    assert all(
+        position[0] == tree_evaluator.nodes.index(impact_model.name)
+        for positions in tree_evaluator.lambdified_outputs
+        for position in positions
+    )
+    nodes_scores = special_functions_impact_model.get_nodes_scores(cuda_core=cuda_core)
+    initial_nodes_scores = impact_model.get_nodes_scores(cuda_core=cuda_core)
+    for node_scores, initial_node_scores in zip(nodes_scores, initial_nodes_scores):
+        for method, score in node_scores.lcia_scores.scores.items():
+            expected_score = np.asarray(initial_node_scores.lcia_scores.scores[method])
+            if node_scores.name == impact_model.name:
+                expected_score = expected_score + special_functions_scores(cuda_core)
+            assert score == pytest.approx(expected_score)
+
+    yaml_filepath = os.path.join(tmp_path, "compiled_model.yaml")
+    special_functions_impact_model.to_yaml(yaml_filepath, compile_models=True)
+    binary_filepath = os.path.join(tmp_path, "compiled_model.bin")
+    special_functions_impact_model.to_binary(binary_filepath, compile_models=True)
+    for loaded_impact_model in [
+        ImpactModel.from_yaml(yaml_filepath),
+        ImpactModel.from_binary(binary_filepath),
+    ]:
+        assert loaded_impact_model.tree_evaluators_count == 0
+        assert loaded_impact_model.get_scores(
+            cuda_core=cuda_core
+        ) == special_functions_impact_model.get_scores(cuda_core=cuda_core)
+        assert loaded_impact_model.get_nodes_scores(cuda_core=cuda_core) == nodes_scores
+
+
+def test_compiled_models_malicious_code():
+    """
+    Check an exception is raised when a compiled model contains anything else than
+    an arithmetic expression using numpy functions.
+    """
+    sources = [
+        "__import__('os').system('echo malware')",
+        "numpy.load('malware.npy')",
+        "lifespan.__class__",
+        "open('malware.txt', 'w')",
+        "[x for x in lifespan]",
+    ]
+    for source in sources:
+        with pytest.raises(ValueError):
+            CompiledModel.from_source(source, ["lifespan"])
@@ -1,9 +1,11 @@
 import math
 import os
 
+import numpy as np
 import pytest
 from pydantic import ValidationError
 
+from apparun.expressions import ParamExpr, ParamsValuesSet
 from apparun.impact_model import ImpactModel
 from tests import DATA_DIR
 
@@ -453,3 +455,64 @@ def test_valid_list_expr_values(impact_model):
                 assert math.isclose(value, expected_value, abs_tol=1e-6)
             else:
                 assert value == expected_value
+
+
+def test_array_evaluation_matches_sample_evaluation(impact_model):
+    """
+    Check evaluating expressions over whole arrays of samples gives the same values
+    as evaluating the expressions of each sample separately.
+    """
+    size = 20
+    samples = impact_model.parameters.draw_to_distrib(
+        impact_model.parameters.uniform_draw(size)
+    )
+    del samples["cuda_core"], samples["energy_per_inference"]
+    samples["lifespan"] = ["cuda_core / 1000"] * (size // 2) + [1.5] * (size // 2)
+    values = impact_model.params_values(**samples)
+
+    all_values = {
+        **samples,
+        **{
+            name: [impact_model.parameters[name].default] * size
+            for name in impact_model.parameters.names
+            if name not in samples
+        },
+    }
+    for idx in range(size):
+        expected_values = ParamsValuesSet.build(
+            {name: value[idx] for name, value in all_values.items()},
+            impact_model.parameters,
+        ).evaluate()
+        for name, expected_value in expected_values.items():
+            if isinstance(expected_value, str):
+                assert values[name][idx] == expected_value
+            else:
+                assert math.isclose(values[name][idx], expected_value, rel_tol=1e-9)
+
+
+def test_enum_expression_with_unmapped_value(impact_model):
+    """
+    Check evaluating an enum expression over an array raises an exception naming the
+    values with no sub expression, instead of leaving their results uninitialized.
+    """
+    expr = ParamExpr.parse(
+        {"architecture": {"Maxwell": 461, "Pascal": 520}},
+        "cuda_core",
+        impact_model.parameters,
+    )
+    np.testing.assert_array_equal(
+        expr.evaluate_array(
+            {"architecture": np.array(["Pascal", "Maxwell"], dtype=object)}, 2
+        ),
+        [520, 461],
+    )
+    with pytest.raises(ValueError, match=r"values \['Kepler'\]"):
+        expr.evaluate_array(
+            {"architecture": np.array(["Maxwell", "Kepler"], dtype=object)}, 2
+        )
+
+    with pytest.raises(ValueError, match="No sub expression .*Kepler"):
+        impact_model.params_values(
+            cuda_core={"architecture": {"Maxwell": 461, "Pascal": 520}},
+            architecture=["Maxwell", "Kepler"],
+        )
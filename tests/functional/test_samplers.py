@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+
+from apparun.impact_model import ImpactModel
+from apparun.results import get_result
+from apparun.samplers import get_sampler, registered_samplers
+from tests import DATA_DIR
+
+
+def test_samplers_are_reproducible():
+    """
+    Check samplers draw samples of the unit hypercube, reproducible with a seed, and
+    that drawing by chunks continues the same sequence.
+    """
+    for sampler_name in registered_samplers():
+        sampler = get_sampler(sampler_name)(seed=42)
+        samples = sampler.draw(64, 3)
+        assert samples.shape == (64, 3)
+        assert np.all((samples >= 0) & (samples < 1))
+        np.testing.assert_array_equal(
+            samples, get_sampler(sampler_name)(seed=42).draw(64, 3)
+        )
+        if sampler_name != "lhs":
+            sampler.reset()
+            chunks = [sampler.draw(size, 3) for size in [5, 27, 32]]
+            np.testing.assert_array_equal(samples, np.concatenate(chunks))
+
+
+def test_samplers_properties():
+    """
+    Check Latin hypercube samples hold one sample per stratum, and antithetic samples
+    come by pairs.
+    """
+    samples = get_sampler("lhs")(seed=0).draw(100, 4)
+    for column in samples.T:
+        np.testing.assert_array_equal(np.sort(np.floor(column * 100)), np.arange(100))
+
+    samples = get_sampler("antithetic")(seed=0).draw(100, 4)
+    np.testing.assert_allclose(samples[::2] + samples[1::2], 1)
+
+
+def test_uncertainty_with_sampler():
+    """
+    Check Monte Carlo runs are reproducible with a seeded sampler, and that results
+    accept a sampler.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    scores = impact_model.get_uncertainty_scores(
+        128, as_array=True, sampler=get_sampler("sobol")(seed=1)
+    )
+    np.testing.assert_array_equal(
+        scores.values,
+        impact_model.get_uncertainty_scores(
+            128, as_array=True, sampler=get_sampler("sobol")(seed=1)
+        ).values,
+    )
+    uncertainty_statistics = impact_model.get_uncertainty_statistics(
+        128, chunk_size=50, sampler=get_sampler("sobol")(seed=1)
+    )
+    np.testing.assert_allclose(
+        uncertainty_statistics.statistics.mean, scores.values.mean(axis=1)
+    )
+
+    result = get_result("nodes_uncertainty")(
+        impact_model=impact_model, n=16, sampler="lhs", seed=3
+    )
+    table = result.get_table()
+    np.testing.assert_array_equal(table["score"], result.get_table()["score"])
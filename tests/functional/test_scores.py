@@ -0,0 +1,140 @@
+import os
+
+import numpy as np
+
+from apparun.impact_model import ImpactModel
+from apparun.score import ArrayLCIAScores, LCIAScores
+from apparun.tree_node import NodeScores
+from tests import DATA_DIR
+
+
+def test_array_scores_match_list_scores():
+    """
+    Check scores computed as arrays are the same as scores computed as lists, for
+    the root node and for each node.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    params = {
+        "cuda_core": [256, 512, 1024],
+        "architecture": ["Maxwell", "Pascal", "Pascal"],
+        "usage_location": ["FR", "FR", "EU"],
+    }
+    list_scores = impact_model.get_scores(**params)
+    array_scores = impact_model.get_scores(as_array=True, **params)
+    assert isinstance(list_scores, LCIAScores)
+    assert isinstance(array_scores, ArrayLCIAScores)
+    for method, scores in list_scores.scores.items():
+        np.testing.assert_allclose(array_scores[method], scores)
+
+    list_nodes_scores = impact_model.get_nodes_scores(direct_impacts=True, **params)
+    array_nodes_scores = impact_model.get_nodes_scores(
+        direct_impacts=True, as_array=True, **params
+    )
+    for list_node, array_node in zip(list_nodes_scores, array_nodes_scores):
+        assert list_node.name == array_node.name
+        for method, scores in list_node.lcia_scores.scores.items():
+            np.testing.assert_allclose(array_node.lcia_scores[method], scores)
+
+
+def test_array_scores_arithmetic():
+    """
+    Check scores arithmetic aligns impact methods on the first operand's, missing
+    methods counting as zeros.
+    """
+    first = ArrayLCIAScores(
+        methods=["a", "b"], values=np.array([[1.0, 2.0], [3.0, 4.0]])
+    )
+    second = ArrayLCIAScores(
+        methods=["b", "c"], values=np.array([[5.0, 6.0], [7.0, 8.0]])
+    )
+    total = ArrayLCIAScores.sum([first, second])
+    assert total.to_lcia_scores().scores == {
+        "a": [1.0, 2.0],
+        "b": [8.0, 10.0],
+    }
+    assert (first - first).to_lcia_scores().scores == {
+        "a": [0.0, 0.0],
+        "b": [0.0, 0.0],
+    }
+
+
+def test_batch_scores_match_single_scores():
+    """
+    Check computing several sets of parameters in a batch gives the same scores as
+    computing each set separately, in the same order.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    params_list = [
+        {"cuda_core": 512},
+        {"cuda_core": [256, 1024], "architecture": "Pascal"},
+        {},
+        {"usage_location": ["EU", "FR", "EU"], "lifespan": "cuda_core / 1000"},
+    ]
+    batch_scores = impact_model.get_scores_batch(params_list)
+    batch_nodes_scores = impact_model.get_nodes_scores_batch(
+        params_list, direct_impacts=True
+    )
+    assert len(batch_scores) == len(params_list)
+    for params, scores, nodes_scores in zip(
+        params_list, batch_scores, batch_nodes_scores
+    ):
+        expected_scores = impact_model.get_scores(**params)
+        assert scores.scores.keys() == expected_scores.scores.keys()
+        for method, expected_score in expected_scores.scores.items():
+            np.testing.assert_allclose(scores.scores[method], expected_score)
+        expected_nodes_scores = impact_model.get_nodes_scores(
+            direct_impacts=True, **params
+        )
+        for node, expected_node in zip(nodes_scores, expected_nodes_scores):
+            assert node.name == expected_node.name
+            for method, expected_score in expected_node.lcia_scores.scores.items():
+                np.testing.assert_allclose(
+                    node.lcia_scores.scores[method], expected_score
+                )
+
+
+def test_array_post_processing_matches_nodes_scores():
+    """
+    Check direct impacts and scores combined by property, computed on the whole
+    scores array, are the same as the ones computed node by node.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    nodes = impact_model.tree.unnested_descendants
+    parents = impact_model.nodes_parents
+    assert parents[-1] == -1
+    for node, parent in zip(nodes[:-1], parents[:-1]):
+        assert nodes[parent] is node.parent
+
+    values = impact_model.params_values(cuda_core=[256, 512, 1024])
+    nodes_scores = impact_model.get_nodes_scores_from_values(values, as_array=True)
+    direct_nodes_scores = NodeScores.full_to_direct_impacts(nodes_scores)
+    for node_scores, array_node_scores in zip(
+        direct_nodes_scores,
+        impact_model.get_nodes_scores_from_values(
+            values, direct_impacts=True, as_array=True
+        ),
+    ):
+        assert node_scores.name == array_node_scores.name
+        assert node_scores.lcia_scores.methods == array_node_scores.lcia_scores.methods
+        np.testing.assert_allclose(
+            array_node_scores.lcia_scores.values, node_scores.lcia_scores.values
+        )
+
+    combined_scores = NodeScores.combine_by_property(direct_nodes_scores, "phase")
+    array_combined_scores = impact_model.get_nodes_scores_from_values(
+        values, by_property="phase", as_array=True
+    )
+    assert len(combined_scores) > 1
+    assert [node_scores.name for node_scores in combined_scores] == [
+        node_scores.name for node_scores in array_combined_scores
+    ]
+    for node_scores, array_node_scores in zip(combined_scores, array_combined_scores):
+        np.testing.assert_allclose(
+            array_node_scores.lcia_scores.values, node_scores.lcia_scores.values
+        )
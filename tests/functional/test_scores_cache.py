@@ -0,0 +1,157 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from apparun.cache import ScoresCache
+from apparun.impact_model import ImpactModel
+from apparun.results import ScenarioComparisonResult
+from tests import DATA_DIR
+
+
+@pytest.fixture()
+def scores_cache(monkeypatch):
+    scores_cache = ScoresCache(max_entries=2, max_samples=10)
+    monkeypatch.setattr("apparun.impact_model.scores_cache", scores_cache)
+    return scores_cache
+
+
+def test_scenarios_are_computed_once(scores_cache):
+    """
+    Check scores of a scenario computed again are taken from the cache, even if its
+    parameters are given differently, and that least recently used scenarios are
+    evicted.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    nodes_scores = impact_model.get_nodes_scores(cuda_core=512, architecture="Pascal")
+    assert scores_cache.stats() == {"entries": 1, "hits": 0, "misses": 1}
+
+    cached_nodes_scores = impact_model.get_nodes_scores(
+        cuda_core="256 * 2", architecture="Pascal"
+    )
+    assert scores_cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+    assert [node_scores.lcia_scores.scores for node_scores in nodes_scores] == [
+        node_scores.lcia_scores.scores for node_scores in cached_nodes_scores
+    ]
+
+    # Options of the computation are part of the key
+    impact_model.get_nodes_scores(
+        cuda_core=512, architecture="Pascal", direct_impacts=True
+    )
+    impact_model.get_scores(cuda_core=512, architecture="Pascal")
+    assert scores_cache.stats() == {"entries": 2, "hits": 1, "misses": 3}
+    impact_model.get_nodes_scores(cuda_core=512, architecture="Pascal")
+    assert scores_cache.stats() == {"entries": 2, "hits": 1, "misses": 4}
+
+    # Large batches are not cached
+    impact_model.get_scores(cuda_core=list(np.linspace(256, 4096, 20)))
+    assert scores_cache.stats() == {"entries": 2, "hits": 1, "misses": 4}
+
+
+def test_scenario_comparison_is_incremental(scores_cache, monkeypatch):
+    """
+    Check a scenario comparison only computes scenarios added, or whose parameters
+    changed, since its last table, and gives the same table as computing each
+    scenario separately.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    scenarios_parameters = {
+        "pascal": {"cuda_core": 512, "architecture": "Pascal"},
+        "maxwell": {"cuda_core": 1024, "architecture": "Maxwell"},
+    }
+    result = ScenarioComparisonResult(
+        impact_model=impact_model, scenarios_parameters=scenarios_parameters
+    )
+    computed_batches = []
+    get_nodes_scores_batch = ImpactModel.get_nodes_scores_batch
+
+    def spy(self, params_list, **kwargs):
+        computed_batches.append(params_list)
+        return get_nodes_scores_batch(self, params_list, **kwargs)
+
+    monkeypatch.setattr(ImpactModel, "get_nodes_scores_batch", spy)
+    table = result.get_table()
+    assert len(computed_batches) == 1
+    for scenario_name, scenario_params in scenarios_parameters.items():
+        scenario_table = table[table["scenario_name"] == scenario_name]
+        nodes_scores = impact_model.get_nodes_scores(**scenario_params)
+        np.testing.assert_allclose(
+            scenario_table["score"],
+            pd.concat([node_scores.to_unpivoted_df() for node_scores in nodes_scores])[
+                "score"
+            ],
+        )
+
+    result.scenarios_parameters["pascal_256"] = {
+        "cuda_core": 256,
+        "architecture": "Pascal",
+    }
+    result.scenarios_parameters["pascal"]["cuda_core"] = 2048
+    table = result.get_table()
+    assert computed_batches[1:] == [
+        [
+            {"cuda_core": 2048, "architecture": "Pascal"},
+            {"cuda_core": 256, "architecture": "Pascal"},
+        ]
+    ]
+    assert list(table["scenario_name"].unique()) == ["pascal", "maxwell", "pascal_256"]
+
+    result.get_table()
+    assert len(computed_batches) == 2
+
+
+def test_cached_scores_are_read_only(scores_cache):
+    """
+    Check scores returned as arrays from the cache can't be modified in place, so a
+    caller can't corrupt following cache hits.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    nodes_scores = impact_model.get_nodes_scores(cuda_core=512, as_array=True)
+    scores = impact_model.get_scores(cuda_core=512, as_array=True)
+    expected_values = [
+        node_scores.lcia_scores.values.copy() for node_scores in nodes_scores
+    ]
+    for lcia_scores in [nodes_scores[0].lcia_scores, scores]:
+        with pytest.raises(ValueError):
+            lcia_scores.values[0, 0] = 0
+        lcia_scores.methods.append("other_method")
+
+    cached_nodes_scores = impact_model.get_nodes_scores(cuda_core=512, as_array=True)
+    assert scores_cache.stats()["hits"] == 1
+    for node_scores, values in zip(cached_nodes_scores, expected_values):
+        np.testing.assert_array_equal(node_scores.lcia_scores.values, values)
+    assert "other_method" not in cached_nodes_scores[0].lcia_scores.methods
+    assert (
+        "other_method"
+        not in impact_model.get_scores(cuda_core=512, as_array=True).methods
+    )
+
+    # Scores which are not cached are left writable
+    scores = impact_model.get_scores(cuda_core=list(range(512, 532)), as_array=True)
+    scores.values[0, 0] = 0
+
+
+def test_sub_models_scores(scores_cache):
+    """
+    Check impact models created from tree's children, which have no metadata, are
+    scored and cached apart from their parent model.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    for sub_model, child in zip(
+        impact_model.from_tree_children(), impact_model.tree.children
+    ):
+        assert sub_model.metadata is None
+        assert sub_model.model_hash != impact_model.model_hash
+        expected_scores = child.compute(
+            impact_model.transform_parameters(impact_model.params_values())
+        )
+        assert sub_model.get_scores().scores == pytest.approx(expected_scores.scores)
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+import pandas as pd
+from SALib.analyze import sobol
+
+from apparun.execution import ProcessBackend, SerialBackend
+from apparun.impact_model import ImpactModel
+from apparun.sensitivity import sobol_indices, sobol_s1_block, sobol_s1_indices
+from tests import DATA_DIR
+
+
+def test_sobol_s1_without_bootstrap_matches_salib():
+    """
+    Check first order indices estimated without bootstrap are the ones of SALib's
+    analysis, with and without second order samples.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    for calc_second_order in [True, False]:
+        samples = impact_model.parameters.sobol_draw(
+            64, calc_second_order=calc_second_order
+        )
+        problem = impact_model.parameters.sobol_problem
+        scores = np.stack(
+            [samples @ np.arange(1, samples.shape[1] + 1), samples[:, 0] ** 2]
+        )
+        expected = np.array(
+            [
+                sobol.analyze(
+                    problem, series_scores, calc_second_order=calc_second_order
+                )["S1"]
+                for series_scores in scores
+            ]
+        )
+        np.testing.assert_allclose(
+            sobol_s1_block(
+                problem, scores, calc_second_order=calc_second_order, bootstrap=False
+            ),
+            expected,
+        )
+
+
+def test_parallel_sobol_s1_indices():
+    """
+    Check Sobol indices of every node and impact method are the same whether they
+    are analysed serially or in worker processes.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    sobol_indices = pd.DataFrame(
+        impact_model.get_sobol_s1_indices(
+            16, all_nodes=True, calc_second_order=False, bootstrap=False
+        )
+    )
+    assert set(sobol_indices["node"]) == {
+        node.name for node in impact_model.tree.unnested_descendants
+    }
+    assert set(sobol_indices["parameter"]) == set(impact_model.parameters.names)
+
+    samples = impact_model.parameters.sobol_draw(16)
+    samples = impact_model.parameters.draw_to_distrib(samples)
+    series, scores = impact_model.get_series_scores(
+        impact_model.params_values(**samples), all_nodes=True
+    )
+    problem = impact_model.parameters.sobol_problem
+    # Confidence intervals' bootstrap is random, but doesn't change S1
+    serial_indices = sobol_s1_indices(problem, series, scores, backend=SerialBackend())
+    backend = ProcessBackend(max_workers=2)
+    try:
+        parallel_indices = sobol_s1_indices(problem, series, scores, backend=backend)
+    finally:
+        backend.shutdown()
+    assert serial_indices == parallel_indices
+
+
+def test_vectorized_sobol_indices_match_salib():
+    """
+    Check first and total order indices of all series, estimated at once from a
+    (nodes, methods, samples) array, are the ones of SALib's analysis.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    samples = impact_model.parameters.sobol_draw(32)
+    problem = impact_model.parameters.sobol_problem
+    weights = np.random.default_rng(0).random((2, 3, samples.shape[1]))
+    scores = np.exp(weights @ samples.T)
+    series = [(node, method) for node in ["a", "b"] for method in ["x", "y", "z"]]
+
+    df = sobol_indices(problem, series, scores)
+    assert list(df.columns) == ["node", "method", "parameter", "sobol_s1", "sobol_st"]
+    assert len(df) == len(series) * problem["num_vars"]
+    for series_index, series_scores in enumerate(scores.reshape(6, -1)):
+        expected = sobol.analyze(problem, series_scores)
+        series_df = df.iloc[
+            series_index
+            * problem["num_vars"] : (series_index + 1)
+            * problem["num_vars"]
+        ]
+        assert list(series_df["parameter"]) == problem["names"]
+        np.testing.assert_allclose(series_df["sobol_s1"], expected["S1"])
+        np.testing.assert_allclose(series_df["sobol_st"], expected["ST"])
+
+    indices = impact_model.get_sobol_indices(16, all_nodes=True)
+    assert set(indices["node"]) == {
+        node.name for node in impact_model.tree.unnested_descendants
+    }
+    assert indices[["sobol_s1", "sobol_st"]].notna().all().all()
+
+
+def test_gradients_match_finite_differences():
+    """
+    Check gradients of each node's scores, computed for several scenarios at once,
+    match finite differences, and that elasticities are relative gradients.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    params = {
+        "cuda_core": [512.0, 1024.0, 2048.0],
+        "architecture": ["Pascal", "Maxwell", "Pascal"],
+        "energy_per_inference": [0.1, 0.2, 0.5],
+        "inference_per_day": 1e5,
+        "lifespan": 2.0,
+        "usage_location": ["FR", "EU", "EU"],
+    }
+    gradients = impact_model.get_gradients(all_nodes=True, **params)
+    assert set(gradients["parameter"]) == {
+        "cuda_core",
+        "energy_per_inference",
+        "inference_per_day",
+        "lifespan",
+    }
+    assert len(gradients) == 4 * len(impact_model.tree.unnested_descendants) * 3
+    np.testing.assert_allclose(
+        gradients["elasticity"],
+        gradients["gradient"] * gradients["value"] / gradients["score"],
+    )
+
+    scores = impact_model.get_scores(as_array=True, **params).values[0]
+    root_gradients = impact_model.get_gradients(**params)
+    assert set(root_gradients["node"]) == {impact_model.tree.name}
+    for parameter in ["cuda_core", "energy_per_inference"]:
+        step = 1e-6 * np.array(params[parameter])
+        shifted_scores = impact_model.get_scores(
+            as_array=True,
+            **{**params, parameter: list(np.array(params[parameter]) + step)},
+        ).values[0]
+        np.testing.assert_allclose(
+            root_gradients[root_gradients["parameter"] == parameter]["gradient"],
+            (shifted_scores - scores) / step,
+            rtol=1e-4,
+        )
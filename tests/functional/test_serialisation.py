@@ -1,7 +1,12 @@
 import os
 
+import numpy as np
 import pytest
 
+from apparun.cache import ScoresCache
+from apparun.codegen import CompiledModel
+from apparun.container import ModelContainer
+from apparun.exceptions import InvalidContainerError
 from apparun.impact_model import ImpactModel, ModelMetadata
 from tests import DATA_DIR
 
@@ -35,3 +40,88 @@ def test_serialisation_deserialisation_scores(impact_model):
     assert scores == pytest.approx(initial_scores)
 
     os.remove(new_model_filename)
+
+
+def test_lazy_loading(impact_model):
+    """
+    Check models of a lazily loaded impact model are only parsed when needed, and
+    give the same scores as an eagerly loaded one.
+    """
+    lazy_impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml"), lazy=True
+    )
+    assert [parameter.name for parameter in lazy_impact_model.parameters] == [
+        parameter.name for parameter in impact_model.parameters
+    ]
+    for node in lazy_impact_model.tree.unnested_descendants:
+        assert all(
+            isinstance(dict.__getitem__(node.models, method), str)
+            for method in node.models
+        )
+
+    scores = lazy_impact_model.get_nodes_scores(cuda_core=[512, 1024])
+    assert scores == pytest.approx(impact_model.get_nodes_scores(cuda_core=[512, 1024]))
+    assert [node.name for node in lazy_impact_model.tree.unnested_descendants] == [
+        node.name for node in impact_model.tree.unnested_descendants
+    ]
+    root = lazy_impact_model.tree
+    assert root.children[0].parent is root
+    assert (
+        root.children[0].combined_amount
+        == impact_model.tree.children[0].combined_amount
+    )
+
+
+def test_binary_container(impact_model, tmp_path, monkeypatch):
+    """
+    Check an impact model written as a binary container is loaded with the same tree,
+    parameters and scores, its models and compiled models being decoded only when
+    needed, and that other files are rejected.
+    """
+    monkeypatch.setattr("apparun.impact_model.scores_cache", ScoresCache(max_entries=0))
+    filepath = os.path.join(tmp_path, "nvidia_ai_gpu_chip.apparun")
+    impact_model.to_binary(filepath)
+    loaded_impact_model = ImpactModel.from_binary(filepath)
+    assert loaded_impact_model.to_dict() == impact_model.to_dict()
+    np.testing.assert_array_equal(
+        loaded_impact_model.nodes_parents, impact_model.tree.unnested_parents
+    )
+    for node in loaded_impact_model.tree.unnested_descendants:
+        assert node.parent is None or node in node.parent.children
+
+    # Nodes scores are computed by the saved tree evaluator
+    symbols = tuple(impact_model.parameters.symbols)
+    scores = loaded_impact_model.get_nodes_scores(cuda_core=[512, 1024])
+    assert scores == pytest.approx(impact_model.get_nodes_scores(cuda_core=[512, 1024]))
+    for node in loaded_impact_model.tree.unnested_descendants:
+        assert all(isinstance(model, int) for model in dict.values(node.models))
+        assert all(
+            isinstance(model, int)
+            for model in dict.values(node._compiled_models[symbols])
+        )
+
+    # Root scores only decode root's compiled models
+    assert loaded_impact_model.get_scores(cuda_core=512) == pytest.approx(
+        impact_model.get_scores(cuda_core=512)
+    )
+    root = loaded_impact_model.tree
+    assert all(
+        isinstance(model, CompiledModel)
+        for model in dict.values(root._compiled_models[symbols])
+    )
+    assert all(
+        isinstance(model, int)
+        for model in dict.values(root.children[0]._compiled_models[symbols])
+    )
+
+    assert dict(root.models) == dict(impact_model.tree.models)
+
+    with ModelContainer.open(filepath) as container:
+        assert container.parameters == impact_model.parameters.to_list(
+            sorted_by_name=True
+        )
+
+    with open(filepath, "r+b") as stream:
+        stream.write(b"NOTAMODEL")
+    with pytest.raises(InvalidContainerError):
+        ImpactModel.from_binary(filepath)
@@ -0,0 +1,189 @@
+import os
+
+import numpy as np
+import pytest
+import sympy
+
+from apparun.codegen import polynomial_terms
+from apparun.evaluation import TreeEvaluator
+from apparun.impact_model import ImpactModel
+from tests import DATA_DIR
+
+
+@pytest.fixture(
+    params=[
+        (
+            "nvidia_ai_gpu_chip.yaml",
+            {
+                "cuda_core": [256, 512, 1024, 2048],
+                "architecture": ["Maxwell", "Pascal", "Pascal", "Maxwell"],
+                "usage_location": ["FR", "FR", "EU", "EU"],
+            },
+        ),
+        ("multi_indicator_model.yaml", {"test_param": [0, 1, 2, 3]}),
+    ]
+)
+def impact_model_and_params(request):
+    filename, params = request.param
+    return (
+        ImpactModel.from_yaml(os.path.join(DATA_DIR, "impact_models", filename)),
+        params,
+    )
+
+
+def test_tree_evaluator_matches_nodes_computation(impact_model_and_params):
+    """
+    Check evaluating the whole tree at once gives the same scores as computing each
+    node separately.
+    """
+    impact_model, params = impact_model_and_params
+    transformed_params = impact_model.transform_parameters(
+        impact_model.params_values(**params)
+    )
+    tree_evaluator = impact_model.tree_evaluator(tuple(sorted(transformed_params)))
+    scores = tree_evaluator.evaluate(transformed_params)
+
+    assert scores.shape == (
+        len(impact_model.tree.unnested_descendants),
+        len(tree_evaluator.methods),
+        4,
+    )
+    for node_index, node in enumerate(impact_model.tree.unnested_descendants):
+        node_scores = node.compute(transformed_params)
+        for method, method_scores in node_scores.scores.items():
+            method_index = tree_evaluator.methods.index(method)
+            assert np.allclose(scores[node_index, method_index], method_scores)
+
+
+def test_enum_specialized_evaluation(monkeypatch):
+    """
+    Check evaluating each combination of enum options with a specialized evaluator
+    gives the same scores as the generic evaluator, that specialized evaluators
+    don't compute the branches of other options, and that they are only compiled
+    for large batches.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    values = impact_model.params_values(cuda_core=[256, 512], architecture="Pascal")
+    tree_evaluator, _ = impact_model.evaluate_tree(values)
+    assert tree_evaluator is impact_model.tree_evaluator(
+        tuple(impact_model.parameters.symbols)
+    )
+    assert impact_model.tree_evaluators_count == 1
+
+    monkeypatch.setattr(
+        "apparun.impact_model.APPARUN_MIN_ENUM_SPECIALIZATION_SAMPLES", 1
+    )
+    for params in [
+        {
+            "cuda_core": [256, 512, 1024, 2048, 3072],
+            "architecture": ["Maxwell", "Pascal", "Pascal", "Maxwell", "Pascal"],
+            "usage_location": ["FR", "FR", "EU", "EU", "FR"],
+        },
+        {"cuda_core": [256, 512], "architecture": "Pascal"},
+    ]:
+        values = impact_model.params_values(**params)
+        tree_evaluator, scores = impact_model.evaluate_tree(values)
+        transformed_params = impact_model.transform_parameters(values)
+        expected_scores = impact_model.tree_evaluator(
+            tuple(sorted(transformed_params))
+        ).evaluate(transformed_params)
+        np.testing.assert_allclose(scores, expected_scores)
+
+    specialized_evaluator = impact_model.specialized_tree_evaluator(
+        tuple(impact_model.parameters.symbols),
+        (("architecture", "Pascal"), ("usage_location", "FR")),
+    )
+    assert "architecture_Maxwell" not in "".join(
+        specialized_evaluator.compiled_exprs.outputs
+        + [source for _, source in specialized_evaluator.compiled_exprs.assignments]
+    )
+
+    # Specialized evaluators already compiled are used for small batches
+    monkeypatch.setattr(
+        "apparun.impact_model.APPARUN_MIN_ENUM_SPECIALIZATION_SAMPLES", 1000
+    )
+    values = impact_model.params_values(architecture="Pascal", usage_location="FR")
+    tree_evaluator, _ = impact_model.evaluate_tree(values)
+    assert tree_evaluator is specialized_evaluator
+
+    # Above the maximum number of combinations, generic evaluator is used
+    monkeypatch.setattr("apparun.impact_model.APPARUN_MAX_ENUM_SPECIALIZATIONS", 1)
+    values = impact_model.params_values(
+        architecture=["Maxwell", "Pascal"], usage_location="FR"
+    )
+    tree_evaluator, scores = impact_model.evaluate_tree(values)
+    assert tree_evaluator is impact_model.tree_evaluator(
+        tuple(impact_model.parameters.symbols)
+    )
+
+
+def test_polynomial_evaluation(impact_model_and_params):
+    """
+    Check models which are polynomials of the parameters, evaluated as a matrix
+    product, give the same scores as their compiled code, and that models which
+    aren't polynomials are compiled. Also check evaluators are saved and loaded back
+    as dicts.
+    """
+    impact_model, params = impact_model_and_params
+    transformed_params = impact_model.transform_parameters(
+        impact_model.params_values(**params)
+    )
+    symbols = tuple(sorted(transformed_params))
+    nodes = impact_model.tree.unnested_descendants
+    tree_evaluator = TreeEvaluator.from_nodes(nodes, symbols)
+    compiled_tree_evaluator = TreeEvaluator.from_nodes(
+        nodes, symbols, max_polynomial_terms=0
+    )
+    assert compiled_tree_evaluator.polynomial_exprs is None
+    np.testing.assert_array_equal(tree_evaluator.mask, compiled_tree_evaluator.mask)
+    np.testing.assert_allclose(
+        tree_evaluator.evaluate(transformed_params),
+        compiled_tree_evaluator.evaluate(transformed_params),
+        rtol=1e-12,
+    )
+    loaded_tree_evaluator = TreeEvaluator.from_dict(tree_evaluator.to_dict())
+    assert loaded_tree_evaluator.symbols == symbols
+    np.testing.assert_array_equal(
+        loaded_tree_evaluator.evaluate(transformed_params),
+        tree_evaluator.evaluate(transformed_params),
+    )
+
+    x, y = sympy.symbols("x y")
+    assert polynomial_terms(3 * x * y + 6 * x + x**2, ["x", "y"], 16) == {
+        (0,): 6.0,
+        (0, 0): 1.0,
+        (0, 1): 3.0,
+    }
+    assert polynomial_terms(3 * x * (y + 2) + x**2, ["x", "y"], 16) is None
+    assert polynomial_terms(sympy.exp(x) + y, ["x", "y"], 16) is None
+    assert polynomial_terms((x + y) ** 4, ["x", "y"], 4) is None
+
+
+def test_polynomial_evaluation_precision():
+    """
+    Check models which aren't in expanded form are not expanded, so terms cancelling
+    each other out don't lose the precision of the factored form, whereas expanded
+    models are evaluated as polynomials.
+    """
+    a, b, k = sympy.symbols("a b k")
+    names = ["factored", "sum", "expanded"]
+    models = [
+        {"method": k * (a - b) ** 2},
+        {"method": k * (a - b) ** 2 + a + b},
+        {"method": k * a**2 - 2 * k * a * b + k * b**2},
+    ]
+    symbols = ("a", "b", "k")
+    params = {"a": np.array([1e8 + 1, 3.0]), "b": np.array([1e8, 1.0]), "k": 2.0}
+    tree_evaluator = TreeEvaluator.from_models(names, models, symbols)
+    compiled_tree_evaluator = TreeEvaluator.from_models(
+        names, models, symbols, max_polynomial_terms=0
+    )
+    assert tree_evaluator.polynomial_outputs[0] == [(2, 0)]
+    scores = tree_evaluator.evaluate(params)
+    np.testing.assert_array_equal(
+        scores[:2], compiled_tree_evaluator.evaluate(params)[:2]
+    )
+    np.testing.assert_array_equal(scores[0, 0], [2.0, 8.0])
+    np.testing.assert_allclose(scores[2, 0, 1], 8.0)
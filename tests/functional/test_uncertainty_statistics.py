@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+from apparun.impact_model import ImpactModel
+from apparun.uncertainty import UncertaintyStatistics
+from tests import DATA_DIR
+
+
+def test_online_statistics_match_full_sample():
+    """
+    Check statistics updated chunk by chunk match the statistics of the full sample.
+    """
+    rng = np.random.default_rng(0)
+    values = np.stack(
+        [rng.normal(10, 2, 100000), rng.lognormal(0, 1, 100000), np.full(100000, 3.0)]
+    )
+    uncertainty_statistics = UncertaintyStatistics.from_series(
+        [("node", "a"), ("node", "b"), ("node", "c")], quantiles=[0.05, 0.5, 0.95]
+    )
+    for chunk in np.array_split(values, 7, axis=1):
+        uncertainty_statistics.update(chunk)
+
+    df = uncertainty_statistics.to_df()
+    np.testing.assert_allclose(df["mean"], values.mean(axis=1))
+    np.testing.assert_allclose(df["std"], values.std(axis=1, ddof=1), atol=1e-9)
+    np.testing.assert_allclose(df["min"], values.min(axis=1))
+    np.testing.assert_allclose(df["max"], values.max(axis=1))
+    # Quantiles are estimated within 1% of rank
+    for quantile in [0.05, 0.5, 0.95]:
+        ranks = (values <= df[f"q{quantile:g}"].to_numpy()[:, np.newaxis]).mean(axis=1)
+        np.testing.assert_allclose(ranks[:2], quantile, atol=0.01)
+    np.testing.assert_allclose(df["q0.5"][2], 3.0)
+
+    histogram = uncertainty_statistics.histogram
+    np.testing.assert_array_equal(
+        histogram.counts.sum(axis=1) + histogram.underflow + histogram.overflow,
+        100000,
+    )
+
+
+def test_streaming_monte_carlo_stops_on_convergence():
+    """
+    Check streaming Monte Carlo gives statistics for each node and impact method, and
+    stops drawing samples once the means converged.
+    """
+    impact_model = ImpactModel.from_yaml(
+        os.path.join(DATA_DIR, "impact_models", "nvidia_ai_gpu_chip.yaml")
+    )
+    uncertainty_statistics = impact_model.get_uncertainty_statistics(
+        100000, all_nodes=True, chunk_size=1000, rtol=0.05, min_samples=2000
+    )
+    assert 2000 <= uncertainty_statistics.count < 100000
+    df = uncertainty_statistics.to_df()
+    assert set(df["node"]) == {
+        node.name for node in impact_model.tree.unnested_descendants
+    }
+    assert df["mean"].notna().all()
+
+    uncertainty_statistics = impact_model.get_uncertainty_statistics(
+        2500, chunk_size=1000
+    )
+    assert uncertainty_statistics.count == 2500
+    assert set(uncertainty_statistics.to_df()["node"]) == {impact_model.tree.name}